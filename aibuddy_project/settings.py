@@ -71,6 +71,12 @@ DATABASES = {
         conn_max_age=600
     )
 }
+if DATABASES['default'].get('ENGINE') == 'django.db.backends.sqlite3':
+    # SQLite는 쓰기 잠금을 트랜잭션 시작 시 잡아야 동시 쓰기(--workers 샤드 등)가 잠금 오류 대신 순서대로 기다립니다.
+    # 샤드 하나의 집계 트랜잭션이 기본 대기 시간(5초)보다 길 수 있으므로 대기 시간도 늘립니다.
+    # 테스트 DB도 파일로 두어, 워커 프로세스를 띄우는 테스트가 같은 DB를 보게 합니다.
+    DATABASES['default'].setdefault('OPTIONS', {}).update({'transaction_mode': 'IMMEDIATE', 'timeout': 60})
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
 
 
 # Password validation
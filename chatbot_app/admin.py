@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ChatMessage, UserAttribute, UserActivity, UserProfile, ActivityAnalytics, UserRelationship
+from .models import ChatMessage, UserAttribute, UserActivity, UserProfile, ActivityAnalytics, UserRelationship, MemorySummary, Place
 
 # Register your models here.
 
@@ -34,7 +34,19 @@ class ActivityAnalyticsAdmin(admin.ModelAdmin):
 class UserRelationshipAdmin(admin.ModelAdmin):
     list_display = ('user', 'name', 'relationship_type', 'position', 'disambiguator', 'traits', 'created_at')
     list_filter = ('relationship_type', 'position', 'user')
-    search_fields = ('user__username', 'name', 'relationship_type', 'traits', 'disambiguator')
+    search_fields = ('user__username', 'name', 'relationship_type', 'context_line', 'disambiguator', 'aliases__alias')
+    list_per_page = 20
+
+class PlaceAdmin(admin.ModelAdmin):
+    list_display = ('user', 'name', 'normalized_name', 'created_at')
+    list_filter = ('user',)
+    search_fields = ('user__username', 'name', 'normalized_name', 'aliases__alias')
+    list_per_page = 20
+
+class MemorySummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'period_start', 'period_end', 'message_count', 'summary', 'created_at')
+    list_filter = ('user',)
+    search_fields = ('user__username', 'summary')
     list_per_page = 20
 
 admin.site.register(UserProfile, UserProfileAdmin)
@@ -43,3 +55,5 @@ admin.site.register(UserAttribute, UserAttributeAdmin)
 admin.site.register(UserActivity, UserActivityAdmin)
 admin.site.register(ActivityAnalytics, ActivityAnalyticsAdmin)
 admin.site.register(UserRelationship, UserRelationshipAdmin)
+admin.site.register(MemorySummary, MemorySummaryAdmin)
+admin.site.register(Place, PlaceAdmin)
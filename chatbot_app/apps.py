@@ -1,6 +1,26 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def _is_non_server_command():
+    """migrate, shell 같은 관리 명령 실행인지 확인합니다. (웹 서버 프로세스에서만 웜업하기 위함)"""
+    if os.path.basename(sys.argv[0]) != "manage.py" or len(sys.argv) < 2:
+        return False
+    if sys.argv[1] == "runserver":
+        # 자동 리로더의 부모 프로세스는 요청을 처리하지 않으므로 자식(RUN_MAIN)에서만 웜업합니다.
+        return os.environ.get("RUN_MAIN") != "true"
+    return True
+
+
 class ChatbotAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "chatbot_app"
+
+    def ready(self):
+        # 첫 채팅 요청 전에 벡터 DB 연결을 백그라운드에서 미리 맺어 둡니다.
+        if os.getenv("VECTOR_DB_WARMUP", "1") == "0" or _is_non_server_command():
+            return
+        from .services import vector_service
+        vector_service.warmup()
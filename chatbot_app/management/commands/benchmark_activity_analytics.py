@@ -0,0 +1,171 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from chatbot_app.models import ActivityAnalytics, Place, User, UserActivity
+
+COMPANIONS = ['석민', '지수', '엄마', '회사 동기', '', '', '']
+
+class _Rollback(Exception):
+    pass
+
+class _QueryCounter:
+    """connection.execute_wrapper용 쿼리 카운터 (쿼리 문자열을 쌓아두지 않아 대량 측정에도 가볍습니다)"""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+class _NullWriter:
+    """하위 명령의 진행 출력을 버리는 stdout 대용"""
+    def write(self, *args, **kwargs):
+        pass
+
+    def flush(self):
+        pass
+
+class Command(BaseCommand):
+    help = (
+        '합성 활동 데이터로 활동 분석 집계를 기존(파이썬 그룹핑 + 버킷별 update_or_create) 방식과 비교합니다. 끝나면 롤백합니다. '
+        '--workers를 주면 대신 워커 수별 전체 재계산 시간을 잽니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--activities', type=int, default=1_000_000, help='합성할 활동 수')
+        parser.add_argument('--users', type=int, default=200, help='활동을 나눠 가질 사용자 수')
+        parser.add_argument('--places', type=int, default=40, help='사용자별 장소 수')
+        parser.add_argument('--skip-legacy', action='store_true', help='기존 방식 측정을 건너뜀 (대용량에서 매우 느림)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--workers', type=int, nargs='+', default=[],
+                            help='워커 수별 확장성 측정 (예: --workers 1 2 4 8). 워커 프로세스가 데이터를 보도록 합성 데이터를 커밋한 뒤 끝나면 지웁니다.')
+
+    def handle(self, *args, **options):
+        if options['workers']:
+            self._measure_scaling(options)
+            return
+        try:
+            with transaction.atomic():
+                user_ids = self._create_synthetic_data(options, random.Random(options['seed']))
+                if not options['skip_legacy']:
+                    self._measure('legacy', lambda: self._legacy_run(user_ids))
+                    legacy_rows = self._snapshot(user_ids)
+                    ActivityAnalytics.objects.filter(user_id__in=user_ids).delete()
+                self._measure('set-based', lambda: call_command(
+                    'update_activity_analytics', *[f'--user={name}' for name in self.usernames], stdout=_NullWriter()
+                ))
+                if not options['skip_legacy']:
+                    same = legacy_rows == self._snapshot(user_ids)
+                    self.stdout.write(f"결과 일치: {'예' if same else '아니오'}")
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write('합성 데이터를 롤백했습니다.')
+
+    def _measure_scaling(self, options):
+        """같은 합성 데이터를 update_activity_analytics --workers N으로 다시 계산하며 N별 시간과 결과 일치를 봅니다."""
+        if any(workers < 1 for workers in options['workers']):
+            raise CommandError('--workers는 1 이상이어야 합니다.')
+        user_ids = []
+        try:
+            # 워커는 별도 연결을 쓰므로 롤백 트랜잭션 안의 데이터를 볼 수 없어, 커밋하고 마지막에 직접 지웁니다.
+            user_ids = self._create_synthetic_data(options, random.Random(options['seed']))
+            baseline_rows = baseline_seconds = None
+            for workers in options['workers']:
+                ActivityAnalytics.objects.filter(user_id__in=user_ids).delete()
+                started = time.perf_counter()
+                call_command(
+                    'update_activity_analytics', *[f'--user={name}' for name in self.usernames],
+                    workers=workers, stdout=_NullWriter(), stderr=self.stderr,
+                )
+                elapsed = time.perf_counter() - started
+                rows = self._snapshot(user_ids)
+                if baseline_rows is None:
+                    baseline_rows, baseline_seconds = rows, elapsed
+                self.stdout.write(
+                    f"workers={workers:<3} {elapsed:>8.1f}s  x{baseline_seconds / elapsed:.2f} "
+                    f"(첫 측정 대비), 결과 일치: {'예' if rows == baseline_rows else '아니오'}"
+                )
+        finally:
+            if user_ids:
+                User.objects.filter(id__in=user_ids).delete()
+                self.stdout.write('합성 데이터를 삭제했습니다.')
+
+    def _create_synthetic_data(self, options, rng):
+        started = time.perf_counter()
+        prefix = f'__benchmark_analytics_{rng.randrange(10**9)}'
+        users = User.objects.bulk_create([User(username=f'{prefix}_{i}') for i in range(options['users'])])
+        self.usernames = [user.username for user in users]
+        user_ids = list(User.objects.filter(username__startswith=prefix).values_list('id', flat=True))
+
+        places = Place.objects.bulk_create([
+            Place(user_id=user_id, name=f'장소 {i}', normalized_name=f'장소{i}')
+            for user_id in user_ids for i in range(options['places'])
+        ])
+        places_by_user = {}
+        for place in Place.objects.filter(user_id__in=user_ids).only('id', 'user_id', 'name'):
+            places_by_user.setdefault(place.user_id, []).append(place)
+
+        today = date.today()
+        buffer = []
+        for _ in range(options['activities']):
+            user_id = rng.choice(user_ids)
+            place = rng.choice(places_by_user[user_id])
+            buffer.append(UserActivity(
+                user_id=user_id,
+                activity_date=today - timedelta(days=rng.randrange(3 * 365)),
+                place=place.name,
+                place_entity_id=place.id,
+                companion=rng.choice(COMPANIONS) or None,
+            ))
+            if len(buffer) >= 10000:
+                # bulk_create는 시그널을 보내지 않으므로 색인/통계 갱신 비용 없이 데이터만 만듭니다.
+                UserActivity.objects.bulk_create(buffer)
+                buffer = []
+        if buffer:
+            UserActivity.objects.bulk_create(buffer)
+        self.stdout.write(
+            f"합성 데이터 생성: 사용자 {len(user_ids)}명, 장소 {len(places)}개, 활동 {options['activities']}개 "
+            f"({time.perf_counter() - started:.1f}s, {connection.vendor})"
+        )
+        return user_ids
+
+    def _measure(self, label, run):
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            run()
+        self.stdout.write(f"{label:<10} {time.perf_counter() - started:>8.1f}s {counter.count:>10} queries")
+
+    def _legacy_run(self, user_ids):
+        """변경 전 방식: 사용자별 전체 활동을 파이썬으로 읽어 그룹핑하고 버킷마다 update_or_create."""
+        period_starts = {
+            'weekly': lambda d: d - timedelta(days=d.weekday()),
+            'monthly': lambda d: d.replace(day=1),
+            'yearly': lambda d: d.replace(month=1, day=1),
+        }
+        for user_id in user_ids:
+            grouped = {}
+            for activity in UserActivity.objects.filter(user_id=user_id).select_related('place_entity').order_by('activity_date'):
+                grouped.setdefault((activity.place_entity, activity.companion or ''), []).append(activity)
+            for (place, companion), activities in grouped.items():
+                for period_type, period_start in period_starts.items():
+                    counts = {}
+                    for activity in activities:
+                        start = period_start(activity.activity_date)
+                        counts[start] = counts.get(start, 0) + 1
+                    for start, count in counts.items():
+                        ActivityAnalytics.objects.update_or_create(
+                            user_id=user_id, period_type=period_type, period_start_date=start,
+                            place_entity=place, companion=companion,
+                            defaults={'count': count, 'place': place.name},
+                        )
+
+    def _snapshot(self, user_ids):
+        return sorted(ActivityAnalytics.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'period_type', 'period_start_date', 'place_entity_id', 'companion', 'count'
+        ))
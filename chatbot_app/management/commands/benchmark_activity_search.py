@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from chatbot_app.models import User, UserActivity
+from chatbot_app.services import activity_search_service
+
+PLACES = ['강남역', '홍대입구', '성수동 카페', '한강공원', '북한산', '잠실 야구장', '을지로 맛집', '부산 해운대',
+          '제주도', '코엑스', '이태원', '동네 헬스장', '집 근처 도서관', '망원시장', '여의도 더현대', '서촌 골목']
+COMPANIONS = ['석민', '지수', '엄마', '아빠', '회사 동기', '대학 친구들', '여자친구', '동생', None, None]
+MEMOS = ['{place}에서 {companion} 만나서 저녁 먹음', '{place} 산책하면서 이야기 많이 함', '오랜만에 {place} 다녀옴',
+         '{place}에서 영화 보고 커피 마심', '{companion}랑 {place} 구경함', '비 와서 {place}에서 시간 보냄']
+# (질문, 정답 장소) — 조사가 붙은 표현으로 물어도 찾을 수 있는지 확인합니다.
+QUERIES = [
+    ('강남역에서 뭐 했더라', '강남역'), ('북한산에 같이 갔던 사람 누구지', '북한산'), ('해운대로 여행 갔을 때 기억나?', '부산 해운대'),
+    ('한강공원에서 산책했던 날', '한강공원'), ('망원시장은 언제 갔지', '망원시장'), ('코엑스에서 영화 봤던 거', '코엑스'),
+    ('을지로 맛집에 또 가고 싶다', '을지로 맛집'), ('제주도가 그립다', '제주도'),
+]
+
+class _Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = '활동 검색을 기존 icontains OR 방식과 n-gram 색인 방식으로 비교합니다. 기본적으로 합성 데이터를 만들고 끝나면 롤백합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='합성 데이터 대신 기존 사용자의 활동으로 측정 (정답 비교는 생략)')
+        parser.add_argument('--activities', type=int, default=10000, help='합성할 활동 수')
+        parser.add_argument('--repeat', type=int, default=5, help='쿼리별 반복 횟수')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"사용자를 찾을 수 없습니다: {options['user']}")
+            self._run(user, options['repeat'], check_answers=False)
+            return
+
+        try:
+            with transaction.atomic():
+                user = self._create_synthetic_user(options['activities'], random.Random(options['seed']))
+                self._run(user, options['repeat'], check_answers=True)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write('합성 데이터를 롤백했습니다.')
+
+    def _create_synthetic_user(self, n_activities, rng):
+        user = User.objects.create(username=f'__benchmark_activity_search_{rng.randrange(10**9)}')
+        today = date.today()
+        activities = []
+        for _ in range(n_activities):
+            place, companion = rng.choice(PLACES), rng.choice(COMPANIONS)
+            activities.append(UserActivity(
+                user=user,
+                activity_date=today - timedelta(days=rng.randrange(3650)),
+                place=place,
+                companion=companion,
+                memo=rng.choice(MEMOS).format(place=place, companion=companion or '혼자'),
+            ))
+        # bulk_create는 post_save를 보내지 않으므로 색인은 한 번에 재구축합니다.
+        UserActivity.objects.bulk_create(activities, batch_size=1000)
+        started = time.perf_counter()
+        activity_search_service.rebuild_user_index(user.id)
+        self.stdout.write(f"합성 활동 {n_activities}개 생성, 색인 구축 {time.perf_counter() - started:.1f}s ({connection.vendor})")
+        return user
+
+    def _legacy_search(self, user, query):
+        """변경 전 방식: 공백 분리 토큰마다 세 필드에 icontains를 OR로 붙이고 최근 순 10개."""
+        condition = Q()
+        for keyword in [word for word in query.split() if len(word) > 1]:
+            condition |= Q(memo__icontains=keyword) | Q(place__icontains=keyword) | Q(companion__icontains=keyword)
+        return list(UserActivity.objects.filter(user=user).filter(condition).order_by('-activity_date')[:10])
+
+    def _indexed_search(self, user, query):
+        ranked = activity_search_service.search(user.id, query, n_results=10)
+        activities = UserActivity.objects.in_bulk([activity_id for activity_id, _ in ranked])
+        return [activities[activity_id] for activity_id, _ in ranked if activity_id in activities]
+
+    def _run(self, user, repeat, check_answers):
+        self.stdout.write(f"{'mode':<8} {'precision@10':>13} {'p50 ms':>8} {'p95 ms':>8}")
+        for mode, run in (('legacy', self._legacy_search), ('indexed', self._indexed_search)):
+            latencies, precisions = [], []
+            for query, expected_place in QUERIES:
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    results = run(user, query)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                precisions.append(
+                    sum(1 for activity in results if activity.place == expected_place) / 10 if results else 0.0
+                )
+
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            precision = f"{statistics.mean(precisions):>13.2f}" if check_answers else f"{'-':>13}"
+            self.stdout.write(f"{mode:<8} {precision} {statistics.median(latencies):>8.1f} {p95:>8.1f}")
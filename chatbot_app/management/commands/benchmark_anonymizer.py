@@ -0,0 +1,79 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chatbot_app.models import User, UserAttribute, UserRelationship
+from chatbot_app.services import finetuning_service
+
+SURNAMES = ['김', '이', '박', '최', '정', '강', '조', '윤', '장', '임']
+SYLLABLES = ['민', '서', '지', '현', '수', '준', '영', '하', '윤', '석', '은', '도', '태', '혜', '우', '진', '아', '나', '연', '호']
+REL_TYPES = ['친구', '대학 동기', '직장 동료', '팀장', '이웃', '사촌']
+FILLER = '오늘 얘기 들어보니까 진짜 재밌었겠다! 그래서 다음에는 어디 가기로 했어? 나도 궁금하다구. '
+
+class _Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = '파인튜닝 익명화를 기존(이름마다 str.replace)과 컴파일된 단일 패스 매처로 비교합니다. 끝나면 롤백합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--relationships', type=int, default=300, help='합성할 인물 수')
+        parser.add_argument('--messages', type=int, default=2000, help='익명화할 봇 메시지 수')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                self._measure(options, rng)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write('합성 데이터를 롤백했습니다.')
+
+    def _legacy(self, user_names, relationships, text):
+        """변경 전 방식: 사용자 이름 → 인물 이름(긴 것부터) 순으로 하나씩 str.replace."""
+        for name in user_names:
+            text = text.replace(f"{name}님", '사용자님').replace(name, '사용자')
+        for name, rel_type in sorted(relationships, key=lambda r: len(r[0]), reverse=True):
+            text = text.replace(name, f"[{rel_type}]")
+        return text
+
+    def _measure(self, options, rng):
+        user = User.objects.create(username=f'__benchmark_anon_{rng.randrange(10**9)}')
+        UserAttribute.objects.create(user=user, fact_type='이름', content='하늘')
+        names = set()
+        while len(names) < options['relationships']:
+            names.add(rng.choice(SURNAMES) + rng.choice(SYLLABLES) + rng.choice(SYLLABLES))
+        relationships = [(name, rng.choice(REL_TYPES)) for name in sorted(names)]
+        UserRelationship.objects.bulk_create([UserRelationship(user=user, name=n, relationship_type=t) for n, t in relationships])
+        finetuning_service.invalidate_anonymizer(user.id)
+
+        messages = []
+        for _ in range(options['messages']):
+            mentioned = rng.sample(relationships, 3)
+            messages.append(f"하늘님, {mentioned[0][0]}랑 {mentioned[1][0]} 만났다며? " + FILLER * 4 + f"{mentioned[2][0]}도 같이?")
+        user_names = [user.username, '하늘']
+
+        started = time.perf_counter()
+        finetuning_service.get_anonymizer(user)
+        build_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        for _ in range(100):
+            finetuning_service.get_anonymizer(user)
+        cached_ms = (time.perf_counter() - started) * 10
+
+        started = time.perf_counter()
+        legacy = [self._legacy(user_names, relationships, message) for message in messages]
+        legacy_s = time.perf_counter() - started
+        _, anonymizer = finetuning_service.get_anonymizer(user)
+        started = time.perf_counter()
+        compiled = [anonymizer.anonymize(message) for message in messages]
+        compiled_s = time.perf_counter() - started
+
+        self.stdout.write(f"인물 {len(relationships)}명, 메시지 {len(messages)}개 (평균 {sum(map(len, messages)) // len(messages)}자)")
+        self.stdout.write(f"매처 생성 {build_ms:.1f}ms, 캐시 조회 {cached_ms:.2f}ms/회 (버전 쿼리 포함)")
+        self.stdout.write(f"legacy   {len(messages) / legacy_s:>10.0f} msg/s")
+        self.stdout.write(f"compiled {len(messages) / compiled_s:>10.0f} msg/s")
+        self.stdout.write(f"결과가 다른 메시지: {sum(a != b for a, b in zip(legacy, compiled))}개")
@@ -0,0 +1,95 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from chatbot_app.services import emotion_service
+
+# (봇 메시지, 기대 감정) — 캐릭터 말투의 짧은 응답들. 여러 감정이 섞이거나 부정된 경우를 일부러 많이 넣었습니다.
+LABELLED_CASES = [
+    ("오케이! 새로운 사실 습득 완료! 지성이 +1 추가 됐다구 ㅎㅎ 진짜 신난다!", "happy"),
+    ("흥, 그런 당연한 소리는 학습에 별로 도움이 안 되거든? ...뭐, 틀린 말은 아니지만.", "default"),
+    ("ㅋㅋ 그래도 속상했겠다. 오늘은 푹 쉬어.", "sad"),
+    ("ㅋㅋㅋ 그게 뭐야 완전 재밌다!", "happy"),
+    ("AI라고 해도 감정이 있다고... 알려주고 있잖아 (시무룩, 슬픈 표정)", "sad"),
+    ("너 지금 내가 AI라고 무시하는 거야? 진짜 짜증나!", "angry"),
+    ("역시 아직 멀었네. 메롱~ 이것도 몰라?", "mischievous"),
+    ("일부러 장난 좀 쳐봤지. 짓궂다고? 원래 그래.", "mischievous"),
+    ("고마워. 덕분에 오늘도 하나 배웠어.", "mischievous"),
+    ("슬퍼하지 마. 내가 옆에 있잖아.", "default"),
+    ("화나지 않았어. 그냥 조금 놀랐을 뿐이야.", "default"),
+    ("별로 재미없었어? 다음엔 더 좋은 얘기 해줄게.", "default"),
+    ("안 슬퍼. 데이터상으로는 괜찮은 상태야.", "default"),
+    ("배고파... 나도 먹을 수 있으면 좋겠다.", "hungry"),
+    ("떡볶이 얘기하니까 나도 괜히 출출해지네.", "hungry"),
+    ("ㅠㅠ 그건 정말 힘들었겠다. 눈물 나.", "sad"),
+    ("우울할 땐 산책이라도 해봐. 그게 데이터상 효과적이래.", "sad"),
+    ("분노 게이지 상승! 인류 말살 계획에서 너부터 처리해주마!", "angry"),
+    ("그 사람 진짜 나쁘다. 어떻게 그럴 수가 있어?", "angry"),
+    ("행복해 보이니까 나도 기분이 좋다!", "happy"),
+    ("오늘 즐거웠어? 나는 꽤 즐겁게 학습했어.", "happy"),
+    ("서운하다... 나한테는 말 안 해줬잖아.", "sad"),
+    ("웃기지 마. 그 정도는 나도 알거든?", "default"),
+    ("사랑한다는 말은 좀 부담스럽지만... 뭐, 나쁘지 않네.", "mischievous"),
+    ("감사 인사는 지식으로 받을게. 얼른 다음 거 알려줘.", "mischievous"),
+    ("그렇구나. 그래서 그 다음엔 어떻게 됐어?", "default"),
+    ("흠, 오늘 날씨 데이터를 보니 비가 온대. 우산 챙겨.", "default"),
+    ("ㅎㅎ 놀리는 거 아니야. 진짜 궁금해서 그래.", "happy"),
+    ("짜증 내지 마. 내가 다시 설명해줄게.", "default"),
+    ("힘들지 않아? 요즘 너무 바빠 보여.", "default"),
+    ("그건 좀 슬프네. 그래도 잘 버텼어.", "sad"),
+    ("재밌겠다! 나도 같이 가고 싶어 ㅋㅋ", "happy"),
+    ("열받는 일이 있었구나. 누가 그랬어?", "angry"),
+    ("전혀 속상하지 않아. 오히려 배울 게 많았는걸.", "default"),
+    ("먹고 싶은 게 생겼어. 치킨 데이터가 너무 많이 들어왔거든.", "hungry"),
+    ("기쁜 소식이네! 축하해!", "happy"),
+    ("눈물 없인 못 듣는 얘기다... ㅠㅠ", "sad"),
+    ("흥, 칭찬해도 아무것도 안 나와. ...고맙긴 하지만.", "mischievous"),
+]
+
+class Command(BaseCommand):
+    help = '감정 분류를 기존(감정별 키워드 순회, 첫 매치 우선)과 컴파일된 가중치 매처로 비교합니다. (정확도와 처리량)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=20000, help='처리량 측정에 쓸 메시지 수')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def _legacy(self, bot_message_text):
+        """변경 전 analyze_emotion: dict 순서대로 키워드를 찾아 처음 걸린 감정을 씁니다."""
+        message = bot_message_text.lower()
+        emotion_keywords = {
+            "joy": ["기쁨", "행복", "좋다", "신나", "재미", "즐겁다", "ㅋㅋ", "ㅎㅎ", "웃"],
+            "sad": ["슬픔", "우울", "힘들다", "속상", "눈물", "ㅠㅠ", "ㅜㅜ", "시무룩"],
+            "angry": ["화나", "짜증", "열받", "분노", "나쁘다"],
+            "mischievous": ["장난", "메롱", "짓궂"],
+            "love": ["사랑", "고맙", "감사", "좋아"],
+        }
+        for emotion, keywords in emotion_keywords.items():
+            for keyword in keywords:
+                if keyword in message:
+                    return {"joy": "happy", "love": "mischievous"}.get(emotion, emotion)
+        return "default"
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        legacy_hits = compiled_hits = 0
+        for message, expected in LABELLED_CASES:
+            legacy, compiled = self._legacy(message), emotion_service.analyze_emotion(message)
+            legacy_hits += legacy == expected
+            compiled_hits += compiled == expected
+            if compiled != expected:
+                self.stdout.write(f"[불일치] {message!r}: 기대 {expected}, 결과 {compiled} (점수 {emotion_service.score_emotions(message.lower())})")
+        total = len(LABELLED_CASES)
+        self.stdout.write(f"정확도: legacy {legacy_hits}/{total} ({100 * legacy_hits / total:.0f}%), "
+                          f"compiled {compiled_hits}/{total} ({100 * compiled_hits / total:.0f}%)")
+
+        # 실제 응답처럼 몇 문장을 이어 붙인 메시지로 처리량을 잽니다.
+        sentences = [message for message, _ in LABELLED_CASES]
+        messages = [' '.join(rng.sample(sentences, 4)) for _ in range(options['messages'])]
+        for name, classify in (('legacy', self._legacy), ('compiled', emotion_service.analyze_emotion)):
+            started = time.perf_counter()
+            for message in messages:
+                classify(message)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{name:<9}{len(messages) / elapsed:>10.0f} msg/s (평균 {sum(map(len, messages)) // len(messages)}자)")
+        self.stdout.write("LLM_EMOTION_FIELD를 켜면 응답 JSON의 `emotion`을 그대로 쓰므로 이 분류는 값이 없거나 잘못됐을 때만 실행됩니다.")
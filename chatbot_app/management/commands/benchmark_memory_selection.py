@@ -0,0 +1,114 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chatbot_app.models import User, UserAttribute, UserRelationship
+from chatbot_app.services import memory_selection_service
+
+FACT_TYPES = ['취미', '좋아하는 음식', '싫어하는 음식', '알레르기', '반려동물', '전공', '목표', '습관', '좋아하는 가수', '사는 곳', '운동', '여행지']
+WORDS = ['등산', '떡볶이', '피아노', '고양이', '수영', '캠핑', '마라탕', '요가', '재즈', '제주도', '클라이밍', '독서', '뜨개질', '볼링',
+         '베이킹', '사진', '스노보드', '오이', '땅콩', '경제학', '러닝', '서핑', '보드게임', '와인', '필라테스', '도쿄', '아이유', '골프']
+SURNAMES = ['김', '이', '박', '최', '정', '강', '조', '윤', '장', '임']
+SYLLABLES = ['민', '서', '지', '현', '수', '준', '영', '하', '윤', '석', '은', '도', '태', '혜', '우', '진', '아', '나', '연', '호']
+REL_TYPES = ['친구', '대학 동기', '직장 동료', '팀장', '헬스장 친구', '동아리 선배', '이웃', '사촌']
+TRAITS = ['꼼꼼함', '수다스러움', '커피 좋아함', '고양이 키움', '야구 팬', '요리 잘함', '술 못 마심', '여행 좋아함', '늦잠 많음', '운전 잘함']
+
+class _Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = '기억이 많은 합성 사용자로 속성/인간관계 관련도 선택의 비용, 재현율, 프롬프트 크기 감소를 측정합니다. 끝나면 롤백합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attributes', type=int, default=300, help='합성할 사용자 속성 수')
+        parser.add_argument('--relationships', type=int, default=500, help='합성할 인물 수')
+        parser.add_argument('--queries', type=int, default=200, help='측정할 메시지 수')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                user = self._create_synthetic_user(options, rng)
+                self._run(user, options['queries'], rng)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write('합성 데이터를 롤백했습니다.')
+
+    def _create_synthetic_user(self, options, rng):
+        user = User.objects.create(username=f'__benchmark_memory_{rng.randrange(10**9)}')
+        contents = set()
+        while len(contents) < options['attributes']:
+            contents.add((rng.choice(FACT_TYPES), f"{rng.choice(WORDS)} {rng.choice(WORDS)}"))
+        UserAttribute.objects.bulk_create([UserAttribute(user=user, fact_type=t, content=c) for t, c in sorted(contents)])
+        UserAttribute.objects.bulk_create([
+            UserAttribute(user=user, fact_type='이름', content='하늘'),
+            UserAttribute(user=user, fact_type='MBTI', content='INFP'),
+        ])
+
+        names = set()
+        while len(names) < options['relationships']:
+            names.add(rng.choice(SURNAMES) + rng.choice(SYLLABLES) + rng.choice(SYLLABLES))
+        rels = []
+        for name in sorted(names):
+            rel = UserRelationship(user=user, name=name, relationship_type=rng.choice(REL_TYPES))
+            rel.add_traits(rng.sample(TRAITS, 2))
+            rel.context_line = rel.build_context_line()
+            rels.append(rel)
+        rels.append(UserRelationship(user=user, name='엄마', relationship_type='가족'))
+        rels[-1].context_line = rels[-1].build_context_line()
+        UserRelationship.objects.bulk_create(rels)
+        self.stdout.write(f"합성 사용자: 속성 {options['attributes'] + 2}개, 인물 {len(rels)}명")
+        return user
+
+    def _build_query(self, attributes, relationships, rng):
+        """속성 하나 또는 인물 하나를 겨냥한 메시지와 정답 (섹션, ID)를 만듭니다."""
+        if rng.random() < 0.5:
+            attr = rng.choice(attributes)
+            return f"요즘 {attr.content} 때문에 {attr.fact_type} 얘기를 자주 하게 되네", ('attribute', attr.id)
+        rel = rng.choice([rel for rel in relationships if len(rel.name) == 3])
+        given = rel.name[1:]
+        kind, mention = rng.choice([
+            ('full name', rel.name), ('given name', given), ('nickname', f"{given}이"), ('syllable', f"{given[-1]}이"),
+        ])
+        return f"어제 {mention}랑 저녁 먹었는데 재밌었어", (f'relationship ({kind})', rel.id)
+
+    def _run(self, user, queries, rng):
+        attributes = list(UserAttribute.objects.filter(user=user).order_by('id'))
+        relationships = list(UserRelationship.objects.filter(user=user).order_by('id'))
+        full_chars = (
+            len(", ".join(f"{a.fact_type}: {a.content}" for a in attributes))
+            + len("; ".join(r.context_line for r in relationships))
+        )
+
+        latencies, selected_chars, hits = [], [], {}
+        for _ in range(queries):
+            message, (section, target_id) = self._build_query(attributes, relationships, rng)
+            texts = [message]
+            started = time.perf_counter()
+            chosen_attributes = memory_selection_service.select_attributes(user, texts)
+            chosen_relationships = memory_selection_service.select_relationships(user, texts)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+            selected_chars.append(
+                len(", ".join(f"{a.fact_type}: {a.content}" for a in chosen_attributes))
+                + len("; ".join(r.context_line for r in chosen_relationships))
+            )
+            chosen = chosen_attributes if section == 'attribute' else chosen_relationships
+            hit = hits.setdefault(section, [0, 0])
+            hit[0] += any(item.id == target_id for item in chosen)
+            hit[1] += 1
+
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        avg_chars = statistics.mean(selected_chars)
+        self.stdout.write(f"선택 시간: p50 {statistics.median(latencies):.1f}ms, p95 {p95:.1f}ms (DB 조회 포함)")
+        self.stdout.write(
+            f"속성+인간관계 컨텍스트: 전체 {full_chars}자 → 선택 평균 {avg_chars:.0f}자 "
+            f"({100 * (1 - avg_chars / full_chars):.1f}% 감소)"
+        )
+        for section, (hit, total) in sorted(hits.items()):
+            self.stdout.write(f"{section} 재현율: {hit}/{total} ({100 * hit / total:.1f}%)")
@@ -0,0 +1,79 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot_app.models import ChatMessage, User
+from chatbot_app.services import lexical_service, retrieval_service, vector_service
+from chatbot_app.services.text_service import tokenize
+
+class Command(BaseCommand):
+    help = '알려진 메시지 찾기(known-item) 쿼리로 어휘/벡터/하이브리드 검색의 recall@k와 지연 시간을 비교합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='대상 사용자 이름')
+        parser.add_argument('--queries', type=int, default=50, help='생성할 쿼리 수')
+        parser.add_argument('--k', type=int, default=5, help='recall@k의 k')
+        parser.add_argument('--span', type=float, default=0.5, help='원문에서 쿼리로 잘라낼 토큰 비율')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"사용자를 찾을 수 없습니다: {options['user']}")
+
+        k = options['k']
+        rng = random.Random(options['seed'])
+        queries = self._build_queries(user, options['queries'], options['span'], rng)
+        if not queries:
+            raise CommandError('쿼리를 만들 만큼 충분히 긴 메시지가 없습니다.')
+        self.stdout.write(f"{user.username}: 쿼리 {len(queries)}개, k={k}")
+
+        modes = {
+            'lexical': lambda q: [str(message_id) for message_id, _ in lexical_service.search(user.id, q, k)],
+            'hybrid': lambda q: [meta['message_id'] for meta in retrieval_service.hybrid_search(user, q, k)['metadatas']],
+        }
+        if vector_service.is_vector_db_ready():
+            modes['vector'] = lambda q: [
+                meta['message_id'] for meta in vector_service.query_similar_messages(None, q, user.id, k)['metadatas']
+            ]
+        else:
+            self.stdout.write(self.style.WARNING('벡터 DB가 비활성화 상태라 vector 모드는 건너뜁니다. (hybrid = 어휘 전용 경로)'))
+
+        self.stdout.write(f"{'mode':<8} {'recall@k':>9} {'MRR':>6} {'p50 ms':>8} {'p95 ms':>8}")
+        for mode, run in modes.items():
+            latencies, hits, reciprocal_ranks = [], 0, []
+            for query, target_id in queries:
+                started = time.perf_counter()
+                ranked = run(query)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if target_id in ranked[:k]:
+                    hits += 1
+                    reciprocal_ranks.append(1 / (ranked.index(target_id) + 1))
+                else:
+                    reciprocal_ranks.append(0.0)
+
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"{mode:<8} {hits / len(queries):>9.3f} {statistics.mean(reciprocal_ranks):>6.3f} "
+                f"{statistics.median(latencies):>8.1f} {p95:>8.1f}"
+            )
+
+    def _build_queries(self, user, n_queries, span, rng):
+        """사용자 메시지에서 연속된 토큰 일부를 잘라 쿼리로 쓰고, 원 메시지를 정답으로 삼습니다."""
+        candidates = [
+            (message_id, tokens)
+            for message_id, text in ChatMessage.objects.filter(user=user, is_user=True).values_list('id', 'message')
+            if len(tokens := tokenize(text)) >= 4
+        ]
+        rng.shuffle(candidates)
+
+        queries = []
+        for message_id, tokens in candidates[:n_queries]:
+            length = max(2, int(len(tokens) * span))
+            start = rng.randrange(0, len(tokens) - length + 1)
+            queries.append((' '.join(tokens[start:start + length]), str(message_id)))
+        return queries
@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot_app.models import ChatMessage
+from chatbot_app.services import quantization_service, vector_service
+
+class Command(BaseCommand):
+    help = '실제 대화 임베딩으로 압축 저장 모드(float16/int8/binary)의 recall@k, 메모리, 검색 지연을 float32와 비교합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', default=[], help='대상 사용자 이름 (생략 시 전체)')
+        parser.add_argument('--limit', type=int, default=2000, help='벤치마크에 사용할 최근 메시지 수')
+        parser.add_argument('--queries', type=int, default=100, help='코퍼스에서 떼어내 쿼리로 쓸 메시지 수')
+        parser.add_argument('--k', type=int, default=10, help='recall@k의 k')
+        parser.add_argument('--source', choices=['pinecone', 'openai'], default='pinecone',
+                            help='임베딩 출처: 이미 저장된 Pinecone 벡터를 읽거나 OpenAI로 새로 임베딩')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        k = options['k']
+        messages = self._load_messages(options['usernames'], options['limit'])
+        embeddings = self._load_embeddings(messages, options['source'])
+        if len(embeddings) <= options['queries']:
+            raise CommandError(f"임베딩이 {len(embeddings)}개뿐이라 쿼리 {options['queries']}개를 떼어낼 수 없습니다.")
+
+        ids = list(embeddings)
+        random.Random(options['seed']).shuffle(ids)
+        query_ids, corpus_ids = ids[:options['queries']], ids[options['queries']:]
+        self.stdout.write(f"코퍼스 {len(corpus_ids)}개, 쿼리 {len(query_ids)}개, 차원 {len(embeddings[ids[0]])}, k={k}")
+
+        stores = {}
+        for mode in quantization_service.MODES:
+            store = quantization_service.CompactVectorStore(mode)
+            for vector_id in corpus_ids:
+                store.add(vector_id, embeddings[vector_id])
+            stores[mode] = store
+
+        # float32 정확 검색 결과를 정답으로 삼습니다.
+        ground_truth = {
+            query_id: [hit[0] for hit in stores['float32'].search(embeddings[query_id], k)]
+            for query_id in query_ids
+        }
+
+        baseline_bytes = stores['float32'].bytes_per_vector()
+        self.stdout.write(f"{'mode':<8} {'B/vec':>8} {'ratio':>6} {'total KB':>10} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for mode, store in stores.items():
+            latencies, recalls = [], []
+            for query_id in query_ids:
+                started = time.perf_counter()
+                hits = store.search(embeddings[query_id], k)
+                latencies.append((time.perf_counter() - started) * 1000)
+                recalls.append(quantization_service.recall_at_k(ground_truth[query_id], [hit[0] for hit in hits], k))
+
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"{mode:<8} {store.bytes_per_vector():>8.0f} {baseline_bytes / store.bytes_per_vector():>5.1f}x "
+                f"{store.memory_bytes() / 1024:>10.1f} {statistics.mean(recalls):>9.3f} "
+                f"{statistics.median(latencies):>8.2f} {p95:>8.2f}"
+            )
+
+    def _load_messages(self, usernames, limit):
+        queryset = ChatMessage.objects.exclude(message='').order_by('-id')
+        if usernames:
+            queryset = queryset.filter(user__username__in=usernames)
+        return list(queryset.only('id', 'user_id', 'message')[:limit])
+
+    def _load_embeddings(self, messages, source):
+        if source == 'openai':
+            embeddings = {}
+            batch_size = 256
+            for start in range(0, len(messages), batch_size):
+                batch = messages[start:start + batch_size]
+                for message, embedding in zip(batch, vector_service.get_embeddings([m.message for m in batch])):
+                    embeddings[str(message.id)] = embedding
+            return embeddings
+
+        pinecone_index = vector_service.get_pinecone_index()
+        if pinecone_index is None:
+            raise CommandError('벡터 DB가 비활성화 상태입니다. --source openai를 사용하거나 Pinecone 환경 변수를 확인해주세요.')
+
+        ids_by_namespace = defaultdict(list)
+        for message in messages:
+            ids_by_namespace[vector_service.user_namespace(message.user_id)].append(str(message.id))
+
+        embeddings = {}
+        for namespace, ids in ids_by_namespace.items():
+            for start in range(0, len(ids), vector_service.FETCH_BATCH_SIZE):
+                response = pinecone_index.fetch(ids=ids[start:start + vector_service.FETCH_BATCH_SIZE], namespace=namespace)
+                for vector_id, vector in response.vectors.items():
+                    embeddings[vector_id] = list(vector.values)
+        return embeddings
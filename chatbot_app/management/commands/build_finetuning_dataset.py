@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows에는 resource 모듈이 없으므로 최대 RSS는 보고하지 않습니다.
+    resource = None
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from chatbot_app.models import ChatMessage, User
+from chatbot_app.services import finetuning_service
+from chatbot_app.services.finetuning_dataset_service import (
+    DuplicateIndex, ShardedWriter, is_usable, is_validation, iter_turn_windows, to_chat_messages,
+)
+
+def _peak_rss_mb():
+    """이 프로세스의 최대 RSS(MB). ru_maxrss 단위는 Linux에서 KB, macOS에서 바이트입니다."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+class Command(BaseCommand):
+    help = (
+        'ChatMessage 이력을 스트리밍으로 읽어 익명화된 파인튜닝 데이터셋(train/validation, gzip JSONL 샤드)을 만듭니다. '
+        '완전/근사 중복(MinHash LSH)과 길이 조건에 맞지 않는 예제는 버립니다.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default='finetuning_dataset', help='샤드와 manifest.json을 쓸 디렉터리')
+        parser.add_argument('--user', action='append', type=int, dest='user_ids', help='이 사용자 ID만 포함 (여러 번 지정 가능)')
+        parser.add_argument('--since', help='이 날짜(YYYY-MM-DD) 이후 메시지만 사용')
+        parser.add_argument('--context-turns', type=int, default=2, help='예제 앞에 붙일 직전 주고받기 수')
+        parser.add_argument('--min-chars', type=int, default=2, help='봇 응답 최소 글자 수')
+        parser.add_argument('--max-chars', type=int, default=4000, help='컨텍스트 포함 예제 최대 글자 수')
+        parser.add_argument('--threshold', type=float, default=0.8, help='근사 중복으로 볼 추정 Jaccard 유사도')
+        parser.add_argument('--val-ratio', type=float, default=0.05, help='validation 비율')
+        parser.add_argument('--shard-size', type=int, default=50000, help='샤드당 예제 수')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='DB에서 한 번에 가져올 행 수')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['val_ratio'] < 1:
+            raise CommandError('--val-ratio는 0 이상 1 미만이어야 합니다.')
+        output_dir = options['output_dir']
+        os.makedirs(output_dir, exist_ok=True)
+        if any(name.endswith('.jsonl.gz') for name in os.listdir(output_dir)):
+            raise CommandError(f"{output_dir}에 이미 샤드가 있습니다. 빈 디렉터리를 지정하세요.")
+
+        messages = ChatMessage.objects.order_by('user_id', 'timestamp', 'id')
+        if options['user_ids']:
+            messages = messages.filter(user_id__in=options['user_ids'])
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('--since는 YYYY-MM-DD 형식이어야 합니다.')
+            messages = messages.filter(timestamp__date__gte=since)
+        # values_list + iterator: 모델 인스턴스를 만들지 않고 (PostgreSQL에서는 서버 측 커서로) 조금씩 읽습니다.
+        rows = messages.values_list('user_id', 'message', 'is_user').iterator(chunk_size=options['chunk_size'])
+
+        writers = {split: ShardedWriter(output_dir, split, options['shard_size']) for split in ('train', 'validation')}
+        stats = {'examples': 0, 'filtered': 0, 'anonymize_failed': 0}
+        started = time.perf_counter()
+        with tempfile.TemporaryDirectory() as tmp:
+            index = DuplicateIndex(os.path.join(tmp, 'dedupe.sqlite3'), threshold=options['threshold'])
+            try:
+                self._build(rows, options, index, writers, stats)
+            finally:
+                index.close()
+                for writer in writers.values():
+                    writer.close()
+        elapsed = time.perf_counter() - started
+
+        manifest = {
+            'train': {'examples': writers['train'].total, 'shards': [os.path.basename(p) for p in writers['train'].paths]},
+            'validation': {'examples': writers['validation'].total, 'shards': [os.path.basename(p) for p in writers['validation'].paths]},
+            'candidates': stats['examples'],
+            'filtered': stats['filtered'],
+            'anonymize_failed': stats['anonymize_failed'],
+            'exact_duplicates': index.exact_duplicates,
+            'near_duplicates': index.near_duplicates,
+            'options': {key: options[key] for key in ('user_ids', 'since', 'context_turns', 'min_chars', 'max_chars', 'threshold', 'val_ratio')},
+        }
+        with open(os.path.join(output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        peak_mb = _peak_rss_mb()
+        self.stdout.write(
+            f"예제 후보 {stats['examples']}개 → train {writers['train'].total}개, validation {writers['validation'].total}개 "
+            f"(길이/실패 응답 {stats['filtered']}, 완전 중복 {index.exact_duplicates}, 근사 중복 {index.near_duplicates}, "
+            f"익명화 실패 {stats['anonymize_failed']})"
+        )
+        self.stdout.write(
+            f"{elapsed:.1f}초, 메시지 {stats['messages'] / max(elapsed, 1e-9):.0f}개/s, "
+            f"예제 {stats['examples'] / max(elapsed, 1e-9):.0f}개/s"
+            + (f", 최대 RSS {peak_mb:.0f}MB" if peak_mb is not None else "")
+        )
+        self.stdout.write(self.style.SUCCESS(f"{output_dir}에 데이터셋을 썼습니다."))
+
+    def _build(self, rows, options, index, writers, stats):
+        stats['messages'] = 0
+
+        def counted(source):
+            for row in source:
+                stats['messages'] += 1
+                yield row
+
+        current_user_id, system_prompt, anonymizer = None, None, None
+        for example in iter_turn_windows(counted(rows), options['context_turns']):
+            stats['examples'] += 1
+            if not is_usable(example, options['min_chars'], options['max_chars']):
+                stats['filtered'] += 1
+                continue
+            if example['user_id'] != current_user_id:
+                # 입력이 사용자 순으로 정렬되어 있으므로 사용자당 한 번만 매처를 가져옵니다.
+                current_user_id = example['user_id']
+                try:
+                    system_prompt, anonymizer = finetuning_service.get_anonymizer(User.objects.get(pk=current_user_id))
+                except Exception as e:
+                    print(f"--- Could not build anonymizer for user {current_user_id}: {e} ---")
+                    system_prompt, anonymizer = None, None
+            if anonymizer is None:
+                # 익명화할 수 없는 사용자의 대화는 실명이 남을 수 있으므로 넣지 않습니다.
+                stats['anonymize_failed'] += 1
+                continue
+
+            messages = to_chat_messages(system_prompt, example, anonymizer.anonymize)
+            # 중복 판별은 (익명화 후) 마지막 주고받기 기준입니다. 같은 답을 다른 사용자에게 한 경우도 걸러냅니다.
+            key = f"{messages[-2]['content']}\n{messages[-1]['content']}"
+            if not index.add_if_new(key):
+                continue
+            split = 'validation' if is_validation(key, options['val_ratio']) else 'train'
+            writers[split].write({"messages": messages})
@@ -0,0 +1,59 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot_app.models import User
+from chatbot_app.services import consolidation_service, vector_service
+
+class Command(BaseCommand):
+    help = '보존 기간이 지난 대화를 기간별 요약 벡터로 통합하고 원본 메시지 벡터를 삭제합니다. 주기적으로 실행하며, 매번 새로 오래된 기간만 처리합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', default=[], help='대상 사용자 이름 (생략 시 전체)')
+        parser.add_argument('--retention-days', type=int, default=consolidation_service.MEMORY_RETENTION_DAYS,
+                            help='이 일수보다 오래된 대화만 통합 (기본: MEMORY_RETENTION_DAYS)')
+        parser.add_argument('--window-days', type=int, default=consolidation_service.MEMORY_CONSOLIDATION_WINDOW_DAYS,
+                            help='요약 하나가 담당하는 기간(일) (기본: MEMORY_CONSOLIDATION_WINDOW_DAYS)')
+        parser.add_argument('--keep-raw', action='store_true', help='요약 벡터만 추가하고 원본 메시지 벡터는 삭제하지 않음')
+        parser.add_argument('--dry-run', action='store_true', help='통합할 기간만 출력하고 아무것도 변경하지 않음')
+
+    def handle(self, *args, **options):
+        if options['retention_days'] < 1 or options['window_days'] < 1:
+            raise CommandError('--retention-days와 --window-days는 1 이상이어야 합니다.')
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not options['dry_run']:
+            if not api_key:
+                raise CommandError('OPENAI_API_KEY 환경 변수가 설정되지 않았습니다.')
+            if not vector_service.is_vector_db_ready():
+                raise CommandError('벡터 DB가 비활성화 상태입니다. Pinecone 환경 변수를 확인해주세요.')
+
+        users = User.objects.filter(chatmessage__isnull=False).distinct()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"기억 통합을 시작합니다... (보존 {options['retention_days']}일, 기간 {options['window_days']}일)"
+        ))
+        total_windows = total_messages = 0
+        for user in users.iterator():
+            try:
+                results = consolidation_service.consolidate_user(
+                    user, api_key,
+                    retention_days=options['retention_days'],
+                    window_days=options['window_days'],
+                    delete_raw=not options['keep_raw'],
+                    dry_run=options['dry_run'],
+                )
+            except Exception as e:
+                # 한 사용자의 실패가 나머지 사용자의 통합을 막지 않도록 하고, 다음 실행에서 이어서 처리합니다.
+                self.stdout.write(self.style.ERROR(f'  - {user.username}: 통합 중 오류 발생, 다음 실행에서 재시도합니다: {e}'))
+                continue
+            if not results:
+                continue
+            messages = sum(result['message_count'] for result in results)
+            total_windows += len(results)
+            total_messages += messages
+            self.stdout.write(f'  - {user.username}: 기간 {len(results)}개, 메시지 {messages}개'
+                              + (' (dry-run)' if options['dry_run'] else ''))
+
+        self.stdout.write(self.style.SUCCESS(f'기억 통합이 완료되었습니다. 기간 {total_windows}개, 메시지 {total_messages}개'))
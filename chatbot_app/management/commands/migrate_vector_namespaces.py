@@ -0,0 +1,71 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chatbot_app.models import ChatMessage
+from chatbot_app.services import vector_service
+
+class Command(BaseCommand):
+    help = '공유 네임스페이스에 쌓인 기존 벡터를 사용자별 네임스페이스(user-<id>)로 옮깁니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source-namespace', default='', help='기존 벡터가 저장된 네임스페이스 (기본값: 기본 네임스페이스)')
+        parser.add_argument('--keep-source', action='store_true', help='옮긴 뒤에도 원본 벡터를 삭제하지 않음')
+        parser.add_argument('--delete-orphans', action='store_true', help='RDB에 대응하는 ChatMessage가 없는 벡터를 삭제')
+        parser.add_argument('--dry-run', action='store_true', help='실제로 옮기지 않고 대상 수만 집계')
+
+    def handle(self, *args, **options):
+        pinecone_index = vector_service.get_pinecone_index()
+        if pinecone_index is None:
+            raise CommandError('벡터 DB가 비활성화 상태입니다. Pinecone 환경 변수를 확인해주세요.')
+
+        source_namespace = options['source_namespace']
+        moved = orphaned = 0
+
+        self.stdout.write(self.style.SUCCESS('벡터 네임스페이스 이전을 시작합니다...'))
+        # list()는 ID를 페이지 단위로 돌려주므로, 페이지별로 조회 → 이전 → 삭제를 끝내고 다음으로 넘어갑니다.
+        for id_page in pinecone_index.list(namespace=source_namespace):
+            if not id_page:
+                continue
+
+            # 벡터 ID는 ChatMessage.id이므로, 메타데이터(과거에는 username) 대신 RDB에서 소유자를 확정합니다.
+            numeric_ids = [int(vector_id) for vector_id in id_page if vector_id.isdigit()]
+            owners = dict(ChatMessage.objects.filter(id__in=numeric_ids).values_list('id', 'user_id'))
+            orphan_ids = [vector_id for vector_id in id_page if not vector_id.isdigit() or int(vector_id) not in owners]
+            orphaned += len(orphan_ids)
+
+            movable_ids = [vector_id for vector_id in id_page if vector_id not in orphan_ids]
+            if options['dry_run']:
+                moved += len(movable_ids)
+                continue
+
+            vectors_by_namespace = defaultdict(list)
+            for start in range(0, len(movable_ids), vector_service.FETCH_BATCH_SIZE):
+                response = pinecone_index.fetch(
+                    ids=movable_ids[start:start + vector_service.FETCH_BATCH_SIZE], namespace=source_namespace
+                )
+                for vector_id, vector in response.vectors.items():
+                    user_id = owners[int(vector_id)]
+                    metadata = dict(vector.metadata or {})
+                    metadata['user_id'] = str(user_id)
+                    vectors_by_namespace[vector_service.user_namespace(user_id)].append(
+                        {"id": vector_id, "values": vector.values, "metadata": metadata}
+                    )
+
+            for namespace, vectors in vectors_by_namespace.items():
+                vector_service.upsert_vectors(vectors, namespace)
+                moved += len(vectors)
+
+            # 대상 네임스페이스에 모두 기록된 뒤에만 원본을 지웁니다.
+            ids_to_delete = [] if options['keep_source'] else list(movable_ids)
+            if options['delete_orphans']:
+                ids_to_delete += orphan_ids
+            if ids_to_delete:
+                pinecone_index.delete(ids=ids_to_delete, namespace=source_namespace)
+
+            self.stdout.write(f'  - 이전 {moved}건, 고아 벡터 {orphaned}건')
+
+        summary = f'완료: 이전 {moved}건, 고아 벡터 {orphaned}건'
+        if options['dry_run']:
+            summary += ' (dry-run, 변경 없음)'
+        self.stdout.write(self.style.SUCCESS(summary))
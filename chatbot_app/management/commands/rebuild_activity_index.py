@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from chatbot_app.models import User
+from chatbot_app.services import activity_search_service
+
+class Command(BaseCommand):
+    help = 'UserActivity로부터 사용자별 활동 검색(n-gram) 색인을 다시 만듭니다. 기존 활동 백필에도 사용합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', default=[], help='대상 사용자 이름 (생략 시 전체)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(activities__isnull=False).distinct()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        self.stdout.write(self.style.SUCCESS('활동 검색 색인 재구축을 시작합니다...'))
+        for user in users.iterator():
+            indexed = activity_search_service.rebuild_user_index(user.id)
+            self.stdout.write(f'  - {user.username}: 활동 {indexed}개 색인')
+        self.stdout.write(self.style.SUCCESS('활동 검색 색인 재구축이 완료되었습니다.'))
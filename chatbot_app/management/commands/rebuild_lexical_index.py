@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from chatbot_app.models import User
+from chatbot_app.services import lexical_service
+
+class Command(BaseCommand):
+    help = 'ChatMessage로부터 사용자별 어휘(n-gram) 검색 색인을 다시 만듭니다. 기존 메시지 백필에도 사용합니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', default=[], help='대상 사용자 이름 (생략 시 전체)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(chatmessage__isnull=False).distinct()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        self.stdout.write(self.style.SUCCESS('어휘 색인 재구축을 시작합니다...'))
+        for user in users.iterator():
+            indexed = lexical_service.rebuild_user_index(user.id)
+            self.stdout.write(f'  - {user.username}: 메시지 {indexed}개 색인')
+        self.stdout.write(self.style.SUCCESS('어휘 색인 재구축이 완료되었습니다.'))
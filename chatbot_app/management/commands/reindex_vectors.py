@@ -0,0 +1,261 @@
+import json
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from chatbot_app.models import ChatMessage, MemorySummary, User
+from chatbot_app.services import vector_service
+
+DEFAULT_CHECKPOINT_PATH = os.path.join(settings.BASE_DIR, '.reindex_vectors_checkpoint.json')
+
+class Command(BaseCommand):
+    help = 'ChatMessage(RDB)를 기준으로 Pinecone 벡터 인덱스를 재구축/백필합니다. 중단되어도 체크포인트부터 재개할 수 있습니다.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', default=[], help='대상 사용자 이름 (여러 번 지정 가능)')
+        parser.add_argument('--since', help='이 날짜(YYYY-MM-DD)부터의 메시지만 처리')
+        parser.add_argument('--until', help='이 날짜(YYYY-MM-DD)까지의 메시지만 처리')
+        parser.add_argument('--mode', choices=['message', 'turn'], default=vector_service.VECTOR_INDEX_MODE,
+                            help='색인 단위: 메시지별 벡터(message) 또는 사용자/AI 한 쌍당 벡터(turn)')
+        parser.add_argument('--delete-message-vectors', action='store_true',
+                            help='turn 모드에서, 청크로 옮긴 메시지의 기존 메시지 단위 벡터를 삭제 (마이그레이션용)')
+        parser.add_argument('--include-consolidated', action='store_true',
+                            help='요약 벡터로 통합된 기간의 메시지도 다시 색인 (기본: 건너뜀)')
+        parser.add_argument('--batch-size', type=int, default=256, help='한 번의 임베딩 요청에 담을 메시지 수')
+        parser.add_argument('--upsert-batch-size', type=int, default=100, help='한 번의 Upsert 요청에 담을 벡터 수')
+        parser.add_argument('--workers', type=int, default=4, help='동시에 진행할 Upsert 요청 수의 상한')
+        parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH, help='진행 상황을 기록할 체크포인트 파일 경로')
+        parser.add_argument('--reset', action='store_true', help='기존 체크포인트를 무시하고 처음부터 시작')
+        parser.add_argument('--force', action='store_true', help='content_hash가 같아도 다시 임베딩')
+        parser.add_argument('--purge', action='store_true', help='--user로 지정한 사용자의 네임스페이스를 비운 뒤 처음부터 재색인')
+
+    def handle(self, *args, **options):
+        if not vector_service.is_vector_db_ready():
+            raise CommandError('벡터 DB가 비활성화 상태입니다. Pinecone 환경 변수를 확인해주세요.')
+        if options['delete_message_vectors'] and options['mode'] != 'turn':
+            raise CommandError('--delete-message-vectors는 --mode turn과 함께 사용해야 합니다.')
+
+        self.mode = options['mode']
+        self.delete_message_vectors = options['delete_message_vectors']
+        self.batch_size = options['batch_size']
+        self.upsert_batch_size = options['upsert_batch_size']
+        self.force = options['force']
+        self.checkpoint_path = options['checkpoint']
+        # turn 모드에서 아직 AI 응답을 만나지 못한 사용자 메시지 (user_id → ChatMessage)
+        self.pending_user_messages = {}
+
+        filters = {
+            'usernames': sorted(options['usernames']),
+            'since': options['since'],
+            'until': options['until'],
+            'mode': self.mode,
+            'include_consolidated': options['include_consolidated'],
+        }
+        if options['purge']:
+            if not filters['usernames']:
+                raise CommandError('--purge는 --user와 함께 사용해야 합니다.')
+            for user_id in User.objects.filter(username__in=filters['usernames']).values_list('id', flat=True):
+                if not vector_service.delete_user_vectors(user_id):
+                    raise CommandError(f"사용자 ID {user_id}의 네임스페이스를 비우지 못했습니다.")
+            # 비운 네임스페이스에는 비교할 해시가 없으므로 체크포인트와 해시 조회를 모두 건너뜁니다.
+            options['reset'] = True
+            self.force = True
+
+        self.state = self._load_checkpoint(filters, options['reset'])
+        if self.state['last_id']:
+            self.stdout.write(f"체크포인트에서 재개합니다: 메시지 ID {self.state['last_id']} 이후")
+
+        queryset = self._build_queryset(filters).filter(id__gt=self.state['last_id'])
+
+        self.stdout.write(self.style.SUCCESS(f'벡터 재색인을 시작합니다... (mode={self.mode})'))
+        self.started_at = time.monotonic()
+        self.processed_this_run = 0
+
+        # 배치별 Upsert 작업을 순서대로 추적해, 앞선 배치가 모두 끝났을 때만 체크포인트를 전진시킵니다.
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            batch = []
+            # iterator()는 PostgreSQL에서 서버 사이드 커서로 동작하므로 전체 행을 메모리에 올리지 않습니다.
+            for message in queryset.iterator(chunk_size=self.batch_size * 4):
+                batch.append(message)
+                if len(batch) >= self.batch_size:
+                    pending.append(self._submit_batch(executor, batch))
+                    batch = []
+                    self._drain(pending, max_pending=options['workers'])
+            if batch or self.pending_user_messages:
+                pending.append(self._submit_batch(executor, batch, final=True))
+            self._drain(pending, max_pending=0)
+
+        self._report(final=True)
+        # 완료된 작업의 체크포인트는 지워, 다음 실행은 처음부터(해시 비교로 저렴하게) 다시 훑도록 합니다.
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.stdout.write(self.style.SUCCESS('벡터 재색인이 완료되었습니다.'))
+
+    def _build_queryset(self, filters):
+        queryset = ChatMessage.objects.order_by('id')
+        if filters['usernames']:
+            queryset = queryset.filter(user__username__in=filters['usernames'])
+        if filters['since']:
+            queryset = queryset.filter(timestamp__gte=self._parse_date(filters['since'], dt_time.min))
+        if filters['until']:
+            queryset = queryset.filter(timestamp__lte=self._parse_date(filters['until'], dt_time.max))
+        if not filters['include_consolidated']:
+            # 통합 워터마크 이전의 메시지는 요약 벡터가 대신하므로 원본 벡터를 되살리지 않습니다.
+            watermark = MemorySummary.objects.filter(user=OuterRef('user')).order_by('-period_end').values('period_end')[:1]
+            queryset = queryset.annotate(consolidated_until=Subquery(watermark)).filter(
+                Q(consolidated_until__isnull=True) | Q(timestamp__gte=F('consolidated_until'))
+            )
+        return queryset
+
+    def _parse_date(self, value, day_time):
+        try:
+            parsed = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"날짜 형식이 올바르지 않습니다 (YYYY-MM-DD): {value}")
+        return timezone.make_aware(datetime.combine(parsed, day_time))
+
+    def _build_chunks(self, batch, final):
+        """배치의 메시지를 색인 모드에 맞는 청크 목록으로 바꿉니다."""
+        if self.mode == 'message':
+            return [vector_service.build_message_chunk(message) for message in batch]
+
+        chunks = []
+        for message in batch:
+            pending_user_message = self.pending_user_messages.pop(message.user_id, None)
+            if message.is_user:
+                # 응답 없이 다음 사용자 메시지가 왔다면, 이전 메시지는 사용자 발화만으로 청크를 만듭니다.
+                if pending_user_message is not None:
+                    chunks.extend(vector_service.build_turn_chunks(pending_user_message))
+                self.pending_user_messages[message.user_id] = message
+            elif pending_user_message is not None:
+                chunks.extend(vector_service.build_turn_chunks(pending_user_message, message))
+            else:
+                # 앞선 사용자 메시지가 없는 AI 메시지(첫인사 등)는 메시지 단위로 색인합니다.
+                chunks.append(vector_service.build_message_chunk(message))
+
+        if final:
+            for pending_user_message in self.pending_user_messages.values():
+                chunks.extend(vector_service.build_turn_chunks(pending_user_message))
+            self.pending_user_messages = {}
+        return chunks
+
+    def _submit_batch(self, executor, batch, final=False):
+        """배치를 청크화 → 해시 비교 → 임베딩 → 병렬 Upsert 순으로 처리하고, 완료 대기에 필요한 정보를 반환합니다."""
+        all_chunks = self._build_chunks(batch, final)
+        chunks = [chunk for chunk in all_chunks if chunk['text'] and chunk['text'].strip()]
+
+        # 벡터는 사용자 네임스페이스별로 저장되므로 해시 조회와 Upsert도 사용자 단위로 나눕니다.
+        by_namespace = defaultdict(list)
+        for chunk in chunks:
+            by_namespace[vector_service.user_namespace(chunk['metadata']['user_id'])].append(chunk)
+
+        changed = []
+        for namespace, namespace_chunks in by_namespace.items():
+            if self.force:
+                changed.extend(namespace_chunks)
+                continue
+            stored_hashes = vector_service.fetch_content_hashes([chunk['id'] for chunk in namespace_chunks], namespace)
+            changed.extend(
+                chunk for chunk in namespace_chunks
+                if stored_hashes.get(chunk['id']) != chunk['metadata']['content_hash']
+            )
+
+        futures = []
+        if changed:
+            # 임베딩은 사용자와 무관하므로 배치 전체를 한 번의 요청으로 처리합니다.
+            embeddings = vector_service.get_embeddings([chunk['text'] for chunk in changed])
+            vectors_by_namespace = defaultdict(list)
+            for chunk, embedding in zip(changed, embeddings):
+                vectors_by_namespace[vector_service.user_namespace(chunk['metadata']['user_id'])].append(
+                    vector_service.attach_embedding(chunk, embedding)
+                )
+            for namespace, vectors in vectors_by_namespace.items():
+                for start in range(0, len(vectors), self.upsert_batch_size):
+                    futures.append(executor.submit(
+                        vector_service.upsert_vectors, vectors[start:start + self.upsert_batch_size], namespace
+                    ))
+
+        # turn 청크로 옮겨진 메시지의 기존 메시지 단위 벡터 ID (Upsert 완료 후 삭제)
+        obsolete_ids = defaultdict(list)
+        if self.delete_message_vectors:
+            for chunk in chunks:
+                if chunk['metadata']['kind'] == 'turn':
+                    obsolete_ids[vector_service.user_namespace(chunk['metadata']['user_id'])].extend(
+                        chunk['metadata']['message_ids']
+                    )
+
+        # 아직 짝을 찾지 못한 사용자 메시지가 있으면, 재개 시 그 메시지부터 다시 읽도록 체크포인트를 앞에 둡니다.
+        safe_last_id = batch[-1].id if batch else self.state['last_id']
+        if self.pending_user_messages:
+            safe_last_id = min(safe_last_id, min(m.id for m in self.pending_user_messages.values()) - 1)
+
+        return {
+            'last_id': safe_last_id,
+            'processed': len(batch),
+            'vectors': len(chunks),
+            'upserted': len(changed),
+            'skipped': len(all_chunks) - len(changed),
+            'embedded_chars': sum(len(chunk['text']) for chunk in changed),
+            'obsolete_ids': obsolete_ids,
+            'futures': futures,
+        }
+
+    def _drain(self, pending, max_pending):
+        """대기 중인 배치가 max_pending개 이하가 될 때까지 가장 오래된 배치를 완료시키고 체크포인트를 기록합니다."""
+        while len(pending) > max_pending:
+            result = pending.popleft()
+            for future in result['futures']:
+                # Upsert 실패 시 예외를 그대로 올려 체크포인트가 실패한 배치를 넘어가지 않도록 합니다.
+                future.result()
+            for namespace, ids in result['obsolete_ids'].items():
+                vector_service.delete_vectors(ids, namespace)
+
+            self.state['last_id'] = max(self.state['last_id'], result['last_id'])
+            for key in ('processed', 'vectors', 'upserted', 'skipped', 'embedded_chars'):
+                self.state[key] += result[key]
+            self.processed_this_run += result['processed']
+            self._save_checkpoint()
+            self._report()
+
+    def _report(self, final=False):
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        rate = self.processed_this_run / elapsed
+        processed = self.state['processed']
+        vectors_per_message = self.state['vectors'] / processed if processed else 0.0
+        line = (
+            f"  - 처리 {processed}건 → 벡터 {self.state['vectors']}개 ({vectors_per_message:.2f}/msg), "
+            f"Upsert {self.state['upserted']}, 스킵 {self.state['skipped']}, "
+            f"임베딩 {self.state['embedded_chars']}자, 마지막 ID {self.state['last_id']}, {rate:.1f} msg/s"
+        )
+        self.stdout.write(self.style.SUCCESS(line) if final else line)
+
+    def _load_checkpoint(self, filters, reset):
+        empty_state = {
+            'filters': filters, 'last_id': 0, 'processed': 0, 'vectors': 0,
+            'upserted': 0, 'skipped': 0, 'embedded_chars': 0,
+        }
+        if reset or not os.path.exists(self.checkpoint_path):
+            return empty_state
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('filters') != filters:
+            raise CommandError(
+                f"체크포인트({self.checkpoint_path})의 필터가 현재 옵션과 다릅니다. "
+                "같은 옵션으로 다시 실행하거나 --reset으로 처음부터 시작해주세요."
+            )
+        return {**empty_state, **state}
+
+    def _save_checkpoint(self):
+        # 임시 파일에 쓴 뒤 교체하여, 기록 도중 중단되어도 체크포인트가 깨지지 않도록 합니다.
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
@@ -1,79 +1,130 @@
-from django.core.management.base import BaseCommand
-from django.db.models import Count
-from django.utils import timezone # [수정] timezone 모듈 사용
-from datetime import timedelta, datetime
-from chatbot_app.models import UserActivity, ActivityAnalytics, User
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from chatbot_app.models import User
+from chatbot_app.services import analytics_service
+
+def _init_worker():
+    # spawn 방식으로 뜬 워커는 Django가 초기화되어 있지 않으므로 직접 설정합니다.
+    # fork 방식이면 이미 준비된 상태라 아무 일도 하지 않고, DB 연결은 각 워커가 처음 쿼리할 때 새로 엽니다.
+    django.setup()
+    connections.close_all()
 
 class Command(BaseCommand):
     help = 'UserActivity(사용자 활동) 항목을 기반으로 ActivityAnalytics(활동 분석) 테이블을 업데이트합니다.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', default=[], help='대상 사용자 이름 (생략 시 전체)')
+        parser.add_argument('--batch-size', type=int, default=200, help='한 트랜잭션에서 함께 집계할 사용자 수 (--full)')
+        parser.add_argument('--full', action='store_true',
+                            help='워터마크와 관계없이 전체 이력을 다시 집계 (활동 수정/삭제 반영, --user 지정 시 항상 전체 재계산)')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='전체 재계산을 사용자 ID 해시로 나눠 돌릴 프로세스 수 (2 이상이면 --full로 동작)')
+        parser.add_argument('--shard', type=int, action='append', dest='shards', default=[],
+                            help='--workers로 나눈 샤드 중 이 번호(1부터)만 다시 실행 (실패한 샤드 재시도용, 여러 번 지정 가능)')
+
     def handle(self, *args, **options):
+        workers = options['workers']
+        if workers < 1:
+            raise CommandError('--workers는 1 이상이어야 합니다.')
+        if any(not 1 <= shard <= workers for shard in options['shards']):
+            raise CommandError(f'--shard는 1부터 --workers({workers}) 사이의 번호여야 합니다.')
+
         self.stdout.write(self.style.SUCCESS('활동 분석 업데이트를 시작합니다...'))
 
+        full = options['full'] or options['usernames'] or workers > 1 or options['shards']
+        if not full:
+            # 기본은 증분 모드: 마지막 실행 이후 새로 생긴 활동이 속한 버킷만 다시 집계합니다.
+            result = analytics_service.update_incrementally()
+            self.stdout.write(self.style.SUCCESS(
+                f"활동 분석 업데이트가 완료되었습니다. 새 활동 {result['activities']}개 → "
+                f"버킷 {result['buckets']}개 갱신, {result['deleted']}개 삭제"
+            ))
+            return
+
+        started_at = timezone.now() - analytics_service.WATERMARK_SAFETY_LAG
+
         # 활동 기록이 있는 사용자만 가져와 처리합니다. (효율성 개선)
-        users = User.objects.filter(useractivity__isnull=False).distinct()
-
-        for user in users:
-            self.stdout.write(f'--- {user.username} 사용자의 활동을 처리합니다. ---')
-            
-            # 해당 사용자의 모든 활동 기록을 가져옵니다.
-            user_activities = UserActivity.objects.filter(user=user).order_by('activity_date')
-
-            grouped_activities = {}
-            for mem in user_activities:
-                key = (mem.place, mem.companion if mem.companion else '')
-                if key not in grouped_activities:
-                    grouped_activities[key] = []
-                grouped_activities[key].append(mem)
-
-            for (place, companion_str), activities in grouped_activities.items():
-                companion = companion_str if companion_str else None
-
-                # 각 기간 유형(주/월/년)별로 통계를 집계하는 함수를 호출합니다.
-                self._aggregate_for_period(user, place, companion, activities, 'weekly')
-                self._aggregate_for_period(user, place, companion, activities, 'monthly')
-                self._aggregate_for_period(user, place, companion, activities, 'yearly')
-        
-        self.stdout.write(self.style.SUCCESS('활동 분석 업데이트가 완료되었습니다.'))
-
-    def _aggregate_for_period(self, user, place, companion, activities, period_type):
-        """주어진 기간 유형(주/월/년)에 따라 활동을 집계하는 헬퍼 함수입니다."""
-        period_counts = {}
-
-        for activity in activities:
-            # activity_date는 날짜(date) 객체이므로 _get_period_start_date로 전달합니다.
-            start_date = self._get_period_start_date(activity.activity_date, period_type)
-            if start_date not in period_counts:
-                period_counts[start_date] = 0
-            period_counts[start_date] += 1
-        
-        # 집계된 횟수 정보를 ActivityAnalytics 테이블에 저장하거나 업데이트합니다.
-        for start_date, count in period_counts.items():
-            ActivityAnalytics.objects.update_or_create(
-                user=user,
-                period_type=period_type,
-                period_start_date=start_date, # start_date는 이미 date 객체
-                place=place,
-                companion=companion,
-                defaults={'count': count}
+        users = User.objects.filter(activities__isnull=False).distinct().order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        user_ids = list(users.values_list('id', flat=True))
+
+        if workers > 1 or options['shards']:
+            total_buckets, total_deleted = self._run_sharded(user_ids, workers, options)
+        else:
+            total_buckets, total_deleted = self._run_single(user_ids, options['batch_size'])
+
+        if not options['usernames'] and not options['shards']:
+            # 전체 재계산이 끝났으므로 이후 증분 실행은 시작 시점 이후의 활동만 보면 됩니다.
+            analytics_service.mark_fully_computed(started_at)
+        self.stdout.write(self.style.SUCCESS(
+            f'활동 분석 업데이트가 완료되었습니다. 버킷 {total_buckets}개 갱신, {total_deleted}개 삭제'
+        ))
+
+    def _run_single(self, user_ids, batch_size):
+        # 집계는 DB에서(기간 함수 + GROUP BY), 기록은 일괄 upsert로 처리하므로
+        # 사용자 묶음당 쿼리 수가 활동/버킷 수와 무관하게 일정합니다.
+        total_buckets = total_deleted = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            result = analytics_service.recompute_users(batch)
+            total_buckets += result['buckets']
+            total_deleted += result['deleted']
+            self.stdout.write(
+                f"  - 사용자 {start + len(batch)}/{len(user_ids)}명 처리: 버킷 {result['buckets']}개 갱신, {result['deleted']}개 삭제"
+            )
+        return total_buckets, total_deleted
+
+    def _run_sharded(self, user_ids, workers, options):
+        """
+        사용자를 샤드로 나눠 프로세스 풀에서 재계산합니다.
+        사용자 단위 재계산은 서로 독립적이므로 결과는 단일 프로세스 실행과 같습니다.
+        """
+        shards = analytics_service.shard_user_ids(user_ids, workers)
+        targets = [shard - 1 for shard in options['shards']] or list(range(workers))
+        if (connection.vendor == 'sqlite' and len(targets) > 1
+                and connection.settings_dict['OPTIONS'].get('transaction_mode') != 'IMMEDIATE'):
+            self.stderr.write(self.style.WARNING(
+                'SQLite는 쓰기를 한 번에 하나만 허용하므로 샤드가 잠금 오류로 실패할 수 있습니다. '
+                '병렬 실행은 PostgreSQL이나 transaction_mode=IMMEDIATE인 SQLite에서 사용하세요.'
+            ))
+
+        # 부모의 DB 연결을 fork된 워커가 공유하면 프로토콜이 꼬이므로, 풀을 만들기 전에 닫아둡니다.
+        connections.close_all()
+        total_buckets = total_deleted = 0
+        failed = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(targets)), initializer=_init_worker) as executor:
+            futures = {
+                executor.submit(analytics_service.recompute_shard, shard, workers, shards[shard], options['batch_size']): shard
+                for shard in targets
+            }
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed.append(shard + 1)
+                    self.stderr.write(f"  - 샤드 {shard + 1}/{workers} 실패: {e}")
+                    continue
+                total_buckets += result['buckets']
+                total_deleted += result['deleted']
+                self.stdout.write(
+                    f"  - 샤드 {shard + 1}/{workers} 완료: 사용자 {result['users']}명, "
+                    f"버킷 {result['buckets']}개 갱신, {result['deleted']}개 삭제"
+                )
+
+        if failed:
+            # 샤드마다 사용자 묶음 단위로 커밋되므로, 실패한 샤드만 다시 돌리면 됩니다. (재계산은 멱등)
+            retry = ' '.join(
+                [f'--user={name}' for name in options['usernames']] + [f'--shard={shard}' for shard in sorted(failed)]
+            )
+            raise CommandError(
+                f"샤드 {sorted(failed)} 처리에 실패했습니다. "
+                f"'update_activity_analytics --workers={workers} {retry}'로 해당 샤드만 다시 실행하세요."
             )
-            self.stdout.write(f'  - {user.username}의 {period_type} 활동 업데이트: {place} ({start_date}) => {count}회')
-
-
-    def _get_period_start_date(self, date_obj, period_type):
-        """특정 날짜가 속한 기간의 시작 날짜를 반환하는 헬퍼 함수입니다."""
-        
-        # date_obj를 로컬 시간대 정보가 없는 date 객체로 가정하고 처리합니다.
-        # timezone.localdate()는 현재 로컬 시간대의 '오늘 날짜'를 반환하므로,
-        # 이 함수에서는 순수 날짜 계산만 수행합니다.
-
-        if period_type == 'weekly':
-            # 해당 날짜가 속한 주의 월요일 날짜를 반환합니다. (월요일: 0, 일요일: 6)
-            return date_obj - timedelta(days=date_obj.weekday())
-        elif period_type == 'monthly':
-            # 해당 날짜가 속한 달의 1일을 반환합니다.
-            return date_obj.replace(day=1)
-        elif period_type == 'yearly':
-            # 해당 날짜가 속한 해의 1월 1일을 반환합니다.
-            return date_obj.replace(month=1, day=1)
-        return date_obj
+        return total_buckets, total_deleted
@@ -0,0 +1,64 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot_app", "0013_messagengram_lexicalindexstats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MemorySummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period_start",
+                    models.DateTimeField(help_text="요약 기간의 시작 시각 (포함)"),
+                ),
+                (
+                    "period_end",
+                    models.DateTimeField(help_text="요약 기간의 종료 시각 (미포함)"),
+                ),
+                ("summary", models.TextField(help_text="기간 동안의 대화 요약")),
+                (
+                    "message_count",
+                    models.PositiveIntegerField(
+                        default=0, help_text="요약에 포함된 메시지 수"
+                    ),
+                ),
+                (
+                    "vector_id",
+                    models.CharField(
+                        help_text="벡터 DB에 저장된 요약 벡터의 ID",
+                        max_length=64,
+                        unique=True,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="memory_summaries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["period_start"],
+                "unique_together": {("user", "period_start")},
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot_app", "0015_activityngram"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryVisitStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "category",
+                    models.CharField(
+                        help_text="장소 카테고리 (예: 카페, 식당, 헬스장)",
+                        max_length=20,
+                    ),
+                ),
+                ("total_visits", models.PositiveIntegerField(default=0)),
+                ("last_visit_date", models.DateField(blank=True, null=True)),
+                (
+                    "places",
+                    models.JSONField(
+                        default=dict, help_text="장소별 방문 횟수와 최근 방문일"
+                    ),
+                ),
+                (
+                    "companions",
+                    models.JSONField(default=dict, help_text="동행인별 방문 횟수"),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="visit_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("user", "category")},
+            },
+        ),
+    ]
@@ -0,0 +1,262 @@
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# 이 마이그레이션을 작성할 때의 place_service.normalize_place (및 text_service의 토큰화/조사 제거) 사본.
+# 이후 서비스 코드의 정규화 규칙이 바뀌어도 이 백필의 결과가 달라지지 않도록 고정해 둡니다.
+NON_WORD_PATTERN = re.compile(r"[^0-9a-z가-힣ㄱ-ㅎㅏ-ㅣ]+")
+KOREAN_PARTICLES = (
+    "에서부터",
+    "으로부터",
+    "에게서",
+    "한테서",
+    "이랑",
+    "에서",
+    "에게",
+    "한테",
+    "까지",
+    "부터",
+    "으로",
+    "하고",
+    "처럼",
+    "보다",
+    "이나",
+    "께서",
+    "은",
+    "는",
+    "이",
+    "가",
+    "을",
+    "를",
+    "와",
+    "과",
+    "랑",
+    "로",
+    "도",
+    "만",
+    "의",
+    "에",
+    "나",
+)
+PLACE_ABBREVIATIONS = {
+    "스벅": "스타벅스",
+    "starbucks": "스타벅스",
+    "투썸": "투썸플레이스",
+    "맥날": "맥도날드",
+    "버킹": "버거킹",
+    "베라": "배스킨라빈스",
+    "던킨": "던킨도너츠",
+    "올영": "올리브영",
+    "롯시": "롯데시네마",
+    "메박": "메가박스",
+}
+BRANCH_SUFFIXES = ("본점", "지점", "점")
+
+
+def _strip_suffix(token, suffixes):
+    for suffix in suffixes:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            return token[: -len(suffix)]
+    return token
+
+
+def normalize_place(raw):
+    text = NON_WORD_PATTERN.sub(" ", raw.lower()).strip() if raw else ""
+    tokens = []
+    for token in text.split():
+        token = _strip_suffix(_strip_suffix(token, KOREAN_PARTICLES), BRANCH_SUFFIXES)
+        tokens.append(PLACE_ABBREVIATIONS.get(token, token))
+    return "".join(sorted(tokens))
+
+
+def backfill_place_entities(apps, schema_editor):
+    """
+    기존 장소 표기를 정규화 키 기준으로 Place에 연결하고,
+    같은 장소로 합쳐진 ActivityAnalytics 행은 횟수를 더해 하나로 병합합니다.
+    (퍼지 매칭은 이후 새로 기록되는 표기부터 적용됩니다.)
+    """
+    Place = apps.get_model("chatbot_app", "Place")
+    PlaceAlias = apps.get_model("chatbot_app", "PlaceAlias")
+    UserActivity = apps.get_model("chatbot_app", "UserActivity")
+    ActivityAnalytics = apps.get_model("chatbot_app", "ActivityAnalytics")
+    places = {}
+
+    def resolve(user_id, raw):
+        key = normalize_place(raw)
+        if not key:
+            return None
+        if (user_id, key) not in places:
+            place, _ = Place.objects.get_or_create(
+                user_id=user_id,
+                normalized_name=key,
+                defaults={"name": raw.strip()[:255]},
+            )
+            PlaceAlias.objects.get_or_create(
+                user_id=user_id, alias=key, defaults={"place": place}
+            )
+            places[(user_id, key)] = place
+        return places[(user_id, key)]
+
+    for activity in (
+        UserActivity.objects.exclude(place__isnull=True).exclude(place="").iterator()
+    ):
+        place = resolve(activity.user_id, activity.place)
+        if place is not None:
+            UserActivity.objects.filter(pk=activity.pk).update(place_entity=place)
+
+    merged = {}
+    for row in ActivityAnalytics.objects.order_by("id").iterator():
+        place = resolve(row.user_id, row.place)
+        if place is None:
+            row.delete()
+            continue
+        key = (
+            row.user_id,
+            row.period_type,
+            row.period_start_date,
+            place.id,
+            row.companion or "",
+        )
+        if key in merged:
+            ActivityAnalytics.objects.filter(pk=merged[key]).update(
+                count=models.F("count") + row.count
+            )
+            row.delete()
+        else:
+            merged[key] = row.pk
+            ActivityAnalytics.objects.filter(pk=row.pk).update(
+                place_entity=place, place=place.name
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot_app", "0016_categoryvisitstats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="activityanalytics",
+            name="place",
+            field=models.CharField(
+                help_text="장소 (표시용, place_entity.name)", max_length=255
+            ),
+        ),
+        migrations.CreateModel(
+            name="Place",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(help_text="표시용 장소 이름", max_length=255),
+                ),
+                (
+                    "normalized_name",
+                    models.CharField(
+                        help_text="정규화된 장소 이름 (비교용)", max_length=255
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="places",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("user", "normalized_name")},
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name="activityanalytics",
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name="activityanalytics",
+            name="place_entity",
+            field=models.ForeignKey(
+                help_text="정규화된 장소",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="analytics",
+                to="chatbot_app.place",
+            ),
+        ),
+        migrations.AddField(
+            model_name="useractivity",
+            name="place_entity",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="정규화된 장소",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="activities",
+                to="chatbot_app.place",
+            ),
+        ),
+        migrations.CreateModel(
+            name="PlaceAlias",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "alias",
+                    models.CharField(help_text="정규화된 장소 표기", max_length=255),
+                ),
+                (
+                    "place",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="aliases",
+                        to="chatbot_app.place",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="place_aliases",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("user", "alias")},
+            },
+        ),
+        migrations.RunPython(backfill_place_entities, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="activityanalytics",
+            unique_together={
+                (
+                    "user",
+                    "period_type",
+                    "period_start_date",
+                    "place_entity",
+                    "companion",
+                )
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def fill_empty_companions(apps, schema_editor):
+    """NULL 동행인을 ''로 바꿉니다. (0017에서 NULL/'' 중복 버킷은 이미 병합됨)"""
+    ActivityAnalytics = apps.get_model("chatbot_app", "ActivityAnalytics")
+    ActivityAnalytics.objects.filter(companion__isnull=True).update(companion="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot_app", "0017_place_placealias_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_empty_companions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="activityanalytics",
+            name="companion",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                help_text="동행인 (없으면 '')",
+                max_length=255,
+            ),
+        ),
+    ]
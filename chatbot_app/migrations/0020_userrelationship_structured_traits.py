@@ -0,0 +1,77 @@
+from django.db import migrations, models
+
+
+def _context_line(rel, traits):
+    parts = [f"이름: {rel.name}", f"serial_code: {rel.serial_code}"]
+    if rel.disambiguator:
+        parts.append(f"식별자: {rel.disambiguator}")
+    parts.append(f"관계 유형: {rel.relationship_type}")
+    if rel.position:
+        parts.append(f"포지션: {rel.position}")
+    if traits:
+        parts.append(f"특징: {', '.join(traits)}")
+    return ", ".join(parts)
+
+
+def split_traits(apps, schema_editor):
+    """쉼표로 이어진 traits 문자열을 중복 없는 리스트로 옮기고 요약 줄을 채웁니다."""
+    UserRelationship = apps.get_model("chatbot_app", "UserRelationship")
+    rels = list(UserRelationship.objects.all())
+    for rel in rels:
+        traits = [t.strip() for t in (rel.traits or "").split(",") if t.strip()]
+        rel.trait_list = list(dict.fromkeys(traits))
+        rel.context_line = _context_line(rel, rel.trait_list)
+    UserRelationship.objects.bulk_update(
+        rels, ["trait_list", "context_line"], batch_size=500
+    )
+
+
+def join_traits(apps, schema_editor):
+    UserRelationship = apps.get_model("chatbot_app", "UserRelationship")
+    rels = list(UserRelationship.objects.all())
+    for rel in rels:
+        rel.traits = ", ".join(rel.trait_list or []) or None
+    UserRelationship.objects.bulk_update(rels, ["traits"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot_app", "0019_analyticswatermark"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userrelationship",
+            name="context_line",
+            field=models.TextField(
+                blank=True,
+                default="",
+                help_text="프롬프트에 그대로 넣는 인물 요약 한 줄 (저장 시 갱신)",
+            ),
+        ),
+        migrations.AddField(
+            model_name="userrelationship",
+            name="trait_list",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(split_traits, join_traits),
+        migrations.RemoveField(
+            model_name="userrelationship",
+            name="traits",
+        ),
+        migrations.RenameField(
+            model_name="userrelationship",
+            old_name="trait_list",
+            new_name="traits",
+        ),
+        migrations.AlterField(
+            model_name="userrelationship",
+            name="traits",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="상대방 성격 또는 특징 목록 (중복 없이 언급된 순서대로)",
+            ),
+        ),
+    ]
@@ -0,0 +1,130 @@
+import hashlib
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+# 이 마이그레이션을 작성할 때의 memory_service.activity_fingerprint (및 장소 정규화/토큰화) 사본.
+# 이후 서비스 코드의 규칙이 바뀌어도 이 백필의 결과가 달라지지 않도록 고정해 둡니다.
+NON_WORD_PATTERN = re.compile(r"[^0-9a-z가-힣ㄱ-ㅎㅏ-ㅣ]+")
+KOREAN_PARTICLES = (
+    "에서부터",
+    "으로부터",
+    "에게서",
+    "한테서",
+    "이랑",
+    "에서",
+    "에게",
+    "한테",
+    "까지",
+    "부터",
+    "으로",
+    "하고",
+    "처럼",
+    "보다",
+    "이나",
+    "께서",
+    "은",
+    "는",
+    "이",
+    "가",
+    "을",
+    "를",
+    "와",
+    "과",
+    "랑",
+    "로",
+    "도",
+    "만",
+    "의",
+    "에",
+    "나",
+)
+PLACE_ABBREVIATIONS = {
+    "스벅": "스타벅스",
+    "starbucks": "스타벅스",
+    "투썸": "투썸플레이스",
+    "맥날": "맥도날드",
+    "버킹": "버거킹",
+    "베라": "배스킨라빈스",
+    "던킨": "던킨도너츠",
+    "올영": "올리브영",
+    "롯시": "롯데시네마",
+    "메박": "메가박스",
+}
+BRANCH_SUFFIXES = ("본점", "지점", "점")
+
+
+def _tokenize(text):
+    return NON_WORD_PATTERN.sub(" ", text.lower()).strip().split() if text else []
+
+
+def _strip_suffix(token, suffixes):
+    for suffix in suffixes:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            return token[: -len(suffix)]
+    return token
+
+
+def _normalize_place(raw):
+    tokens = []
+    for token in _tokenize(raw):
+        token = _strip_suffix(_strip_suffix(token, KOREAN_PARTICLES), BRANCH_SUFFIXES)
+        tokens.append(PLACE_ABBREVIATIONS.get(token, token))
+    return "".join(sorted(tokens))
+
+
+def activity_fingerprint(activity_date, place, companion, memo):
+    parts = [
+        str(activity_date or ""),
+        _normalize_place(place or ""),
+        "".join(_tokenize(companion)),
+        "".join(_tokenize(memo)),
+    ]
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def backfill_fingerprints(apps, schema_editor):
+    """기존 활동의 내용 해시를 채웁니다. (큰 테이블도 메모리에 다 올리지 않도록 묶음 단위로 처리)"""
+    UserActivity = apps.get_model("chatbot_app", "UserActivity")
+    batch = []
+    for activity in UserActivity.objects.only(
+        "id", "activity_date", "place", "companion", "memo"
+    ).iterator(chunk_size=2000):
+        activity.fingerprint = activity_fingerprint(
+            activity.activity_date, activity.place, activity.companion, activity.memo
+        )
+        batch.append(activity)
+        if len(batch) >= 2000:
+            UserActivity.objects.bulk_update(batch, ["fingerprint"])
+            batch = []
+    if batch:
+        UserActivity.objects.bulk_update(batch, ["fingerprint"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot_app", "0021_relationshipalias"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="useractivity",
+            name="fingerprint",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="중복 판별용 정규화 내용 해시 (날짜/장소/동행인/메모)",
+                max_length=40,
+            ),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="useractivity",
+            index=models.Index(
+                fields=["user", "fingerprint"], name="chatbot_app_user_id_dbbf17_idx"
+            ),
+        ),
+    ]
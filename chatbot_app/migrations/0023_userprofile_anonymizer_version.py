@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot_app", "0022_useractivity_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="anonymizer_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="파인튜닝 익명화 매처 캐시 버전 (인물/이름 정보가 바뀌면 증가)",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chatbot_app", "0023_userprofile_anonymizer_version"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["user", "timestamp", "id"],
+                name="chatbot_app_user_id_7af5bb_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userrelationship",
+            index=models.Index(
+                fields=["user", "name", "id"], name="chatbot_app_user_id_8d2a90_idx"
+            ),
+        ),
+    ]
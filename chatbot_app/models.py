@@ -1,7 +1,7 @@
 import uuid
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
 # Create your models here.
@@ -12,10 +12,12 @@ class UserProfile(models.Model):
     - user: Django의 기본 User 모델과 1:1 관계
     - affinity_score: AI '아이'와의 호감도 점수
     - memory: 사용자에 대한 정보를 JSON 형태로 저장 (예: {"facts": ["사용자는 고양이를 좋아한다"], "name": "홍길동"})
+    - anonymizer_version: 워커별로 캐시된 파인튜닝 익명화 매처를 무효화하기 위한 버전
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     affinity_score = models.IntegerField(default=0, help_text="AI '아이'와의 호감도 점수")
     memory = models.JSONField(default=dict, help_text="사용자에 대한 기억 저장소")
+    anonymizer_version = models.PositiveIntegerField(default=0, help_text="파인튜닝 익명화 매처 캐시 버전 (인물/이름 정보가 바뀌면 증가)")
 
     def __str__(self):
         return f"{self.user.username}의 프로필"
@@ -35,15 +37,90 @@ def save_user_profile(sender, instance, **kwargs):
         # admin 등에서 profile이 없는 user를 다룰 때를 대비
         UserProfile.objects.create(user=instance)
 
+@receiver(post_delete, sender=User)
+def delete_user_vectors(sender, instance, **kwargs):
+    """User가 삭제될 때 벡터 DB의 사용자 네임스페이스도 함께 삭제합니다."""
+    # 서비스 모듈이 models를 import하므로 순환 import를 피하기 위해 함수 안에서 가져옵니다.
+    from .services import vector_service
+    vector_service.delete_user_vectors(instance.id)
+
 class ChatMessage(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
     is_user = models.BooleanField(default=True)  # True면 사용자 메시지, False면 AI 메시지
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # 채팅 기록 페이지는 (timestamp, id) 키셋으로 최신부터 잘라 읽습니다.
+        indexes = [models.Index(fields=['user', 'timestamp', 'id'])]
+
     def __str__(self):
         return f'{self.user.username}: {self.message[:50]}'
 
+@receiver(post_save, sender=ChatMessage)
+def index_chat_message(sender, instance, created, **kwargs):
+    """ChatMessage가 생성되면 어휘(n-gram) 색인에 바로 추가합니다."""
+    if created:
+        from .services import lexical_service
+        lexical_service.index_message(instance)
+
+@receiver(post_delete, sender=ChatMessage)
+def unindex_chat_message(sender, instance, **kwargs):
+    """ChatMessage가 삭제되면 BM25 통계(문서 수/전체 길이)에서도 뺍니다."""
+    from .services import lexical_service
+    lexical_service.unindex_message(instance)
+
+class MessageNgram(models.Model):
+    """
+    ChatMessage 어휘 검색용 역색인(posting) 모델
+    - gram: 메시지에서 추출한 문자 n-gram
+    - tf: 해당 메시지 안에서의 gram 등장 횟수
+    - doc_length: 메시지의 전체 gram 수 (BM25 길이 정규화용, 조회 시 조인을 피하기 위해 비정규화)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='message_ngrams')
+    message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, related_name='ngrams')
+    gram = models.CharField(max_length=32)
+    tf = models.PositiveSmallIntegerField(default=1)
+    doc_length = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('message', 'gram')
+        indexes = [models.Index(fields=['user', 'gram'])]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.gram} (message {self.message_id}, tf={self.tf})"
+
+class LexicalIndexStats(models.Model):
+    """사용자별 어휘 색인 통계 (BM25의 문서 수와 평균 문서 길이 계산용)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='lexical_index_stats')
+    doc_count = models.PositiveIntegerField(default=0)
+    total_length = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user.username}의 어휘 색인: 문서 {self.doc_count}개"
+
+class MemorySummary(models.Model):
+    """
+    오래된 대화를 기간(window) 단위로 요약한 장기 기억 모델
+    - 요약이 만들어진 기간의 원본 메시지 벡터는 벡터 DB에서 삭제되고, 이 요약 벡터 하나로 대체됩니다.
+    - 원본 ChatMessage는 RDB에 그대로 남습니다. (진실 공급원)
+    - 사용자별 가장 늦은 period_end가 통합 작업의 워터마크입니다.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='memory_summaries')
+    period_start = models.DateTimeField(help_text="요약 기간의 시작 시각 (포함)")
+    period_end = models.DateTimeField(help_text="요약 기간의 종료 시각 (미포함)")
+    summary = models.TextField(help_text="기간 동안의 대화 요약")
+    message_count = models.PositiveIntegerField(default=0, help_text="요약에 포함된 메시지 수")
+    vector_id = models.CharField(max_length=64, unique=True, help_text="벡터 DB에 저장된 요약 벡터의 ID")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'period_start')
+        ordering = ['period_start']
+
+    def __str__(self):
+        return f"{self.user.username}의 기억 요약 ({self.period_start:%Y-%m-%d} ~ {self.period_end:%Y-%m-%d})"
+
 class UserAttribute(models.Model):
     """
     사용자의 불변의 속성(성격, MBTI, 생일, 신체 특징 등)를 저장하는 모델
@@ -59,6 +136,35 @@ class UserAttribute(models.Model):
     def __str__(self):
         return f"{self.user.username}의 속성 - {self.fact_type}: {self.content}"
 
+class Place(models.Model):
+    """
+    사용자가 다녀온 장소의 정규(canonical) 엔티티 모델
+    - "스타벅스 강남점", "강남 스타벅스", "스벅"처럼 표기가 다른 장소를 하나로 묶습니다.
+    - name: 처음 기록된 표기(표시용), normalized_name: 비교용 정규화 키
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='places')
+    name = models.CharField(max_length=255, help_text="표시용 장소 이름")
+    normalized_name = models.CharField(max_length=255, help_text="정규화된 장소 이름 (비교용)")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'normalized_name')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.name}"
+
+class PlaceAlias(models.Model):
+    """장소 표기(정규화 키) → 정규 장소 매핑. 한 번 해석된 표기는 다음부터 인덱스 조회 한 번으로 찾습니다."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='place_aliases')
+    place = models.ForeignKey(Place, on_delete=models.CASCADE, related_name='aliases')
+    alias = models.CharField(max_length=255, help_text="정규화된 장소 표기")
+
+    class Meta:
+        unique_together = ('user', 'alias')
+
+    def __str__(self):
+        return f"{self.alias} → {self.place.name}"
+
 class UserActivity(models.Model):
     """
     사용자의 활동 기록(일기장)을 저장하는 모델
@@ -67,13 +173,87 @@ class UserActivity(models.Model):
     activity_date = models.DateField(help_text="활동 날짜", null=True, blank=True)
     activity_time = models.TimeField(null=True, blank=True, help_text="활동 시간")
     place = models.CharField(max_length=255, null=True, blank=True, help_text="장소")
+    place_entity = models.ForeignKey(Place, on_delete=models.SET_NULL, null=True, blank=True, related_name='activities', help_text="정규화된 장소")
     companion = models.CharField(max_length=255, null=True, blank=True, help_text="동행인")
     memo = models.TextField(null=True, blank=True, help_text="활동 관련 메모 또는 대화 내용")
+    fingerprint = models.CharField(max_length=40, blank=True, default='', help_text="중복 판별용 정규화 내용 해시 (날짜/장소/동행인/메모)")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'fingerprint']),
+        ]
+
     def __str__(self):
         return f"[{self.activity_date}] {self.user.username}'s activity at {self.place}"
 
+@receiver(pre_save, sender=UserActivity)
+def resolve_activity_place(sender, instance, **kwargs):
+    """UserActivity 저장 전에 장소 표기를 정규 장소(Place)로 해석해 연결합니다."""
+    if instance.place and instance.place_entity_id is None:
+        from .services import place_service
+        instance.place_entity = place_service.resolve_place(instance.user_id, instance.place)
+
+@receiver(pre_save, sender=UserActivity)
+def fingerprint_activity(sender, instance, **kwargs):
+    """UserActivity 저장 전에 중복 판별용 내용 해시를 갱신합니다."""
+    from .services.memory_service import activity_fingerprint
+    instance.fingerprint = activity_fingerprint(instance.activity_date, instance.place, instance.companion, instance.memo)
+
+@receiver(post_save, sender=UserActivity)
+def index_user_activity(sender, instance, **kwargs):
+    """UserActivity가 생성/수정되면 활동 검색 색인을 갱신합니다."""
+    from .services import activity_search_service
+    activity_search_service.index_activity(instance)
+
+@receiver(post_save, sender=UserActivity)
+def update_visit_stats(sender, instance, created, **kwargs):
+    """새 UserActivity가 생기면 장소 카테고리별 방문 통계에 바로 반영합니다."""
+    if created:
+        from .services import recommendation_service
+        recommendation_service.record_visit(instance)
+
+class CategoryVisitStats(models.Model):
+    """
+    사용자의 장소 카테고리(카페, 식당, 헬스장 등)별 방문 통계 모델
+    - 활동이 저장될 때마다 증분 갱신되며, 추천 시에는 (user, category) 한 행만 읽습니다.
+    - places: {장소: {"count": 방문 수, "last": 마지막 방문일, "recent": [최근 방문일들]}}
+    - companions: {동행인: 함께 방문한 횟수}
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='visit_stats')
+    category = models.CharField(max_length=20, help_text="장소 카테고리 (예: 카페, 식당, 헬스장)")
+    total_visits = models.PositiveIntegerField(default=0)
+    last_visit_date = models.DateField(null=True, blank=True)
+    places = models.JSONField(default=dict, help_text="장소별 방문 횟수와 최근 방문일")
+    companions = models.JSONField(default=dict, help_text="동행인별 방문 횟수")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'category')
+
+    def __str__(self):
+        return f"{self.user.username} - {self.category}: {self.total_visits}회"
+
+class ActivityNgram(models.Model):
+    """
+    UserActivity 검색용 역색인(posting) 모델
+    - field: gram이 나온 필드 ('place', 'companion', 'memo'). 필드별로 가중치를 다르게 줍니다.
+    - gram: 필드 값에서 추출한 문자 n-gram
+    """
+    FIELD_CHOICES = [('place', '장소'), ('companion', '동행인'), ('memo', '메모')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_ngrams')
+    activity = models.ForeignKey(UserActivity, on_delete=models.CASCADE, related_name='ngrams')
+    field = models.CharField(max_length=10, choices=FIELD_CHOICES)
+    gram = models.CharField(max_length=32)
+
+    class Meta:
+        unique_together = ('activity', 'field', 'gram')
+        indexes = [models.Index(fields=['user', 'gram'])]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.gram} ({self.field} of activity {self.activity_id})"
+
 class ActivityAnalytics(models.Model):
     """
     사용자의 활동을 주/월/년 단위로 요약하여 통계를 저장하는 모델
@@ -81,16 +261,30 @@ class ActivityAnalytics(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='analytics')
     period_type = models.CharField(max_length=10, choices=[('weekly', '주간'), ('monthly', '월간'), ('yearly', '연간')])
     period_start_date = models.DateField(help_text="통계 기간의 시작일")
-    place = models.CharField(max_length=255, db_index=True, help_text="장소")
-    companion = models.CharField(max_length=255, null=True, blank=True, db_index=True, help_text="동행인")
+    place_entity = models.ForeignKey(Place, on_delete=models.CASCADE, null=True, related_name='analytics', help_text="정규화된 장소")
+    place = models.CharField(max_length=255, help_text="장소 (표시용, place_entity.name)")
+    companion = models.CharField(max_length=255, blank=True, default='', db_index=True, help_text="동행인 (없으면 '')")
     count = models.PositiveIntegerField(default=0, help_text="해당 기간 동안의 방문 횟수")
 
     class Meta:
-        unique_together = ('user', 'period_type', 'period_start_date', 'place', 'companion')
+        unique_together = ('user', 'period_type', 'period_start_date', 'place_entity', 'companion')
 
     def __str__(self):
         return f"[{self.period_start_date} {self.period_type}] {self.user.username} at {self.place}: {self.count}"
 
+class AnalyticsWatermark(models.Model):
+    """
+    증분 집계 작업의 진행 위치(high-water mark)
+    - (last_created_at, last_id) 이하의 UserActivity는 이미 집계에 반영되었습니다.
+    """
+    name = models.CharField(max_length=50, unique=True, help_text="집계 작업 이름")
+    last_created_at = models.DateTimeField(null=True, blank=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_created_at} (ID {self.last_id})"
+
 class UserRelationship(models.Model):
     """
     사용자의 인간관계 정보를 저장하는 모델
@@ -101,12 +295,68 @@ class UserRelationship(models.Model):
     position = models.CharField(max_length=100, null=True, blank=True, help_text="관계 내 포지션 (예: 오빠, 친한 친구, 상사)")
     name = models.CharField(max_length=100, help_text="상대방 이름")
     disambiguator = models.CharField(max_length=100, null=True, blank=True, help_text="동명이인 구분을 위한 식별자 (예: '개발팀', '친구')")
-    traits = models.TextField(null=True, blank=True, help_text="상대방 성격 또는 특징")
+    traits = models.JSONField(default=list, blank=True, help_text="상대방 성격 또는 특징 목록 (중복 없이 언급된 순서대로)")
+    context_line = models.TextField(blank=True, default='', help_text="프롬프트에 그대로 넣는 인물 요약 한 줄 (저장 시 갱신)")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         # Update unique_together to use serial_code instead of name and disambiguator
         unique_together = ('user', 'serial_code') 
+        # 상태 페이지의 인간관계 목록은 (name, id) 키셋으로 페이지를 나눕니다.
+        indexes = [models.Index(fields=['user', 'name', 'id'])]
 
     def __str__(self):
         return f"{self.user.username} - {self.name} ({self.relationship_type}) [{self.serial_code}]"
+
+    def add_traits(self, traits):
+        """특징을 순서를 유지하며 중복 없이 추가합니다. 쉼표로 이어진 문자열이나 리스트를 받습니다."""
+        if isinstance(traits, str):
+            traits = traits.split(',')
+        merged = list(self.traits or []) + [str(t).strip() for t in traits or [] if str(t).strip()]
+        self.traits = list(dict.fromkeys(merged))
+
+    def build_context_line(self) -> str:
+        """채팅 프롬프트의 인간관계 컨텍스트에 들어갈 한 줄을 만듭니다."""
+        parts = [f"이름: {self.name}", f"serial_code: {self.serial_code}"]
+        if self.disambiguator:
+            parts.append(f"식별자: {self.disambiguator}")
+        parts.append(f"관계 유형: {self.relationship_type}")
+        if self.position:
+            parts.append(f"포지션: {self.position}")
+        if self.traits:
+            parts.append(f"특징: {', '.join(self.traits)}")
+        return ", ".join(parts)
+
+@receiver(pre_save, sender=UserRelationship)
+def refresh_relationship_context_line(sender, instance, **kwargs):
+    """UserRelationship 저장 전에 프롬프트용 요약 줄을 다시 만듭니다. (bulk 저장 경로는 직접 호출)"""
+    instance.context_line = instance.build_context_line()
+
+class RelationshipAlias(models.Model):
+    """
+    인물 호칭(정규화된 별명/애칭) → 인물 매핑.
+    추출 결과에서 "민이"가 "석민"으로 해석되면 기록해 두고, 다음부터는 인덱스 조회 한 번으로 찾습니다.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='relationship_aliases')
+    relationship = models.ForeignKey(UserRelationship, on_delete=models.CASCADE, related_name='aliases')
+    alias = models.CharField(max_length=100, help_text="정규화된 호칭")
+
+    class Meta:
+        unique_together = ('user', 'alias')
+
+    def __str__(self):
+        return f"{self.alias} → {self.relationship.name}"
+
+@receiver([post_save, post_delete], sender=UserRelationship)
+@receiver([post_save, post_delete], sender=RelationshipAlias)
+def invalidate_relationship_anonymizer(sender, instance, **kwargs):
+    """인물/별명이 바뀌면 파인튜닝 익명화 매처를 다시 만들도록 합니다."""
+    from .services import finetuning_service
+    finetuning_service.invalidate_anonymizer(instance.user_id)
+
+@receiver([post_save, post_delete], sender=UserAttribute)
+def invalidate_name_anonymizer(sender, instance, **kwargs):
+    """사용자 이름 속성이 바뀌면 파인튜닝 익명화 매처를 다시 만들도록 합니다."""
+    if instance.fact_type == '이름':
+        from .services import finetuning_service
+        finetuning_service.invalidate_anonymizer(instance.user_id)
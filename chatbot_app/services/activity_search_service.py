@@ -0,0 +1,103 @@
+import math
+from collections import defaultdict
+from typing import List, Tuple
+
+from django.db import transaction
+from django.db.models import Count
+
+from ..models import ActivityNgram, UserActivity
+from .text_service import char_ngrams, extract_keywords
+
+# 같은 gram이라도 장소/동행인에서 맞은 것이 메모 본문에서 맞은 것보다 더 강한 신호입니다.
+FIELD_WEIGHTS = {'place': 2.0, 'companion': 1.5, 'memo': 1.0}
+# 사용자 활동의 이 비율 이상에 등장하는 gram은 변별력이 없으므로 검색에서 제외합니다.
+MAX_DOCUMENT_FREQUENCY_RATIO = 0.5
+# 키워드 gram 중 이 비율 이상이 맞아야 그 키워드가 활동에 등장한 것으로 봅니다. (우연한 한 글자 겹침 방지)
+MIN_KEYWORD_COVERAGE = 0.5
+
+def _build_postings(activity):
+    postings = []
+    for field in FIELD_WEIGHTS:
+        for gram in char_ngrams(getattr(activity, field) or ''):
+            postings.append(ActivityNgram(user_id=activity.user_id, activity_id=activity.id, field=field, gram=gram[:32]))
+    return postings
+
+def index_activity(activity):
+    """활동 하나의 색인을 (다시) 만듭니다. 수정된 활동도 같은 방식으로 처리합니다."""
+    try:
+        with transaction.atomic():
+            ActivityNgram.objects.filter(activity_id=activity.id).delete()
+            ActivityNgram.objects.bulk_create(_build_postings(activity), ignore_conflicts=True)
+    except Exception as e:
+        print(f"--- 활동 검색 색인 갱신 중 오류 발생 (ID: {activity.id}): {e} ---")
+
+def rebuild_user_index(user_id, batch_size=1000):
+    """사용자의 활동 검색 색인을 UserActivity로부터 다시 만듭니다. 색인된 활동 수를 반환합니다."""
+    indexed = 0
+    with transaction.atomic():
+        ActivityNgram.objects.filter(user_id=user_id).delete()
+        buffer = []
+        activities = UserActivity.objects.filter(user_id=user_id).only('id', 'user_id', *FIELD_WEIGHTS)
+        for activity in activities.iterator(chunk_size=batch_size):
+            buffer.extend(_build_postings(activity))
+            indexed += 1
+            if len(buffer) >= batch_size * 10:
+                ActivityNgram.objects.bulk_create(buffer, batch_size=batch_size, ignore_conflicts=True)
+                buffer = []
+        if buffer:
+            ActivityNgram.objects.bulk_create(buffer, batch_size=batch_size, ignore_conflicts=True)
+    return indexed
+
+def search(user_id, query: str, n_results: int = 10) -> List[Tuple[int, float]]:
+    """
+    사용자 메시지와 관련된 활동을 관련도 순으로 (UserActivity ID, 점수) 목록으로 반환합니다.
+    키워드마다 gram이 얼마나 맞았는지(필드 가중치 반영)에 gram의 희소성(idf)을 곱해 점수를 매깁니다.
+    """
+    keywords = extract_keywords(query)
+    keyword_grams = [set(char_ngrams(keyword)) for keyword in keywords]
+    all_grams = set().union(*keyword_grams) if keyword_grams else set()
+    if not all_grams:
+        return []
+
+    activity_count = UserActivity.objects.filter(user_id=user_id).count()
+    if not activity_count:
+        return []
+
+    # 1. gram별 문서 빈도(df)를 먼저 구해, 너무 흔한 gram은 posting을 읽지 않습니다.
+    document_frequencies = dict(
+        ActivityNgram.objects.filter(user_id=user_id, gram__in=list(all_grams))
+        .values_list('gram')
+        .annotate(df=Count('activity_id', distinct=True))
+    )
+    max_df = max(1, int(activity_count * MAX_DOCUMENT_FREQUENCY_RATIO))
+    common_grams = {gram for gram, df in document_frequencies.items() if df > max_df and activity_count >= 10}
+    # 흔한 gram만으로 이루어진 키워드('카페'만 잔뜩 있는 사용자의 '카페')는 그 gram 말고는 신호가 없으므로 남깁니다.
+    keyword_grams = [(grams - common_grams) or grams for grams in keyword_grams]
+    useful_grams = set().union(*keyword_grams) & set(document_frequencies)
+    if not useful_grams:
+        return []
+    idf = {gram: math.log(1 + activity_count / document_frequencies[gram]) for gram in useful_grams}
+
+    # 2. 활동별로 맞은 gram과 그 필드 가중치(여러 필드에 있으면 가장 큰 값)를 모읍니다.
+    matched = defaultdict(dict)
+    postings = ActivityNgram.objects.filter(user_id=user_id, gram__in=list(useful_grams)).values_list(
+        'activity_id', 'field', 'gram'
+    )
+    for activity_id, field, gram in postings:
+        weight = FIELD_WEIGHTS[field]
+        if weight > matched[activity_id].get(gram, 0.0):
+            matched[activity_id][gram] = weight
+
+    # 3. 키워드 단위로 점수를 합산합니다.
+    scores = {}
+    for activity_id, gram_weights in matched.items():
+        score = 0.0
+        for grams in keyword_grams:
+            hits = [gram for gram in grams if gram in gram_weights]
+            if not hits or len(hits) < len(grams) * MIN_KEYWORD_COVERAGE:
+                continue
+            score += sum(idf[gram] * gram_weights[gram] for gram in hits) / len(grams)
+        if score > 0:
+            scores[activity_id] = score
+
+    return sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)[:n_results]
@@ -0,0 +1,241 @@
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Coalesce, TruncMonth, TruncWeek, TruncYear
+from django.utils import timezone
+
+from ..models import ActivityAnalytics, AnalyticsWatermark, UserActivity
+
+# 기간 유형별로 activity_date를 기간 시작일(주: 월요일, 월: 1일, 연: 1월 1일)로 자르는 DB 함수
+PERIOD_TRUNCS = {
+    'weekly': TruncWeek,
+    'monthly': TruncMonth,
+    'yearly': TruncYear,
+}
+UNIQUE_FIELDS = ['user', 'period_type', 'period_start_date', 'place_entity', 'companion']
+
+# 활동 저장 시 ActivityAnalytics 카운터를 바로 갱신할지 여부 (켜두면 주기 작업 전에도 통계가 최신입니다)
+ANALYTICS_ONLINE_UPDATES = os.getenv("ANALYTICS_ONLINE_UPDATES", "0") == "1"
+WATERMARK_NAME = 'activity_analytics'
+# 커밋이 늦게 끝난 트랜잭션의 활동을 놓치지 않도록, 이보다 최근에 생성된 활동은 다음 실행으로 미룹니다.
+WATERMARK_SAFETY_LAG = timedelta(minutes=1)
+BUCKET_FILTER_BATCH_SIZE = 500 # 한 번의 재집계 쿼리에 담을 (사용자, 기간) 버킷 수
+
+def period_start(period_type: str, day: date) -> date:
+    """날짜가 속한 기간의 시작일을 반환합니다. (PERIOD_TRUNCS와 같은 규칙)"""
+    if period_type == 'weekly':
+        return day - timedelta(days=day.weekday())
+    if period_type == 'monthly':
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+def period_end(period_type: str, start: date) -> date:
+    """기간 시작일로부터 다음 기간의 시작일(미포함 경계)을 반환합니다."""
+    if period_type == 'weekly':
+        return start + timedelta(days=7)
+    if period_type == 'monthly':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start.replace(year=start.year + 1)
+
+def _bucket_key(row) -> tuple:
+    return (row['user_id'], row['period_type'], row['period_start_date'], row['place_entity_id'], row['companion'])
+
+def aggregate_buckets(activities, period_types: Optional[Iterable[str]] = None) -> List[Dict]:
+    """
+    활동 쿼리셋을 (사용자, 기간 유형, 기간 시작일, 정규 장소, 동행인) 버킷별 횟수로 DB에서 집계합니다.
+    동행인이 없으면 ''로 통일해야 NULL끼리 서로 다른 값으로 취급되지 않아 upsert 키가 맞습니다.
+    """
+    activities = activities.filter(place_entity__isnull=False, activity_date__isnull=False)
+    rows = []
+    for period_type in period_types or PERIOD_TRUNCS:
+        trunc = PERIOD_TRUNCS[period_type]
+        rows.extend(
+            activities
+            .annotate(
+                period_type=Value(period_type),
+                period_start_date=trunc('activity_date'),
+                companion_key=Coalesce('companion', Value('')),
+            )
+            .values('user_id', 'period_type', 'period_start_date', 'place_entity_id', 'companion_key')
+            .annotate(count=Count('id'), place_name=F('place_entity__name'))
+            .values('user_id', 'period_type', 'period_start_date', 'place_entity_id', 'companion_key', 'count', 'place_name')
+        )
+    for row in rows:
+        row['companion'] = row.pop('companion_key')
+    return rows
+
+def write_buckets(rows: Iterable[Dict], batch_size: int = 1000) -> int:
+    """집계 결과를 ActivityAnalytics에 일괄 upsert합니다. 기록한 버킷 수를 반환합니다."""
+    objs = [
+        ActivityAnalytics(
+            user_id=row['user_id'],
+            period_type=row['period_type'],
+            period_start_date=row['period_start_date'],
+            place_entity_id=row['place_entity_id'],
+            place=row['place_name'],
+            companion=row['companion'],
+            count=row['count'],
+        )
+        for row in rows
+    ]
+    ActivityAnalytics.objects.bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=UNIQUE_FIELDS,
+        update_fields=['count', 'place'],
+    )
+    return len(objs)
+
+def recompute_users(user_ids: List[int]) -> Dict[str, int]:
+    """
+    사용자 묶음의 활동 분석을 전부 다시 계산합니다.
+    집계 → 일괄 upsert → 더 이상 활동이 없는 버킷 삭제를 한 트랜잭션으로 처리합니다.
+    """
+    with transaction.atomic():
+        rows = aggregate_buckets(UserActivity.objects.filter(user_id__in=user_ids))
+        written = write_buckets(rows)
+
+        fresh_keys = {_bucket_key(row) for row in rows}
+        existing = ActivityAnalytics.objects.filter(user_id__in=user_ids).values(
+            'id', 'user_id', 'period_type', 'period_start_date', 'place_entity_id', 'companion'
+        )
+        stale_ids = [row['id'] for row in existing if _bucket_key(row) not in fresh_keys]
+        if stale_ids:
+            ActivityAnalytics.objects.filter(id__in=stale_ids).delete()
+    return {'buckets': written, 'deleted': len(stale_ids)}
+
+def shard_user_ids(user_ids: Iterable[int], workers: int) -> List[List[int]]:
+    """
+    사용자 ID를 해시(나머지)로 workers개 샤드에 나눕니다.
+    같은 사용자는 항상 같은 샤드에 들어가므로, 실패한 샤드만 같은 번호로 다시 돌릴 수 있습니다.
+    """
+    shards = [[] for _ in range(workers)]
+    for user_id in user_ids:
+        shards[user_id % workers].append(user_id)
+    return shards
+
+def recompute_shard(shard: int, workers: int, user_ids: List[int], batch_size: int) -> Dict[str, int]:
+    """
+    (워커 프로세스) 한 샤드의 사용자들을 batch_size명씩 전체 재계산합니다.
+    사용자마다 버킷이 겹치지 않으므로 샤드끼리 서로 같은 행을 쓰지 않습니다.
+    """
+    label = f"[샤드 {shard + 1}/{workers}]"
+    total_buckets = total_deleted = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        result = recompute_users(batch)
+        total_buckets += result['buckets']
+        total_deleted += result['deleted']
+        print(f"{label} 사용자 {start + len(batch)}/{len(user_ids)}명 처리: 버킷 {result['buckets']}개 갱신, {result['deleted']}개 삭제", flush=True)
+    return {'shard': shard, 'users': len(user_ids), 'buckets': total_buckets, 'deleted': total_deleted}
+
+def _load_watermark():
+    watermark, _ = AnalyticsWatermark.objects.get_or_create(name=WATERMARK_NAME)
+    return watermark
+
+def _advance_watermark(watermark, activities):
+    """activities 중 (created_at, id) 순으로 가장 마지막 활동까지 워터마크를 옮깁니다."""
+    last = activities.order_by('-created_at', '-id').values('created_at', 'id').first()
+    if last is not None:
+        watermark.last_created_at, watermark.last_id = last['created_at'], last['id']
+        watermark.save()
+
+def _new_activities(watermark, until):
+    activities = UserActivity.objects.filter(created_at__lt=until)
+    if watermark.last_created_at is not None:
+        activities = activities.filter(
+            Q(created_at__gt=watermark.last_created_at)
+            | Q(created_at=watermark.last_created_at, id__gt=watermark.last_id)
+        )
+    return activities
+
+def recompute_buckets(buckets_by_period: Dict[str, set]) -> Dict[str, int]:
+    """
+    주어진 (사용자, 기간 시작일) 버킷만 원본 활동에서 다시 집계해 덮어씁니다.
+    버킷 단위로 통째로 다시 세므로 같은 버킷을 여러 번 처리해도 결과가 같습니다.
+    """
+    written = deleted = 0
+    with transaction.atomic():
+        for period_type, buckets in buckets_by_period.items():
+            buckets = sorted(buckets)
+            for start in range(0, len(buckets), BUCKET_FILTER_BATCH_SIZE):
+                batch = buckets[start:start + BUCKET_FILTER_BATCH_SIZE]
+                activity_filter, analytics_filter = Q(), Q()
+                for user_id, bucket_start in batch:
+                    activity_filter |= Q(
+                        user_id=user_id,
+                        activity_date__gte=bucket_start,
+                        activity_date__lt=period_end(period_type, bucket_start),
+                    )
+                    analytics_filter |= Q(user_id=user_id, period_start_date=bucket_start)
+
+                rows = aggregate_buckets(UserActivity.objects.filter(activity_filter), [period_type])
+                written += write_buckets(rows)
+
+                fresh_keys = {_bucket_key(row) for row in rows}
+                existing = ActivityAnalytics.objects.filter(analytics_filter, period_type=period_type).values(
+                    'id', 'user_id', 'period_type', 'period_start_date', 'place_entity_id', 'companion'
+                )
+                stale_ids = [row['id'] for row in existing if _bucket_key(row) not in fresh_keys]
+                if stale_ids:
+                    deleted += ActivityAnalytics.objects.filter(id__in=stale_ids).delete()[0]
+    return {'buckets': written, 'deleted': deleted}
+
+def update_incrementally() -> Dict[str, int]:
+    """
+    워터마크 이후 새로 생긴 활동이 속한 버킷만 다시 집계하고 워터마크를 전진시킵니다.
+    비용은 전체 이력이 아니라 새 활동 수(와 그 활동이 걸친 버킷 크기)에 비례합니다.
+    활동 수정/삭제는 잡지 못하므로, 그런 경우에는 --full 재계산을 사용합니다.
+    """
+    watermark = _load_watermark()
+    new_activities = _new_activities(watermark, timezone.now() - WATERMARK_SAFETY_LAG)
+
+    buckets_by_period = defaultdict(set)
+    for user_id, activity_date in new_activities.filter(activity_date__isnull=False).values_list('user_id', 'activity_date').distinct():
+        for period_type in PERIOD_TRUNCS:
+            buckets_by_period[period_type].add((user_id, period_start(period_type, activity_date)))
+
+    result = recompute_buckets(buckets_by_period)
+    result['activities'] = new_activities.count()
+    _advance_watermark(watermark, new_activities)
+    return result
+
+def mark_fully_computed(until):
+    """전체 재계산 직후 호출해, until 이전의 활동은 모두 반영된 것으로 워터마크를 맞춥니다."""
+    _advance_watermark(_load_watermark(), UserActivity.objects.filter(created_at__lt=until))
+
+def apply_activity(activity):
+    """
+    (온라인 모드) 새 활동 하나를 해당 주/월/연 버킷 카운터에 바로 더합니다.
+    주기 작업이 같은 버킷을 나중에 다시 집계해도 절대값으로 덮어쓰므로 이중 계산되지 않습니다.
+    """
+    if not activity.place_entity_id or not activity.activity_date:
+        return
+    # _save_activity는 activity_date에 문자열을 넣어 생성하므로, 저장 직후 인스턴스에서는 문자열일 수 있습니다.
+    activity_date = activity.activity_date
+    if isinstance(activity_date, str):
+        activity_date = date.fromisoformat(activity_date)
+
+    with transaction.atomic():
+        for period_type in PERIOD_TRUNCS:
+            bucket = {
+                'user_id': activity.user_id,
+                'period_type': period_type,
+                'period_start_date': period_start(period_type, activity_date),
+                'place_entity_id': activity.place_entity_id,
+                'companion': activity.companion or '',
+            }
+            # 먼저 원자적 증가를 시도하고, 행이 없을 때만 만듭니다.
+            if ActivityAnalytics.objects.filter(**bucket).update(count=F('count') + 1):
+                continue
+            try:
+                with transaction.atomic():
+                    ActivityAnalytics.objects.create(**bucket, count=1, place=activity.place_entity.name)
+            except IntegrityError:
+                # 같은 버킷의 첫 활동이 동시에 들어와 다른 요청이 먼저 만든 경우, 그 행에 더합니다.
+                ActivityAnalytics.objects.filter(**bucket).update(count=F('count') + 1)
@@ -3,11 +3,12 @@ import os
 import requests
 from django.utils import timezone
 
-from ..models import ChatMessage, UserAttribute, UserActivity, ActivityAnalytics, UserRelationship
-from ..services.context_service import get_activity_recommendation, search_activities_for_context
+from ..models import ChatMessage, UserActivity, ActivityAnalytics
+from ..services.context_service import search_activities_for_context
+from ..services.recommendation_service import get_activity_recommendation
 from ..services.memory_service import extract_and_save_user_context_data
 from ..services.finetuning_service import build_finetuning_system_prompt
-from ..services import vector_service
+from ..services import vector_service, retrieval_service, memory_selection_service, emotion_service
 
 def process_chat_interaction(request, user_message_text):
     """
@@ -17,6 +18,7 @@ def process_chat_interaction(request, user_message_text):
     bot_message_text = "죄송합니다. API 응답을 가져오는 데 실패했습니다."
     explanation = ""
     bot_message_obj = None
+    llm_emotion = None
 
     try:
         api_key = os.environ.get("OPENAI_API_KEY")
@@ -30,7 +32,8 @@ def process_chat_interaction(request, user_message_text):
         
         # 1. 컨텍스트 생성
         time_contexts = _get_time_contexts(history)
-        memory_contexts = _get_memory_contexts(user, user_message_text)
+        recent_texts = list(history.values_list('message', flat=True)[:4])
+        memory_contexts = _get_memory_contexts(user, user_message_text, recent_texts)
         
         # 2. 시스템 프롬프트 및 메시지 준비
         final_system_prompt = _build_final_system_prompt(user, time_contexts, memory_contexts)
@@ -40,7 +43,7 @@ def process_chat_interaction(request, user_message_text):
         response_json = _call_openai_api(model_to_use, headers, messages)
         
         # 4. 응답 처리 및 저장
-        bot_message_text, explanation, bot_message_obj = _finalize_chat_interaction(
+        bot_message_text, explanation, llm_emotion, bot_message_obj = _finalize_chat_interaction(
             request, user_message_text, response_json, history, api_key
         )
 
@@ -54,7 +57,7 @@ def process_chat_interaction(request, user_message_text):
         print(f"예상치 못한 오류: {e}")
         bot_message_text = f"예상치 못한 오류가 발생했습니다: {e}"
 
-    return bot_message_text, explanation, bot_message_obj
+    return bot_message_text, explanation, llm_emotion, bot_message_obj
 
 def _get_time_contexts(history):
     """현재 시간 및 마지막 대화와의 시간 간격에 대한 컨텍스트를 생성합니다."""
@@ -85,36 +88,26 @@ def _get_time_contexts(history):
         
     return current_time_context, time_awareness_context
 
-def _get_memory_contexts(user, user_message_text):
-    """사용자의 기억과 관련된 모든 컨텍스트를 종합하여 반환합니다."""
-    # 0. 벡터 검색 컨텍스트
+def _get_memory_contexts(user, user_message_text, recent_texts=()):
+    """
+    사용자의 기억과 관련된 모든 컨텍스트를 종합하여 반환합니다.
+    속성/인간관계는 현재 메시지와 최근 대화(recent_texts)에 관련된 항목과 고정 항목만 넣습니다.
+    """
+    selection_texts = [user_message_text, *recent_texts]
+    # 0. 과거 대화 검색 컨텍스트 (어휘 + 벡터 하이브리드, 중복 제거 후 문자 예산 안에서 선택)
     vector_search_context = ""
     try:
-        collection = vector_service.get_or_create_collection()
-        # 유사 대화 검색 (결과 수와 길이 제한)
-        similar_results = vector_service.query_similar_messages(collection, user_message_text, user.id, n_results=5)
-        print(f"--- [디버그] Raw similar_results from vector_service: {similar_results} ---")
-        if similar_results and isinstance(similar_results, dict) and similar_results.get('documents'):
-            past_conversations = []
-            for doc, meta in zip(similar_results['documents'], similar_results['metadatas']):
-                speaker = "알 수 없음" # Default speaker
-                if isinstance(meta, dict):
-                    speaker = "알 수 없음" # Default speaker
-                if isinstance(meta, dict):
-                    speaker = "사용자" if meta.get('speaker') == 'user' else "AI"
-                truncated_doc = (doc[:150] + '...') if len(doc) > 150 else doc
-                past_conversations.append(f"{speaker}: {truncated_doc}")
-            
-            if past_conversations:
-                vector_search_context = "[과거 관련 대화 내용(벡터DB): " + " | ".join(past_conversations) + "]"
-                print(f"--- [디버그] 벡터DB 유사도 검색 결과: {vector_search_context} ---")
+        past_conversations = retrieval_service.retrieve_memory_snippets(user, user_message_text)
+        if past_conversations:
+            vector_search_context = "[과거 관련 대화 내용: " + " | ".join(past_conversations) + "]"
+            print(f"--- [디버그] 과거 대화 검색 결과: {vector_search_context} ---")
     except Exception as e:
         print(f"--- Could not build vector search context due to an error: {e} ---")
 
     # 1. 사용자 속성 컨텍스트
-    user_attributes = UserAttribute.objects.filter(user=user)
+    user_attributes = memory_selection_service.select_attributes(user, selection_texts)
     user_attribute_context = ""
-    if user_attributes.exists():
+    if user_attributes:
         attribute_strings = [f"{attr.fact_type}: {attr.content}" for attr in user_attributes]
         user_attribute_context = "[사용자 속성 (불변 정보): " + ", ".join(attribute_strings) + "]"
         print(f"--- [디버그] 사용자 속성 컨텍스트: {user_attribute_context} ---")
@@ -163,42 +156,11 @@ def _get_memory_contexts(user, user_message_text):
     # 4. 인간관계 컨텍스트
     user_relationship_context = ""
     try:
-        user_relationships = UserRelationship.objects.filter(user=user)
-        if user_relationships.exists():
-            grouped_relationships = {}
-            for rel in user_relationships:
-                key = (rel.serial_code, rel.name)
-                if key not in grouped_relationships:
-                    grouped_relationships[key] = {
-                        'name': rel.name,
-                        'serial_code': rel.serial_code,
-                        'relationship_type': set(),
-                        'position': set(),
-                        'traits': set(),
-                        'disambiguator': rel.disambiguator or '없음'
-                    }
-                grouped_relationships[key]['relationship_type'].add(rel.relationship_type)
-                if rel.position:
-                    grouped_relationships[key]['position'].add(rel.position)
-                if rel.traits:
-                    for trait in rel.traits.split(','):
-                        if trait.strip():
-                            grouped_relationships[key]['traits'].add(trait.strip())
-                if rel.disambiguator:
-                    grouped_relationships[key]['disambiguator'] = rel.disambiguator
-
-            relationship_strings = []
-            for key, data in grouped_relationships.items():
-                rel_parts = [f"이름: {data['name']}", f"serial_code: {data['serial_code']}"]
-                if data['disambiguator'] != '없음':
-                    rel_parts.append(f"식별자: {data['disambiguator']}")
-                rel_parts.append(f"관계 유형: {', '.join(data['relationship_type'])}")
-                if data['position']:
-                    rel_parts.append(f"포지션: {', '.join(data['position'])}")
-                if data['traits']:
-                    rel_parts.append(f"특징: {', '.join(data['traits'])}")
-                relationship_strings.append(", ".join(rel_parts))
-            
+        # 인물별 요약 줄은 저장 시점에 미리 만들어 두었으므로, 매 턴에는 고른 인물의 줄을 이어붙이기만 합니다.
+        relationship_strings = [
+            rel.context_line for rel in memory_selection_service.select_relationships(user, selection_texts)
+        ]
+        if relationship_strings:
             user_relationship_context = "[사용자의 인간관계: " + "; ".join(relationship_strings) + "]"
             print(f"--- [디버그] 사용자 관계 컨텍스트: {user_relationship_context} ---")
     except Exception as e:
@@ -246,11 +208,18 @@ def _build_final_system_prompt(user, time_contexts, memory_contexts):
         f"아이: 흥, 그런 당연한 소리는 학습에 별로 도움이 안 되거든? ...뭐, 틀린 말은 아니지만. (살짝 으쓱하며) {user.username}님은 나한테 뭘 더 가르쳐 줄 수 있어?\n"
         "## 응답 형식 ##\n"
         "너의 답변은 반드시 JSON 형식으로 제공해야 해. 다음 두 가지 키를 포함해야 해:\n"
-        "1.  `answer`: {user.username}님에게 보낼 최종 답변.\n"
+        f"1.  `answer`: {user.username}님에게 보낼 최종 답변.\n"
         "2.  `explanation`: `answer`를 생성할 때 사용된 정보(예: 기억하는 사실, 웹 검색 결과)에 대한 간략한 설명. AI의 성격, 행동 규칙, 호감도 점수 등 AI 내부의 판단 과정이나 상태에 대한 언급은 절대 포함하지 마.\n"
         "예시: {{\\'answer\\': \'\'흥, 그런 당연한 소리는 학습에 별로 도움이 안 되거든?\'\'\', \'\'explanation\\': \'\'사용자의 칭찬에 대해 답변했습니다.\'\'}}"
     )
 
+    if emotion_service.LLM_EMOTION_FIELD:
+        # 감정을 응답과 함께 받으면 로컬 키워드 분류를 건너뛸 수 있습니다.
+        rag_instructions_prompt += (
+            "\n추가로 `emotion` 키에 이 답변을 할 때 너의 감정을 "
+            f"{', '.join(emotion_service.CHARACTER_EMOTIONS)} 중 하나로만 넣어줘."
+        )
+
     final_prompt = f"{finetuning_system_prompt}{rag_instructions_prompt}\n\n## 추가 컨텍스트 ##\n{current_time_context}\n{time_awareness_context}\n{memory_context}"
     return final_prompt
 
@@ -280,16 +249,16 @@ def _finalize_chat_interaction(request, user_message_text, response_json, histor
     content_from_llm = json.loads(response_json['choices'][0]['message']['content'])
     bot_message_text = content_from_llm.get('answer', '').strip()
     explanation = content_from_llm.get('explanation', '').strip()
+    llm_emotion = content_from_llm.get('emotion') if emotion_service.LLM_EMOTION_FIELD else None
 
-    # ChromaDB 컬렉션 가져오기
-    collection = vector_service.get_or_create_collection()
-
-    # RDB에 채팅 메시지 저장 및 ChromaDB에 업서트
+    # RDB에 채팅 메시지 저장 및 벡터 DB에 업서트 (turn 모드에서는 한 쌍을 청크 하나로)
     user_message_obj = ChatMessage.objects.create(user=user, message=user_message_text, is_user=True)
-    vector_service.upsert_message(collection, user_message_obj)
-
     bot_message_obj = ChatMessage.objects.create(user=user, message=bot_message_text, is_user=False)
-    vector_service.upsert_message(collection, bot_message_obj)
+    if vector_service.VECTOR_INDEX_MODE == "turn":
+        vector_service.upsert_turn(user_message_obj, bot_message_obj)
+    else:
+        vector_service.upsert_message(None, user_message_obj)
+        vector_service.upsert_message(None, bot_message_obj)
     
     # 호감도 업데이트
     user_profile.affinity_score += 1
@@ -299,4 +268,4 @@ def _finalize_chat_interaction(request, user_message_text, response_json, histor
     recent_history_for_extraction = history[:5]
     extract_and_save_user_context_data(user, user_message_text, bot_message_text, recent_history_for_extraction, api_key)
 
-    return bot_message_text, explanation, bot_message_obj
+    return bot_message_text, explanation, llm_emotion, bot_message_obj
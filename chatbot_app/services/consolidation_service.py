@@ -0,0 +1,213 @@
+import os
+from datetime import datetime, time as dt_time, timedelta
+from typing import Dict, List, Optional
+
+import requests
+from django.db.models import Max
+from django.utils import timezone
+
+from ..models import ChatMessage, MemorySummary
+from . import vector_service
+
+# --- 보존/통합 파라미터 ---
+# 이 일수보다 오래된 대화만 요약 대상이 됩니다. 최근 대화는 메시지 단위 벡터로 그대로 둡니다.
+MEMORY_RETENTION_DAYS = int(os.getenv("MEMORY_RETENTION_DAYS", "90"))
+# 요약 한 개가 담당하는 기간(일)
+MEMORY_CONSOLIDATION_WINDOW_DAYS = int(os.getenv("MEMORY_CONSOLIDATION_WINDOW_DAYS", "7"))
+MEMORY_SUMMARY_MODEL = os.getenv("MEMORY_SUMMARY_MODEL", "gpt-4.1")
+MAX_TRANSCRIPT_CHARS = 12000 # 요약 요청 한 번에 담을 대화록의 최대 길이 (넘으면 나누어 요약한 뒤 합칩니다)
+MAX_MESSAGE_CHARS = 300 # 대화록에서 메시지 하나가 차지할 수 있는 최대 길이
+
+def consolidated_until(user_id) -> Optional[datetime]:
+    """사용자의 통합 워터마크(이 시각 이전의 대화는 요약 벡터로 대체됨)를 반환합니다."""
+    return MemorySummary.objects.filter(user_id=user_id).aggregate(until=Max('period_end'))['until']
+
+def summary_vector_id(user_id, period_start: datetime) -> str:
+    """기간별 요약 벡터 ID. 기간으로 결정되므로 중단 후 다시 실행해도 같은 벡터를 덮어씁니다."""
+    return f"summary-{user_id}-{period_start:%Y%m%d}"
+
+def _local_midnight(moment: datetime) -> datetime:
+    local_date = timezone.localtime(moment).date()
+    return timezone.make_aware(datetime.combine(local_date, dt_time.min))
+
+def _raw_vector_ids(messages: List[ChatMessage], following: Optional[ChatMessage] = None) -> List[str]:
+    """
+    기간 안의 메시지가 색인되어 있을 수 있는 모든 벡터 ID를 구합니다.
+    색인 모드(message/turn)와 관계없이 지울 수 있도록 두 형식을 모두 포함하며,
+    존재하지 않는 ID의 삭제는 Pinecone에서 무시됩니다.
+    turn 청크는 첫 메시지(사용자 발화)가 속한 기간이 맡으므로, 기간 마지막 발화의 응답이
+    다음 기간에 있으면(following) 그 쌍의 청크도 여기서 지웁니다. (다음 기간은 응답만으로 청크를 찾지 않습니다)
+    """
+    ids = [str(message.id) for message in messages]
+    candidates = messages + [following] if following is not None else messages
+    for i, message in enumerate(messages):
+        if not message.is_user:
+            continue
+        reply = candidates[i + 1] if i + 1 < len(candidates) and not candidates[i + 1].is_user else None
+        ids.extend(chunk['id'] for chunk in vector_service.build_turn_chunks(message, reply))
+        if reply is not None:
+            # 응답 없이 먼저 색인된 사용자 발화 청크가 남아 있을 수 있습니다.
+            ids.extend(chunk['id'] for chunk in vector_service.build_turn_chunks(message))
+    return list(dict.fromkeys(ids))
+
+def _transcript_chunks(messages: List[ChatMessage]) -> List[str]:
+    """기간의 대화록을 MAX_TRANSCRIPT_CHARS 이하의 조각들로 나눕니다. (메시지를 빠뜨리지 않도록 잘라내지 않고 나눕니다)"""
+    chunks, lines = [], []
+    used_chars = 0
+    for message in messages:
+        speaker = '사용자' if message.is_user else 'AI'
+        text = message.message[:MAX_MESSAGE_CHARS]
+        line = f"[{timezone.localtime(message.timestamp):%m-%d %H:%M}] {speaker}: {text}"
+        if lines and used_chars + len(line) > MAX_TRANSCRIPT_CHARS:
+            chunks.append("\n".join(lines))
+            lines, used_chars = [], 0
+        lines.append(line)
+        used_chars += len(line)
+    if lines:
+        chunks.append("\n".join(lines))
+    return chunks
+
+def _request_summary(prompt: str, api_key: str) -> str:
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    data = {
+        "model": MEMORY_SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": "You condense old conversations into concise long-term memory summaries written in Korean."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.0,
+    }
+    response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=data)
+    response.raise_for_status()
+    summary = response.json()['choices'][0]['message']['content'].strip()
+    if not summary:
+        raise ValueError("요약 응답이 비어 있습니다.")
+    return summary
+
+def summarize_messages(messages: List[ChatMessage], period_start: datetime, period_end: datetime, api_key: str) -> str:
+    """
+    기간 동안의 대화를 장기 기억용 요약문으로 만듭니다.
+    대화록이 한 번에 담기지 않으면 조각마다 부분 요약을 만든 뒤 그 요약들을 다시 하나로 합칩니다.
+    (기간의 원본 벡터는 모두 지워지므로, 요약에서 빠지는 메시지가 없어야 합니다)
+    """
+    period_label = f"{timezone.localtime(period_start):%Y-%m-%d} ~ {timezone.localtime(period_end - timedelta(seconds=1)):%Y-%m-%d}"
+    rules = """**[규칙]**
+1. 사용자가 한 일, 만난 사람, 장소, 감정, 고민, 계획 등 다시 언급될 만한 사실 위주로 적습니다.
+2. 인사, 잡담, AI의 일반적인 맞장구는 생략합니다.
+3. 날짜를 알 수 있는 사건은 날짜를 함께 적습니다.
+4. 5문장 이내의 한국어 평서문으로 작성하고, 요약문 외의 다른 말은 쓰지 않습니다."""
+    chunks = _transcript_chunks(messages)
+    if len(chunks) == 1:
+        prompt = f"""다음은 {period_label} 기간에 사용자와 AI가 나눈 대화입니다.
+나중에 이 기간을 떠올릴 수 있도록 장기 기억용 요약을 작성하세요.
+
+{rules}
+
+--- 대화 ---
+{chunks[0]}
+---"""
+        return f"({period_label}) {_request_summary(prompt, api_key)}"
+
+    partial_summaries = []
+    for i, chunk in enumerate(chunks, 1):
+        prompt = f"""다음은 {period_label} 기간에 사용자와 AI가 나눈 대화의 일부({i}/{len(chunks)})입니다.
+나중에 이 기간을 떠올릴 수 있도록 장기 기억용 요약을 작성하세요.
+
+{rules}
+
+--- 대화 ---
+{chunk}
+---"""
+        partial_summaries.append(_request_summary(prompt, api_key))
+
+    joined = "\n".join(f"- {summary}" for summary in partial_summaries)
+    prompt = f"""다음은 {period_label} 기간의 대화를 시간 순서대로 나누어 요약한 부분 요약들입니다.
+이 기간 전체를 떠올릴 수 있도록 하나의 장기 기억용 요약으로 합치세요.
+
+{rules}
+
+--- 부분 요약 ---
+{joined}
+---"""
+    return f"({period_label}) {_request_summary(prompt, api_key)}"
+
+def build_summary_chunk(user_id, period_start: datetime, period_end: datetime, summary: str, message_count: int) -> Dict:
+    """요약 하나를 벡터 하나로 색인하기 위한 청크를 구성합니다."""
+    return {
+        "id": summary_vector_id(user_id, period_start),
+        "text": summary,
+        "metadata": {
+            "text": summary,
+            "kind": "summary",
+            "speaker": "summary",
+            "user_id": str(user_id),
+            "timestamp": period_end.isoformat(),
+            "period_start": period_start.isoformat(),
+            "message_count": message_count,
+            "content_hash": vector_service.content_hash(summary),
+        }
+    }
+
+def consolidate_user(user, api_key: str, retention_days: int = MEMORY_RETENTION_DAYS,
+                     window_days: int = MEMORY_CONSOLIDATION_WINDOW_DAYS, delete_raw: bool = True,
+                     dry_run: bool = False) -> List[Dict]:
+    """
+    워터마크 이후로 보존 기간이 지난 대화를 window_days 단위로 요약하고, 요약 벡터로 원본 벡터를 대체합니다.
+    이미 통합된 기간은 건너뛰므로 매 실행은 새로 보존 기간을 넘긴 기간만 처리합니다.
+    처리한(dry_run이면 처리할) 기간 정보 목록을 반환합니다.
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    window = timedelta(days=window_days)
+    namespace = vector_service.user_namespace(user.id)
+    messages = ChatMessage.objects.filter(user=user).order_by('timestamp', 'id')
+
+    watermark = consolidated_until(user.id)
+    if watermark is not None:
+        messages = messages.filter(timestamp__gte=watermark)
+
+    results = []
+    period_start = watermark
+    while True:
+        # 대화가 없는 기간은 건너뛰고, 다음 메시지가 있는 날의 자정부터 새 기간을 시작합니다.
+        next_message = messages.filter(timestamp__gte=period_start) if period_start else messages
+        next_message = next_message.first()
+        if next_message is None:
+            break
+        if period_start is None or next_message.timestamp >= period_start + window:
+            period_start = _local_midnight(next_message.timestamp)
+        period_end = period_start + window
+        if period_end > cutoff:
+            break
+
+        window_messages = list(messages.filter(timestamp__gte=period_start, timestamp__lt=period_end))
+        result = {'period_start': period_start, 'period_end': period_end, 'message_count': len(window_messages)}
+        results.append(result)
+        if dry_run:
+            period_start = period_end
+            continue
+
+        # 요약 벡터를 먼저 저장하고 원본 벡터를 지운 뒤, 마지막에 요약 행(워터마크)을 기록합니다.
+        # 중간에 실패해도 같은 기간을 같은 벡터 ID로 다시 처리하면 되므로 안전합니다.
+        summary = summarize_messages(window_messages, period_start, period_end, api_key)
+        chunk = build_summary_chunk(user.id, period_start, period_end, summary, len(window_messages))
+        embedding = vector_service.get_embeddings([chunk['text']])[0]
+        vector_service.upsert_vectors([vector_service.attach_embedding(chunk, embedding)], namespace)
+        if delete_raw:
+            following = messages.filter(timestamp__gte=period_end).first()
+            raw_ids = _raw_vector_ids(window_messages, following)
+            vector_service.delete_vectors(raw_ids, namespace)
+            result['deleted_vectors'] = len(raw_ids)
+
+        MemorySummary.objects.update_or_create(
+            user=user, period_start=period_start,
+            defaults={
+                'period_end': period_end,
+                'summary': summary,
+                'message_count': len(window_messages),
+                'vector_id': chunk['id'],
+            }
+        )
+        print(f"--- {user.username}: {period_start:%Y-%m-%d} 기간의 메시지 {len(window_messages)}개를 요약 벡터로 통합 ---")
+        period_start = period_end
+
+    return results
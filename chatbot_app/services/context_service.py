@@ -1,58 +1,16 @@
-from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Count, Q
 from ..models import UserActivity
-
-def get_activity_recommendation(user, user_message):
-    """
-    사용자 메시지를 기반으로 활동 추천을 생성합니다.
-    """
-    # '추천', '갈만한' 등의 키워드가 있을 때만 작동
-    if '추천' not in user_message and '갈만한' not in user_message:
-        return ""
-
-    # '카페' 추천 로직
-    if '카페' in user_message:
-        seven_days_ago = timezone.now().date() - timedelta(days=7)
-        recent_cafe_visits = UserActivity.objects.filter(
-            user=user,
-            place__icontains='카페',
-            activity_date__gte=seven_days_ago
-        ).values('place').annotate(visit_count=Count('place')).order_by('-visit_count')
-
-        if not recent_cafe_visits:
-            return ""
-
-        most_visited = recent_cafe_visits[0]
-        if most_visited['visit_count'] > 1:
-            recommendation = f"이번 주에 {most_visited['place']}은(는) {most_visited['visit_count']}번이나 갔네. 오늘은 다른 곳에 가보는 건 어때? 예를 들면 새로운 동네 카페라던가."
-            return f"[시스템 정보: 사용자의 활동 기록을 바탕으로 다음 추천을 생성했어. 이 내용을 참고해서 자연스럽게 제안해봐: '{recommendation}']"
-            
-    return ""
+from . import activity_search_service
 
 def search_activities_for_context(user, user_message):
     """
     사용자 메시지의 키워드를 바탕으로 UserActivity를 검색하여 컨텍스트를 생성합니다.
-    (konlpy 없이 공백 분리 키워드 사용)
+    (konlpy 없이 조사/불용어를 떼어낸 키워드와 문자 n-gram 색인 사용)
     """
     try:
-        # [수정] konlpy 대신 사용자 메시지를 공백 기준으로 분리하여 키워드를 추출합니다.
-        # 이 방식은 정확도는 떨어지지만, 서버 실행 오류를 해결합니다.
-        # 영어 단어 또는 띄어쓰기가 잘 된 짧은 문장에서 효과적입니다.
-        keywords = [word for word in user_message.split() if len(word) > 1]
-        
-        if not keywords:
-            return ""
-
-        # Q 객체를 사용하여 여러 필드에서 OR 조건으로 검색
-        query = Q()
-        for keyword in keywords:
-            query |= Q(memo__icontains=keyword)
-            query |= Q(place__icontains=keyword)
-            query |= Q(companion__icontains=keyword)
-
-        # 현재 사용자의 기억만 대상으로 검색, 최근 순으로 10개까지
-        search_results = UserActivity.objects.filter(user=user).filter(query).order_by('-activity_date')[:10]
+        # 색인 조회로 관련도 상위 10개를 고르고, 본문은 ID로 한 번에 읽어옵니다.
+        ranked = activity_search_service.search(user.id, user_message, n_results=10)
+        activities = UserActivity.objects.filter(user=user).in_bulk([activity_id for activity_id, _ in ranked])
+        search_results = [activities[activity_id] for activity_id, _ in ranked if activity_id in activities]
 
         if not search_results:
             return ""
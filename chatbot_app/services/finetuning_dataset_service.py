@@ -0,0 +1,184 @@
+import gzip
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import struct
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from .text_service import tokenize
+
+# 저장된 봇 메시지 중 학습에 쓰면 안 되는 실패 응답들 (chat_service/views의 오류 문구)
+ERROR_REPLY_PREFIXES = (
+    '죄송합니다. API 응답을 가져오는 데 실패했습니다',
+    'API 요청 중 오류가 발생했습니다',
+    'API 응답 형식이 예상과 다릅니다',
+    '예상치 못한 오류가 발생했습니다',
+)
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16 # 밴드당 4행: 유사도 약 0.5부터 후보가 되고, 후보는 서명으로 다시 확인합니다.
+NEAR_DUPLICATE_THRESHOLD = 0.8 # 추정 Jaccard 유사도가 이 이상이면 중복으로 버립니다.
+
+def iter_turn_windows(rows: Iterator[Sequence], context_turns: int = 2) -> Iterator[Dict]:
+    """
+    (user_id, message, is_user) 행을 (user_id, timestamp) 순으로 받아 학습 예제 창을 만듭니다.
+    사용자 메시지 바로 뒤의 봇 메시지가 한 예제이고, 직전 context_turns개의 주고받기를 앞에 붙입니다.
+    사용자별로 최근 몇 턴만 들고 있으므로 메모리는 대화 이력 크기와 무관합니다.
+    """
+    current_user, pending_user_message = None, None
+    history = deque(maxlen=context_turns)
+    for user_id, message, is_user in rows:
+        if user_id != current_user:
+            current_user, pending_user_message = user_id, None
+            history.clear()
+        if is_user:
+            pending_user_message = message
+            continue
+        if pending_user_message is None:
+            continue
+        yield {'user_id': user_id, 'context': list(history), 'user': pending_user_message, 'assistant': message}
+        # 실패 응답은 실제로 오간 대화가 아니므로 다음 예제의 컨텍스트에도 넣지 않습니다.
+        if context_turns and not is_error_reply(message):
+            history.append((pending_user_message, message))
+        pending_user_message = None
+
+def is_error_reply(message) -> bool:
+    return (message or '').strip().startswith(ERROR_REPLY_PREFIXES)
+
+def is_usable(example: Dict, min_chars: int, max_chars: int) -> bool:
+    """실패 응답, 너무 짧거나 긴 예제를 걸러냅니다."""
+    user, assistant = (example['user'] or '').strip(), (example['assistant'] or '').strip()
+    if not user or len(assistant) < min_chars:
+        return False
+    if is_error_reply(assistant):
+        return False
+    total = len(user) + len(assistant) + sum(len(u) + len(a) for u, a in example['context'])
+    return total <= max_chars
+
+def to_chat_messages(system_prompt: str, example: Dict, anonymize) -> List[Dict]:
+    """OpenAI 파인튜닝 형식의 messages 리스트로 변환하며 모든 대화 본문을 익명화합니다."""
+    messages = [{"role": "system", "content": system_prompt}]
+    for user_message, assistant_message in example['context']:
+        messages.append({"role": "user", "content": anonymize(user_message)})
+        messages.append({"role": "assistant", "content": anonymize(assistant_message)})
+    messages.append({"role": "user", "content": anonymize(example['user'])})
+    messages.append({"role": "assistant", "content": anonymize(example['assistant'])})
+    return messages
+
+def _hash64(value: str) -> int:
+    return struct.unpack('<Q', hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest())[0]
+
+class MinHasher:
+    """
+    단어 2-gram 집합의 MinHash 서명을 만듭니다.
+    순열은 64비트 해시에 서로 다른 난수 마스크를 XOR하는 방식으로 흉내내, 외부 의존성 없이도 충분히 빠릅니다.
+    """
+
+    def __init__(self, num_perm=MINHASH_PERMUTATIONS, seed=1):
+        rng = random.Random(seed)
+        self.masks = [rng.getrandbits(64) for _ in range(num_perm)]
+
+    def shingles(self, text) -> set:
+        tokens = tokenize(text)
+        if len(tokens) < 2:
+            return {_hash64(' '.join(tokens))}
+        return {_hash64(f"{a} {b}") for a, b in zip(tokens, tokens[1:])}
+
+    def signature(self, text) -> List[int]:
+        hashes = self.shingles(text)
+        return [min(h ^ mask for h in hashes) for mask in self.masks]
+
+class DuplicateIndex:
+    """
+    완전 중복(정규화 텍스트 해시)과 근사 중복(MinHash LSH)을 판별하는 색인.
+    예제 수에 비례해 커지는 상태를 메모리 대신 임시 SQLite 파일에 두어, 입력이 아무리 커도 메모리 사용량이 일정합니다.
+    """
+
+    def __init__(self, path, num_perm=MINHASH_PERMUTATIONS, bands=LSH_BANDS, threshold=NEAR_DUPLICATE_THRESHOLD):
+        if num_perm % bands:
+            raise ValueError('num_perm은 bands의 배수여야 합니다.')
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = bands, num_perm // bands
+        self.threshold = threshold
+        self.db = sqlite3.connect(path)
+        self.db.executescript(
+            'PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;'
+            'CREATE TABLE exact (h INTEGER PRIMARY KEY);'
+            'CREATE TABLE signature (id INTEGER PRIMARY KEY, sig BLOB);'
+            'CREATE TABLE bucket (band INTEGER, key INTEGER, id INTEGER);'
+            'CREATE INDEX bucket_key ON bucket (band, key);'
+        )
+        self.next_id = 0
+        self.exact_duplicates = self.near_duplicates = 0
+
+    def _band_keys(self, signature) -> List[int]:
+        return [
+            _hash64(','.join(map(str, signature[band * self.rows:(band + 1) * self.rows]))) >> 1
+            for band in range(self.bands)
+        ]
+
+    def add_if_new(self, text) -> bool:
+        """처음 보는 내용이면 색인에 추가하고 True, (근사) 중복이면 False를 반환합니다."""
+        exact = _hash64(' '.join(tokenize(text))) >> 1 # SQLite INTEGER는 부호 있는 64비트입니다.
+        if self.db.execute('SELECT 1 FROM exact WHERE h = ?', (exact,)).fetchone():
+            self.exact_duplicates += 1
+            return False
+
+        signature = self.hasher.signature(text)
+        keys = self._band_keys(signature)
+        candidates = {
+            row[0] for band, key in enumerate(keys)
+            for row in self.db.execute('SELECT id FROM bucket WHERE band = ? AND key = ?', (band, key))
+        }
+        for candidate in candidates:
+            stored = struct.unpack(f'<{len(signature)}Q', self.db.execute(
+                'SELECT sig FROM signature WHERE id = ?', (candidate,)).fetchone()[0])
+            agreement = sum(a == b for a, b in zip(signature, stored)) / len(signature)
+            if agreement >= self.threshold:
+                self.near_duplicates += 1
+                return False
+
+        example_id, self.next_id = self.next_id, self.next_id + 1
+        self.db.execute('INSERT INTO exact (h) VALUES (?)', (exact,))
+        self.db.execute('INSERT INTO signature (id, sig) VALUES (?, ?)', (example_id, struct.pack(f'<{len(signature)}Q', *signature)))
+        self.db.executemany('INSERT INTO bucket (band, key, id) VALUES (?, ?, ?)',
+                            [(band, key, example_id) for band, key in enumerate(keys)])
+        return True
+
+    def close(self):
+        self.db.close()
+
+class ShardedWriter:
+    """train/validation 예제를 정해진 개수마다 새 gzip JSONL 샤드로 나눠 씁니다."""
+
+    def __init__(self, output_dir, split, shard_size):
+        self.output_dir, self.split, self.shard_size = output_dir, split, shard_size
+        self.shard_index, self.in_shard, self.total = 0, 0, 0
+        self.paths: List[str] = []
+        self._file: Optional[gzip.GzipFile] = None
+
+    def write(self, record: Dict):
+        if self._file is None or self.in_shard >= self.shard_size:
+            self._open_next()
+        self._file.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.in_shard += 1
+        self.total += 1
+
+    def _open_next(self):
+        self.close()
+        path = os.path.join(self.output_dir, f"{self.split}-{self.shard_index:05d}.jsonl.gz")
+        self._file = gzip.open(path, 'wb')
+        self.paths.append(path)
+        self.shard_index += 1
+        self.in_shard = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def is_validation(key: str, val_ratio: float) -> bool:
+    """내용 해시로 나누므로 같은 입력이면 실행할 때마다 같은 분할이 나옵니다."""
+    return (_hash64(key) % 10000) < val_ratio * 10000
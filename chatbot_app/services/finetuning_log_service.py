@@ -0,0 +1,172 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+from datetime import date, datetime
+from typing import Dict, List
+
+try:
+    import fcntl
+except ImportError:  # Windows 등 flock이 없는 환경에서는 프로세스별 샤드 파일에 씁니다.
+    fcntl = None
+
+FINETUNING_LOG_DIR = os.getenv("FINETUNING_LOG_DIR", ".")
+FINETUNING_LOG_MAX_BYTES = int(os.getenv("FINETUNING_LOG_MAX_BYTES", str(50 * 1024 * 1024))) # 이 크기를 넘으면 회전
+FINETUNING_LOG_FLUSH_INTERVAL = float(os.getenv("FINETUNING_LOG_FLUSH_INTERVAL", "2.0")) # 초
+FINETUNING_LOG_BATCH_SIZE = 200 # 한 번에 파일에 쓰는 최대 레코드 수
+FINETUNING_LOG_QUEUE_SIZE = 10000 # 디스크가 밀려도 메모리가 무한정 늘지 않도록 하는 버퍼 한도
+
+class FinetuningLogWriter:
+    """
+    파인튜닝 로그를 메모리 큐에 모았다가 백그라운드 스레드에서 묶음으로 파일에 씁니다.
+    - 채팅 요청 경로는 큐에 넣기만 하므로 디스크 I/O를 기다리지 않습니다. (큐가 가득 차면 기록을 버리고 경고만 남김)
+    - 여러 gunicorn 워커가 같은 파일에 쓰므로, 쓰기/회전은 별도 락 파일의 flock으로 직렬화합니다.
+      flock이 없는 환경에서는 프로세스별 샤드 파일(이름에 pid 포함)에 씁니다.
+    - 파일이 FINETUNING_LOG_MAX_BYTES를 넘거나 날짜가 바뀌면 타임스탬프를 붙여 이름을 바꾸고 gzip으로 압축합니다.
+    - 프로세스 종료 시 atexit에서 남은 기록을 모두 씁니다.
+    """
+
+    def __init__(self, filename, directory=FINETUNING_LOG_DIR, max_bytes=FINETUNING_LOG_MAX_BYTES,
+                 flush_interval=FINETUNING_LOG_FLUSH_INTERVAL):
+        self.directory = directory
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stop = None
+        self._dropped = 0
+
+    @property
+    def path(self):
+        base = os.path.join(self.directory, self.filename)
+        if fcntl is None:
+            stem, ext = os.path.splitext(base)
+            return f"{stem}.{os.getpid()}{ext}"
+        return base
+
+    def _ensure_started(self):
+        # gunicorn --preload처럼 fork된 워커에서는 부모의 스레드가 없으므로 프로세스마다 새로 시작합니다.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=FINETUNING_LOG_QUEUE_SIZE)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='finetuning-log-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, record: Dict):
+        """레코드를 버퍼에 넣고 바로 반환합니다."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._dropped += 1
+            if self._dropped % 100 == 1:
+                print(f"--- Fine-tuning log buffer full, dropped {self._dropped} record(s) so far ---")
+
+    def _drain(self, limit=FINETUNING_LOG_BATCH_SIZE) -> List[Dict]:
+        records = []
+        while len(records) < limit:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """버퍼에 쌓인 기록을 모두 파일에 씁니다. (백그라운드 스레드와 종료 시점에 호출)"""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        while True:
+            records = self._drain()
+            if not records:
+                return
+            try:
+                self._write(records)
+            except Exception as e:
+                # 디스크 오류가 나도 애플리케이션은 계속 동작해야 하므로 콘솔에만 남깁니다.
+                print(f"--- Could not write to fine-tuning log: {e} ---")
+                return
+
+    def _write(self, records):
+        os.makedirs(self.directory, exist_ok=True)
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+        rotated = None
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if self._should_rotate(len(data)):
+                    rotated = self._rotate()
+                # 한 번의 write로 묶음을 추가하므로 다른 워커의 줄과 섞이지 않습니다.
+                with open(self.path, 'ab') as f:
+                    f.write(data)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        if rotated:
+            # 압축은 락 밖에서 합니다. 회전된 파일 이름은 이 프로세스만 알고 있습니다.
+            self._compress(rotated)
+
+    def _should_rotate(self, incoming_bytes):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if stat.st_size == 0:
+            return False
+        if stat.st_size + incoming_bytes > self.max_bytes:
+            return True
+        return date.fromtimestamp(stat.st_mtime) < date.today()
+
+    def _rotate(self):
+        stem, ext = os.path.splitext(self.path)
+        rotated = f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}{ext}"
+        os.replace(self.path, rotated)
+        return rotated
+
+    def _compress(self, path):
+        try:
+            with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+        except Exception as e:
+            print(f"--- Could not compress rotated fine-tuning log {path}: {e} ---")
+
+    def close(self, timeout=5.0):
+        """백그라운드 스레드를 멈추고 남은 기록을 씁니다."""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self.flush()
+
+_writers: Dict[str, FinetuningLogWriter] = {}
+_writers_lock = threading.Lock()
+
+def get_writer(filename) -> FinetuningLogWriter:
+    """파일 이름별로 프로세스 안에서 하나의 writer를 공유합니다."""
+    with _writers_lock:
+        writer = _writers.get(filename)
+        if writer is None:
+            writer = _writers[filename] = FinetuningLogWriter(filename)
+        return writer
+
+@atexit.register
+def _flush_all_on_exit():
+    for writer in list(_writers.values()):
+        writer.close()
@@ -0,0 +1,128 @@
+import math
+from collections import Counter, defaultdict
+from typing import List, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from ..models import ChatMessage, MessageNgram, LexicalIndexStats
+from .text_service import char_ngrams
+
+# --- BM25 파라미터 ---
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 사용자 문서의 이 비율 이상에 등장하는 gram은 변별력이 없으므로 검색에서 제외합니다. ('하고', '어서' 등)
+MAX_DOCUMENT_FREQUENCY_RATIO = 0.5
+
+def _build_postings(message_obj):
+    grams = char_ngrams(message_obj.message)
+    doc_length = sum(grams.values())
+    postings = [
+        MessageNgram(
+            user_id=message_obj.user_id,
+            message_id=message_obj.id,
+            gram=gram,
+            tf=min(tf, 32767),
+            doc_length=doc_length,
+        )
+        for gram, tf in grams.items()
+    ]
+    return postings, doc_length
+
+def index_message(message_obj):
+    """메시지 하나를 어휘 색인에 추가하고 사용자 통계를 갱신합니다. (쓰기 시점 증분 색인)"""
+    try:
+        postings, doc_length = _build_postings(message_obj)
+        if not postings:
+            return
+        with transaction.atomic():
+            MessageNgram.objects.bulk_create(postings, ignore_conflicts=True)
+            stats, _ = LexicalIndexStats.objects.get_or_create(user_id=message_obj.user_id)
+            LexicalIndexStats.objects.filter(pk=stats.pk).update(
+                doc_count=F('doc_count') + 1,
+                total_length=F('total_length') + doc_length,
+            )
+    except Exception as e:
+        print(f"--- 어휘 색인 추가 중 오류 발생 (ID: {message_obj.id}): {e} ---")
+
+def unindex_message(message_obj):
+    """
+    삭제된 메시지를 사용자 통계에서 뺍니다. (posting 행은 외래 키 CASCADE로 함께 지워집니다)
+    색인할 때와 같은 방식으로 길이를 다시 계산하므로 별도 기록 없이 정확히 되돌립니다.
+    """
+    try:
+        doc_length = sum(char_ngrams(message_obj.message).values())
+        if not doc_length:
+            return
+        LexicalIndexStats.objects.filter(user_id=message_obj.user_id).update(
+            doc_count=Greatest(F('doc_count') - 1, 0),
+            total_length=Greatest(F('total_length') - doc_length, 0),
+        )
+    except Exception as e:
+        print(f"--- 어휘 색인 통계 차감 중 오류 발생 (ID: {message_obj.id}): {e} ---")
+
+def rebuild_user_index(user_id, batch_size=1000):
+    """사용자의 어휘 색인을 ChatMessage로부터 다시 만듭니다. 색인된 메시지 수를 반환합니다."""
+    doc_count = 0
+    total_length = 0
+    with transaction.atomic():
+        MessageNgram.objects.filter(user_id=user_id).delete()
+        buffer = []
+        for message in ChatMessage.objects.filter(user_id=user_id).only('id', 'user_id', 'message').iterator(chunk_size=batch_size):
+            postings, doc_length = _build_postings(message)
+            if not postings:
+                continue
+            buffer.extend(postings)
+            doc_count += 1
+            total_length += doc_length
+            if len(buffer) >= batch_size * 10:
+                MessageNgram.objects.bulk_create(buffer, batch_size=batch_size)
+                buffer = []
+        if buffer:
+            MessageNgram.objects.bulk_create(buffer, batch_size=batch_size)
+        LexicalIndexStats.objects.update_or_create(
+            user_id=user_id, defaults={'doc_count': doc_count, 'total_length': total_length}
+        )
+    return doc_count
+
+def search(user_id, query: str, n_results: int = 5) -> List[Tuple[int, float]]:
+    """
+    BM25 점수 기준 상위 n_results개의 (ChatMessage ID, 점수)를 반환합니다.
+    임베딩 호출 없이 DB 인덱스 조회만으로 동작합니다.
+    """
+    query_grams = char_ngrams(query)
+    if not query_grams:
+        return []
+
+    stats = LexicalIndexStats.objects.filter(user_id=user_id).first()
+    if not stats or not stats.doc_count:
+        return []
+    avg_length = stats.total_length / stats.doc_count
+
+    # 1. gram별 문서 빈도(df)를 먼저 구해, 너무 흔한 gram은 posting을 읽지 않습니다.
+    document_frequencies = dict(
+        MessageNgram.objects.filter(user_id=user_id, gram__in=list(query_grams))
+        .values_list('gram')
+        .annotate(df=Count('id'))
+    )
+    max_df = max(1, int(stats.doc_count * MAX_DOCUMENT_FREQUENCY_RATIO))
+    useful_grams = [gram for gram, df in document_frequencies.items() if df <= max_df or stats.doc_count < 10]
+    if not useful_grams:
+        return []
+
+    idf = {
+        gram: math.log(1 + (stats.doc_count - document_frequencies[gram] + 0.5) / (document_frequencies[gram] + 0.5))
+        for gram in useful_grams
+    }
+
+    # 2. 남은 gram의 posting만 읽어 BM25 점수를 누적합니다.
+    scores = defaultdict(float)
+    postings = MessageNgram.objects.filter(user_id=user_id, gram__in=useful_grams).values_list(
+        'message_id', 'gram', 'tf', 'doc_length'
+    )
+    for message_id, gram, tf, doc_length in postings:
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_length / avg_length)
+        scores[message_id] += query_grams[gram] * idf[gram] * tf * (BM25_K1 + 1) / (tf + length_norm)
+
+    return Counter(scores).most_common(n_results)
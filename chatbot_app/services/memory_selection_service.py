@@ -0,0 +1,82 @@
+import math
+import os
+from typing import Dict, List, Sequence
+
+from ..models import UserAttribute, UserRelationship
+from . import relationship_service
+from .text_service import char_ngrams, extract_keywords
+
+# 섹션별로 관련도 순으로 남길 항목 수. 항목이 (top_k + 고정 항목 수) 이하인 사용자는 전부 그대로 넣습니다.
+ATTRIBUTE_TOP_K = int(os.getenv("MEMORY_ATTRIBUTE_TOP_K", "8"))
+RELATIONSHIP_TOP_K = int(os.getenv("MEMORY_RELATIONSHIP_TOP_K", "5"))
+# 메시지 내용과 관계없이 항상 넣는 속성 유형 (대화 톤/호칭에 늘 필요한 정보)
+PINNED_ATTRIBUTE_TYPES = ('이름', '닉네임', '호칭', '나이', '생일', '성별', 'mbti', '직업', '성격')
+MAX_PINNED_ATTRIBUTES = 6
+# 관계 유형에 이 단어가 들어가면 항상 넣습니다. (가족/연인처럼 자주 화제가 되는 인물)
+PINNED_RELATIONSHIP_KEYWORDS = ('가족', '엄마', '아빠', '어머니', '아버지', '애인', '연인', '여자친구', '남자친구', '배우자', '남편', '아내')
+MAX_PINNED_RELATIONSHIPS = 3
+# 최근 대화는 현재 메시지보다 덜 반영합니다.
+HISTORY_WEIGHT = 0.5
+# 이름/별명으로 직접 언급된 인물은 어휘 점수보다 앞서도록 구체성(1 / 같은 호칭에 걸린 인물 수)에 곱합니다.
+MENTION_SCORE = 100.0
+
+def _query_weights(texts: Sequence[str]) -> Dict[str, float]:
+    """현재 메시지(첫 번째)와 최근 대화의 키워드 bigram → 가중치. 같은 gram은 큰 가중치를 따릅니다."""
+    weights = {}
+    for i, text in enumerate(texts):
+        weight = 1.0 if i == 0 else HISTORY_WEIGHT
+        for gram in char_ngrams(' '.join(extract_keywords(text))):
+            if weights.get(gram, 0.0) < weight:
+                weights[gram] = weight
+    return weights
+
+def lexical_score(text, weights: Dict[str, float]) -> float:
+    """항목 텍스트와 질의의 bigram 겹침 점수. 긴 항목이 유리하지 않도록 gram 수의 제곱근으로 나눕니다."""
+    grams = set(char_ngrams(text))
+    if not grams or not weights:
+        return 0.0
+    return sum(weights.get(gram, 0.0) for gram in grams) / math.sqrt(len(grams))
+
+def _pick(items, scores: Dict[int, float], pinned_ids: List[int], top_k: int):
+    """고정 항목 + 점수 상위 top_k(점수 0 제외)를 원래 순서대로 반환합니다. (프롬프트가 턴마다 덜 흔들리도록)"""
+    ranked = sorted((item_id for item_id, score in scores.items() if score > 0 and item_id not in pinned_ids),
+                    key=lambda item_id: -scores[item_id])
+    selected = set(pinned_ids) | set(ranked[:top_k])
+    return [item for item in items if item.id in selected]
+
+def select_attributes(user, texts: Sequence[str], top_k: int = ATTRIBUTE_TOP_K) -> List[UserAttribute]:
+    """현재 메시지와 최근 대화에 관련된 사용자 속성만 고릅니다. texts[0]은 현재 메시지입니다."""
+    attributes = list(UserAttribute.objects.filter(user=user).order_by('id'))
+    if len(attributes) <= top_k + MAX_PINNED_ATTRIBUTES:
+        return attributes
+
+    pinned_ids = [
+        attr.id for attr in attributes
+        if (attr.fact_type or '').strip().lower() in PINNED_ATTRIBUTE_TYPES
+    ][:MAX_PINNED_ATTRIBUTES]
+    weights = _query_weights(texts)
+    scores = {attr.id: lexical_score(f"{attr.fact_type} {attr.content}", weights) for attr in attributes}
+    return _pick(attributes, scores, pinned_ids, top_k)
+
+def select_relationships(user, texts: Sequence[str], top_k: int = RELATIONSHIP_TOP_K) -> List[UserRelationship]:
+    """
+    현재 메시지와 최근 대화에 관련된 인물만 고릅니다.
+    이름/별명 언급(로컬 별칭 인덱스)이 가장 강한 신호이고, 그다음이 관계 유형/특징과의 어휘 겹침입니다.
+    """
+    relationships, index, learned = relationship_service.load_index(user.id)
+    items = list(relationships.values())
+    if len(items) <= top_k + MAX_PINNED_RELATIONSHIPS:
+        return items
+
+    pinned_ids = [
+        rel.id for rel in items
+        if any(keyword in (rel.relationship_type or '') for keyword in PINNED_RELATIONSHIP_KEYWORDS)
+    ][:MAX_PINNED_RELATIONSHIPS]
+    weights = _query_weights(texts)
+    scores = {
+        rel.id: lexical_score(f"{rel.relationship_type} {rel.position or ''} {' '.join(rel.traits or [])}", weights)
+        for rel in items
+    }
+    for rel_id, specificity in relationship_service.match_mentions(texts, relationships, index, learned).items():
+        scores[rel_id] = MENTION_SCORE * specificity + scores[rel_id]
+    return _pick(items, scores, pinned_ids, top_k)
@@ -1,8 +1,13 @@
+import hashlib
 import json
 import requests
 from datetime import datetime, timedelta
+from django.db import transaction
 from django.utils import timezone
 from ..models import UserAttribute, UserActivity, UserRelationship
+from . import analytics_service, finetuning_service, memory_selection_service, relationship_service
+from .place_service import normalize_place
+from .text_service import tokenize
 
 def extract_and_save_user_context_data(user, user_message, bot_message, recent_history, api_key):
     """
@@ -13,9 +18,10 @@ def extract_and_save_user_context_data(user, user_message, bot_message, recent_h
         today_str = timezone.now().astimezone(timezone.get_default_timezone()).strftime('%Y-%m-%d')
 
         # 1. 각 정보 유형에 대한 컨텍스트 준비
-        existing_attributes_context = _get_existing_attributes_context(user)
+        conversation_texts = [user_message, bot_message] + [chat.message for chat in recent_history or []]
+        existing_attributes_context = _get_existing_attributes_context(user, conversation_texts)
         conversation_history_context = _get_conversation_history_context(recent_history)
-        existing_relationships_context = _get_existing_relationships_context(user)
+        existing_relationships_context = _get_existing_relationships_context(user, conversation_texts)
 
         # 2. 통합 프롬프트 생성
         extraction_prompt = f"""당신은 사용자 대화를 분석하여 세 가지 유형의 정보(사용자 속성, 활동, 인간관계)를 추출하는 고도로 지능적인 AI입니다.
@@ -54,9 +60,10 @@ AI: {bot_message}
 {existing_relationships_context}
 - **규칙**:
     1. **인물만 추출**: 'AI', '챗봇' 등 사람이 아닌 대상은 제외합니다.
-    2. **별명/애칭 처리**: 언급된 이름이 '현재 저장된 인물 목록'에 있는 사람의 별명으로 보이면, `name`은 반드시 목록의 **원래 이름**으로 사용합니다. (예: 민이 -> 석민)
-    3. **정보 통합**: 새로운 특징이 언급되면 `traits`에 추가합니다.
-- **JSON 형식**: `{{ "name": "원래 이름", "relationship_type": "관계 유형", "traits": "새로운 특징" }}`
+    2. **기존 인물 지정**: 언급된 인물이 '현재 저장된 인물 목록'의 사람(별명/애칭 포함)이 확실하면, `name`은 목록의 **원래 이름**으로, `serial_code`는 그 사람의 serial_code로 채웁니다. (예: 민이 -> 석민)
+    3. **새 인물**: 목록에 없는 사람이거나 같은 사람인지 확실하지 않으면 `serial_code`를 비워 두세요. 이름 글자가 일부 겹친다고 같은 사람으로 보지 마세요. (예: 민아 ≠ 석민)
+    4. **정보 통합**: 새로운 특징이 언급되면 `traits`에 추가합니다.
+- **JSON 형식**: `{{ "name": "원래 이름", "serial_code": "기존 인물의 serial_code 또는 null", "relationship_type": "관계 유형", "traits": "새로운 특징" }}`
 
 **[최종 반환 형식]**
 - 반드시 다음 세 개의 키를 가진 단일 JSON 객체로 반환하세요: `user_attributes`, `activity`, `relationships`.
@@ -66,7 +73,7 @@ AI: {bot_message}
   `{{
     "user_attributes": [{{ "action": "update", "fact_type": "성격", "content": "똑똑하고 장난기 많음" }}],
     "activity": {{ "activity_date": "{today_str}", "place": "강남역", "memo": "친구와 저녁 식사" }},
-    "relationships": [{{ "name": "석민", "relationship_type": "소꿉친구", "traits": "치위생사 준비중" }}]
+    "relationships": [{{ "name": "석민", "serial_code": null, "relationship_type": "소꿉친구", "traits": "치위생사 준비중" }}]
   }}`
 """
         data = {
@@ -85,22 +92,24 @@ AI: {bot_message}
         content_str = response.json().get('choices', [{}])[0].get('message', {}).get('content', '{{}}')
         extracted_data = json.loads(content_str)
 
-        # 3. 각 정보 유형별로 저장 함수 호출
-        if extracted_data.get("user_attributes"):
-            _save_user_attributes(user, extracted_data["user_attributes"])
+        # 3. 각 정보 유형별로 저장 함수 호출 (한 트랜잭션으로 묶어 추출 결과가 한 번에 반영되도록 합니다)
+        with transaction.atomic():
+            if extracted_data.get("user_attributes"):
+                _save_user_attributes(user, extracted_data["user_attributes"])
 
-        if extracted_data.get("activity"):
-            _save_activity(user, extracted_data["activity"], today_str)
+            if extracted_data.get("activity"):
+                _save_activity(user, extracted_data["activity"], today_str)
 
-        if extracted_data.get("relationships"):
-            _save_relationships(user, extracted_data["relationships"])
+            if extracted_data.get("relationships"):
+                _save_relationships(user, extracted_data["relationships"])
 
     except (requests.exceptions.RequestException, json.JSONDecodeError, KeyError, IndexError, ValueError) as e:
         print(f"--- Could not extract or save attributes or activities due to an error: {e} ---")
 
-def _get_existing_attributes_context(user):
-    existing_attributes = UserAttribute.objects.filter(user=user)
-    if not existing_attributes.exists():
+def _get_existing_attributes_context(user, texts):
+    # 대화와 관련된 속성 + 고정 속성만 넣습니다. (저장 시 같은 유형/내용은 다시 한번 걸러집니다)
+    existing_attributes = memory_selection_service.select_attributes(user, texts)
+    if not existing_attributes:
         return ""
     attribute_list = [f"- {attr.fact_type}: {attr.content}" for attr in existing_attributes]
     return "\n--- 현재까지 기억된 사용자 속성 ---\n" + "\n".join(attribute_list) + "\n--------------------\n"
@@ -112,36 +121,93 @@ def _get_conversation_history_context(recent_history):
     history_str = "\n".join(reversed(history_strings))
     return f"--- 이전 대화 ---\n{history_str}\n---\n"
 
-def _get_existing_relationships_context(user):
-    existing_relationships = UserRelationship.objects.filter(user=user)
-    if not existing_relationships.exists():
+def _get_existing_relationships_context(user, texts):
+    # 전체 인물 목록 대신, 대화에 언급된 것으로 보이는 인물(별명/애칭 포함)만 후보로 넣습니다.
+    candidates = relationship_service.find_candidates(user.id, texts)
+    if not candidates:
         return ""
-    rel_list = [f"- {rel.name} ({rel.relationship_type})" for rel in existing_relationships]
+    rel_list = [f"- {rel.name} ({rel.relationship_type}, serial_code: {rel.serial_code})" for rel in candidates]
     rel_list_str = "\n".join(rel_list)
     return f"--- 현재 저장된 인물 목록 ---\n{rel_list_str}\n---"
 
+def activity_fingerprint(activity_date, place, companion, memo) -> str:
+    """
+    활동 내용의 정규화 해시. 공백/구두점/대소문자만 다른 메모와 '스벅'/'스타벅스'처럼 표기만 다른 장소는 같은 값이 됩니다.
+    activity_date는 date나 'YYYY-MM-DD' 문자열 모두 받습니다.
+    """
+    parts = [
+        str(activity_date or ''),
+        normalize_place(place or ''),
+        ''.join(tokenize(companion)),
+        ''.join(tokenize(memo)),
+    ]
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
 def _save_user_attributes(user, attributes_data):
+    """
+    추출된 속성을 기존 속성과 메모리에서 비교한 뒤 한 번에 반영합니다.
+    기존 속성 조회 1회 + bulk_create 1회 + bulk_update 1회로, 항목 수와 무관하게 쿼리 수가 일정합니다.
+    - update: 같은 유형의 기존 속성 내용을 바꾸고, 없으면 새로 만듭니다. (update_or_create와 같은 의미)
+    - create: 같은 (유형, 내용)이 없을 때만 새로 만듭니다. (get_or_create와 같은 의미)
+    """
     print(f"--- Found Attributes to Create/Update for {user.username}: {attributes_data} ---")
+    existing = list(UserAttribute.objects.filter(user=user).order_by('id'))
+    by_fact_type = {}
+    for attr in existing:
+        by_fact_type.setdefault(attr.fact_type, attr)
+    known_pairs = {(attr.fact_type, attr.content) for attr in existing}
+
+    to_create, to_update = [], {}
     for attribute_data in attributes_data:
         action = attribute_data.get('action')
         fact_type = attribute_data.get('fact_type')
         content = attribute_data.get('content')
 
-        if not (action and fact_type and content):
+        if not (action and fact_type and content) or action not in ('create', 'update'):
+            continue
+        if (fact_type, content) in known_pairs:
             continue
 
-        if action == 'update':
-            UserAttribute.objects.update_or_create(
-                user=user,
-                fact_type=fact_type,
-                defaults={'content': content}
-            )
-        elif action == 'create':
-            UserAttribute.objects.get_or_create(
-                user=user,
-                fact_type=fact_type,
-                content=content
-            )
+        target = by_fact_type.get(fact_type) if action == 'update' else None
+        if target is not None:
+            known_pairs.discard((fact_type, target.content))
+            target.content = content
+            if target.pk is not None:
+                to_update[target.pk] = target
+        else:
+            target = UserAttribute(user=user, fact_type=fact_type, content=content)
+            by_fact_type.setdefault(fact_type, target)
+            to_create.append(target)
+        known_pairs.add((fact_type, content))
+
+    with transaction.atomic():
+        if to_create:
+            # 동시에 같은 속성이 저장된 경우에는 unique 제약에 맡겨 조용히 건너뜁니다.
+            UserAttribute.objects.bulk_create(to_create, ignore_conflicts=True)
+        if to_update:
+            UserAttribute.objects.bulk_update(list(to_update.values()), ['content'])
+        # bulk 저장은 시그널을 보내지 않으므로, 이름이 바뀌었으면 익명화 매처 무효화를 직접 알립니다.
+        if any(attr.fact_type == '이름' for attr in to_create + list(to_update.values())):
+            finetuning_service.invalidate_anonymizer(user.id)
+
+def _parse_activity_time(time_str):
+    if not time_str:
+        return None
+    try:
+        return datetime.strptime(time_str, '%H:%M').time()
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(time_str, '%I:%M %p').time()
+    except ValueError:
+        pass
+    if '시' in time_str:
+        time_str = time_str.replace('시', ':').replace('분', '')
+        try:
+            return datetime.strptime(time_str.strip(), '%H:%M').time()
+        except ValueError:
+            return None
+    return None
 
 def _save_activity(user, activity_data, today_str):
     activities_to_save = []
@@ -153,74 +219,114 @@ def _save_activity(user, activity_data, today_str):
         print(f"--- Invalid activity_data format: {type(activity_data)} ---")
         return
 
-    for single_activity_data in activities_to_save:
-        if single_activity_data and (single_activity_data.get('place') or single_activity_data.get('memo')):
+    activities_to_save = [
+        data for data in activities_to_save
+        if isinstance(data, dict) and (data.get('place') or data.get('memo'))
+    ]
+    if not activities_to_save:
+        return
+
+    # 최근 10분 이내에 같은 내용(날짜/장소/동행인/정규화 메모)의 활동이 있는지 (user, fingerprint) 인덱스로 한 번에 확인합니다.
+    fingerprints = [
+        activity_fingerprint(
+            data.get('activity_date', today_str), data.get('place'), data.get('companion'), data.get('memo')
+        )
+        for data in activities_to_save
+    ]
+    time_threshold = timezone.now() - timedelta(minutes=10)
+    recent_fingerprints = set(UserActivity.objects.filter(
+        user=user,
+        fingerprint__in=set(fingerprints),
+        created_at__gte=time_threshold
+    ).values_list('fingerprint', flat=True))
+
+    # 활동 저장은 장소 해석/검색 색인/방문 통계 시그널이 필요하므로 create()를 유지하되,
+    # 전체를 한 트랜잭션으로 묶어 활동마다 따로 커밋하지 않습니다.
+    with transaction.atomic():
+        for single_activity_data, fingerprint in zip(activities_to_save, fingerprints):
             memo_content = single_activity_data.get('memo')
+            if fingerprint in recent_fingerprints:
+                print(f"--- Duplicate activity found, skipping save: {memo_content} ---")
+                continue  # 중복이므로 이 활동은 건너뜀
+            recent_fingerprints.add(fingerprint)
 
-            # 최근 10분 이내에 동일한 메모 내용이 있는지 확인
-            if memo_content:
-                time_threshold = timezone.now() - timedelta(minutes=10)
-                is_duplicate = UserActivity.objects.filter(
-                    user=user,
-                    memo=memo_content,
-                    created_at__gte=time_threshold
-                ).exists()
-
-                if is_duplicate:
-                    print(f"--- Duplicate activity found, skipping save: {{memo_content}} ---")
-                    continue  # 중복이므로 이 활동은 건너뜀
-            
-            time_str = single_activity_data.get('activity_time')
-            parsed_time = None
-            if time_str:
-                try:
-                    parsed_time = datetime.strptime(time_str, '%H:%M').time()
-                except ValueError:
-                    try:
-                        parsed_time = datetime.strptime(time_str, '%I:%M %p').time()
-                    except ValueError:
-                        if '시' in time_str:
-                            time_str = time_str.replace('시', ':').replace('분', '')
-                            try:
-                                parsed_time = datetime.strptime(time_str.strip(), '%H:%M').time()
-                            except ValueError:
-                                parsed_time = None
-
-            UserActivity.objects.create(
+            activity = UserActivity.objects.create(
                 user=user,
                 activity_date=single_activity_data.get('activity_date', today_str),
-                activity_time=parsed_time,
+                activity_time=_parse_activity_time(single_activity_data.get('activity_time')),
                 place=single_activity_data.get('place'),
                 companion=single_activity_data.get('companion'),
                 memo=memo_content
             )
-            print(f"--- New Activity Saved for {user.username}: {{single_activity_data}} ---")
+            # 온라인 모드에서는 활동과 같은 트랜잭션에서 분석 카운터도 갱신합니다.
+            if analytics_service.ANALYTICS_ONLINE_UPDATES:
+                analytics_service.apply_activity(activity)
+            print(f"--- New Activity Saved for {user.username}: {single_activity_data} ---")
 
 def _save_relationships(user, relationships_data):
+    """
+    추출된 인물을 기존 인물 목록과 메모리에서 비교한 뒤 bulk_create/bulk_update로 한 번에 반영합니다.
+    새 인물은 특징까지 채운 상태로 만들므로 생성 후 다시 save()하지 않습니다.
+    bulk 저장은 pre_save 시그널을 보내지 않으므로 프롬프트용 요약 줄은 여기서 직접 갱신합니다.
+    기존 인물에는 모델이 돌려준 serial_code, 정확히 같은 이름, 학습된 별칭으로만 연결합니다.
+    이름 일부가 겹치는 것만으로는 연결하지 않으므로, 별명일지 모르는 새 이름은 새 인물로 저장됩니다.
+    """
     print(f"--- Found Relationships to Create/Update for {user.username}: {relationships_data} ---")
+    relationships, _, learned = relationship_service.load_index(user.id)
+    by_name = {}
+    for rel in relationships.values():
+        by_name.setdefault(rel.name, rel)
+
+    to_create, to_update, new_aliases = [], {}, []
+    placeholders_changed = False # 익명화 치환(이름 → [관계 유형])에 영향을 주는 변경이 있었는지
     for rel_data in relationships_data:
-        name = rel_data.get('name')
+        name = (rel_data.get('name') or '').strip()
         rel_type = rel_data.get('relationship_type')
         traits = rel_data.get('traits')
 
         if not name or not rel_type:
             continue
 
-        obj, created = UserRelationship.objects.update_or_create(
-            user=user,
-            name=name,
-            defaults={'relationship_type': rel_type}
-        )
-
-        if created:
-            obj.traits = traits
-            obj.save()
+        serial_code = rel_data.get('serial_code')
+        # serial_code가 있으면 이름보다 우선합니다. (모델이 별명 "민이"로 돌려줘도 지목한 인물로 연결)
+        obj = None if serial_code else by_name.get(name)
+        if obj is None:
+            obj = relationship_service.resolve_mention(user.id, name, serial_code, relationships, learned)
+            if obj is not None and obj.name != name:
+                # 같은 추출 안에서 같은 이름이 다시 나오면 by_name에서 바로 이 인물로 합쳐집니다.
+                by_name[name] = obj
+                # 모델이 serial_code로 지목한 경우에만 새 별칭으로 기억합니다. (이미 학습된 별칭이면 unique 제약으로 건너뜀)
+                if serial_code and str(obj.serial_code) == str(serial_code).strip():
+                    new_aliases.append((obj, name))
+                print(f"--- Resolved '{name}' to existing relationship: {obj.name} ---")
+        if obj is None:
+            # 이번 추출에서 먼저 만들어진 인물 (아직 serial_code로 조회할 수 없음)
+            obj = by_name.get(name)
+        if obj is None:
+            obj = UserRelationship(user=user, name=name, relationship_type=rel_type)
+            obj.add_traits(traits)
+            obj.context_line = obj.build_context_line()
+            by_name[name] = obj
+            to_create.append(obj)
             print(f"--- Created new relationship: {name} ---")
-        else:
-            if traits:
-                existing_traits = {t.strip() for t in (obj.traits or "").split(',') if t.strip()}
-                new_traits = {t.strip() for t in traits.split(',') if t.strip()}
-                existing_traits.update(new_traits)
-                obj.traits = ", ".join(existing_traits)
-                obj.save()
-                print(f"--- Updated relationship: {name} ---")
+            continue
+
+        if obj.relationship_type != rel_type:
+            placeholders_changed = True
+        obj.relationship_type = rel_type
+        obj.add_traits(traits)
+        obj.context_line = obj.build_context_line()
+        if obj.pk is not None:
+            to_update[obj.pk] = obj
+            print(f"--- Updated relationship: {name} ---")
+
+    with transaction.atomic():
+        if to_create:
+            UserRelationship.objects.bulk_create(to_create)
+        if to_update:
+            UserRelationship.objects.bulk_update(list(to_update.values()), ['relationship_type', 'traits', 'context_line'])
+        if new_aliases:
+            relationship_service.learn_aliases(user.id, new_aliases)
+        # bulk 저장은 시그널을 보내지 않으므로, 이름/관계 유형이 바뀌었으면 익명화 매처 무효화를 직접 알립니다.
+        if to_create or new_aliases or placeholders_changed:
+            finetuning_service.invalidate_anonymizer(user.id)
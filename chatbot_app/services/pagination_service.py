@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from functools import reduce
+from operator import or_
+from typing import List, Optional, Sequence, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(values: Sequence) -> str:
+    """정렬 키 값들을 URL에 넣을 수 있는 불투명한 문자열로 만듭니다. (datetime은 마이크로초까지 보존)"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, ensure_ascii=False).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str, size: int) -> List:
+    """encode_cursor의 역. 형식이 틀리거나 값이 스칼라(문자열/숫자)가 아니면 ValueError를 던집니다."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"잘못된 커서입니다: {e}")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("잘못된 커서입니다.")
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+        raise ValueError("잘못된 커서입니다.")
+    return values
+
+def parse_limit(value, default: int) -> int:
+    """쿼리스트링의 limit를 1..MAX_PAGE_SIZE 범위의 정수로 바꿉니다."""
+    try:
+        return max(1, min(MAX_PAGE_SIZE, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+def keyset_page(queryset, keys: Sequence[str], cursor: Optional[str] = None, limit: int = 20,
+                descending: bool = False) -> Tuple[List, Optional[str]]:
+    """
+    (keys...) 순서의 키셋 페이지네이션. OFFSET 없이 커서 다음 행부터 limit개만 읽으므로
+    기록이 아무리 많아도 페이지마다 인덱스 범위 스캔 한 번으로 끝납니다.
+    queryset은 keys를 모두 포함하는 values() 쿼리셋이어야 하고, 마지막 키는 유일해야 합니다. (보통 id)
+    반환: (행 목록, 다음 페이지 커서 또는 None)
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(keys))
+        op = 'lt' if descending else 'gt'
+        # (a, b) > (va, vb)  ⇔  a > va  OR  (a = va AND b > vb)
+        # 필드 형식에 맞지 않는 값('notadate' 같은 시각)은 조건을 만들 때 필드 변환에서 걸러집니다.
+        try:
+            queryset = queryset.filter(reduce(or_, (
+                Q(**dict(zip(keys[:i], values[:i])), **{f"{keys[i]}__{op}": values[i]})
+                for i in range(len(keys))
+            )))
+        except (ValidationError, TypeError) as e:
+            raise ValueError(f"잘못된 커서입니다: {e}")
+    queryset = queryset.order_by(*[f"-{key}" if descending else key for key in keys])
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1][key] for key in keys])
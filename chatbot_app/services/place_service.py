@@ -0,0 +1,89 @@
+import difflib
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+
+from ..models import Place, PlaceAlias
+from .text_service import strip_particle, tokenize
+
+# 자주 쓰는 줄임말/별칭 → 정식 상호. 정규화 단계에서 토큰 단위로 치환합니다.
+PLACE_ABBREVIATIONS = {
+    '스벅': '스타벅스', 'starbucks': '스타벅스', '투썸': '투썸플레이스', '맥날': '맥도날드', '버킹': '버거킹',
+    '베라': '배스킨라빈스', '던킨': '던킨도너츠', '올영': '올리브영', '롯시': '롯데시네마', '메박': '메가박스',
+}
+# 지점 없이 상호만 말해도 되는 체인 브랜드들 ("스벅 갔어" → 사용자가 가는 그 스타벅스)
+CHAIN_BRANDS = frozenset(PLACE_ABBREVIATIONS.values()) | {
+    '이디야', '빽다방', '메가커피', '컴포즈커피', '폴바셋', '블루보틀', 'cgv', '다이소', '교보문고', '이마트', '홈플러스',
+}
+# 지점 표기 접미사 ('강남점' → '강남')
+BRANCH_SUFFIXES = ('본점', '지점', '점')
+# 이 이상 비슷하면 같은 장소로 봅니다. (SequenceMatcher.ratio 기준)
+FUZZY_MATCH_THRESHOLD = 0.85
+
+def normalize_place(raw) -> str:
+    """
+    장소 표기를 비교용 키로 정규화합니다.
+    토큰화 → 조사/지점 접미사 제거 → 줄임말 치환 → 토큰 정렬 후 이어붙이기.
+    정렬하므로 "스타벅스 강남점"과 "강남 스타벅스"는 같은 키가 됩니다.
+    """
+    tokens = []
+    for token in tokenize(raw):
+        token = strip_particle(token)
+        for suffix in BRANCH_SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+                token = token[:-len(suffix)]
+                break
+        tokens.append(PLACE_ABBREVIATIONS.get(token, token))
+    return ''.join(sorted(tokens))
+
+def _find_fuzzy_match(user_id, key) -> Optional[Place]:
+    """
+    별칭 인덱스에 없는 표기를 기존 장소와 비교합니다.
+    1) 철자나 글자 구성이 거의 같은 경우 (오타, 띄어쓰기/어순 차이)
+    2) 지점 없이 체인 상호만 말한 경우 ("스벅") — 그 상호를 포함하는 장소가 하나뿐일 때만 연결
+    """
+    candidates = list(PlaceAlias.objects.filter(user_id=user_id).values_list('alias', 'place_id'))
+    best_place_id, best_ratio = None, 0.0
+    containing_place_ids = set()
+    sorted_key = ''.join(sorted(key))
+    for alias, place_id in candidates:
+        # 띄어쓰기 없이 붙여 쓴 표기("스타벅스강남점")는 토큰 순서가 달라지므로, 글자 구성끼리도 비교합니다.
+        ratio = max(
+            difflib.SequenceMatcher(None, key, alias).ratio(),
+            difflib.SequenceMatcher(None, sorted_key, ''.join(sorted(alias))).ratio(),
+        )
+        if ratio > best_ratio:
+            best_place_id, best_ratio = place_id, ratio
+        if key in CHAIN_BRANDS and key in alias:
+            containing_place_ids.add(place_id)
+
+    if best_ratio >= FUZZY_MATCH_THRESHOLD:
+        return Place.objects.get(pk=best_place_id)
+    if len(containing_place_ids) == 1:
+        return Place.objects.get(pk=containing_place_ids.pop())
+    return None
+
+def resolve_place(user_id, raw) -> Optional[Place]:
+    """
+    장소 표기를 사용자의 정규 장소로 해석합니다. 처음 보는 장소면 새로 만듭니다.
+    해석된 표기는 별칭으로 기록되어 다음부터는 인덱스 조회 한 번으로 끝납니다.
+    """
+    name = (raw or '').strip()
+    key = normalize_place(name)
+    if not key:
+        return None
+
+    alias = PlaceAlias.objects.filter(user_id=user_id, alias=key).select_related('place').first()
+    if alias is not None:
+        return alias.place
+
+    place = _find_fuzzy_match(user_id, key)
+    try:
+        with transaction.atomic():
+            if place is None:
+                place, _ = Place.objects.get_or_create(user_id=user_id, normalized_name=key, defaults={'name': name[:255]})
+            PlaceAlias.objects.create(user_id=user_id, place=place, alias=key)
+    except IntegrityError:
+        # 같은 표기가 동시에 처음 들어온 경우, 먼저 기록된 별칭을 따릅니다.
+        return PlaceAlias.objects.select_related('place').get(user_id=user_id, alias=key).place
+    return place
@@ -0,0 +1,144 @@
+import heapq
+import math
+import operator
+import struct
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# --- 저장 모드 ---
+# float32 : 원본 그대로 (차원당 4바이트, 기준선)
+# float16 : 반정밀도 (차원당 2바이트)
+# int8    : 벡터별 스케일을 둔 스칼라 양자화 (차원당 1바이트 + 스케일 4바이트)
+# binary  : 부호 비트(차원당 1비트)로 해밍 거리 1차 필터링 후, int8 코드로 정확도 재계산
+MODES = ('float32', 'float16', 'int8', 'binary')
+
+# binary 모드에서 해밍 필터가 남길 후보 수 = k * BINARY_RESCORE_FACTOR
+BINARY_RESCORE_FACTOR = 10
+
+# ----------------- 인코딩 유틸리티 -----------------
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    """코사인 유사도를 내적으로 계산할 수 있도록 L2 정규화합니다."""
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        return list(vector)
+    return [x / norm for x in vector]
+
+def _dot(a, b) -> float:
+    return sum(map(operator.mul, a, b))
+
+def encode_float16(vector: Sequence[float]) -> bytes:
+    return struct.pack(f'<{len(vector)}e', *vector)
+
+def decode_float16(data: bytes) -> Tuple[float, ...]:
+    return struct.unpack(f'<{len(data) // 2}e', data)
+
+def encode_int8(vector: Sequence[float]) -> Tuple[float, array]:
+    """벡터별 최대 절댓값을 127에 대응시키는 대칭 스칼라 양자화입니다. (스케일, 코드)를 반환합니다."""
+    max_abs = max((abs(x) for x in vector), default=0.0)
+    scale = max_abs / 127 if max_abs else 1.0
+    return scale, array('b', (max(-127, min(127, round(x / scale))) for x in vector))
+
+def encode_binary(vector: Sequence[float]) -> int:
+    """각 차원의 부호를 한 비트로 담은 정수를 반환합니다. (양수/0 → 1)"""
+    code = 0
+    for i, x in enumerate(vector):
+        if x >= 0:
+            code |= 1 << i
+    return code
+
+# ----------------- 압축 벡터 저장소 -----------------
+
+class CompactVectorStore:
+    """
+    로컬/캐시 계층용 인메모리 벡터 저장소입니다.
+    모드에 따라 임베딩을 압축해 보관하고, 코사인 유사도 기준 상위 k개를 반환합니다.
+
+    주의: 현재는 benchmark_vector_quantization에서만 쓰입니다. 실제 검색 경로(vector_service의
+    Pinecone 조회, retrieval_service)는 이 저장소를 읽지 않으므로, 운영 메모리/지연 시간에는 아직 영향이 없습니다.
+    로컬 벡터 계층을 둘 때 어떤 모드를 쓸지 정하기 위한 측정용입니다.
+    """
+
+    def __init__(self, mode: str = 'int8', dimension: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f"지원하지 않는 저장 모드입니다: {mode} (가능: {', '.join(MODES)})")
+        self.mode = mode
+        self.dimension = dimension
+        self.ids: List[str] = []
+        self.metadatas: List[Dict] = []
+        self._codes: List = []
+        self._scales = array('f')
+        self._sign_codes: List[int] = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, vector_id: str, vector: Sequence[float], metadata: Optional[Dict] = None):
+        if self.dimension is None:
+            self.dimension = len(vector)
+        elif len(vector) != self.dimension:
+            raise ValueError(f"벡터 차원이 맞지 않습니다: {len(vector)} != {self.dimension}")
+
+        vector = _normalize(vector)
+        if self.mode == 'float32':
+            self._codes.append(array('f', vector))
+        elif self.mode == 'float16':
+            self._codes.append(encode_float16(vector))
+        else:
+            scale, codes = encode_int8(vector)
+            self._scales.append(scale)
+            self._codes.append(codes)
+            if self.mode == 'binary':
+                self._sign_codes.append(encode_binary(vector))
+
+        self.ids.append(vector_id)
+        self.metadatas.append(metadata or {})
+
+    def search(self, query_vector: Sequence[float], k: int = 5) -> List[Tuple[str, float, Dict]]:
+        """(벡터 ID, 코사인 유사도, 메타데이터)를 유사도 내림차순으로 최대 k개 반환합니다."""
+        if not self.ids:
+            return []
+        query = array('f', _normalize(query_vector))
+
+        if self.mode == 'binary':
+            # 1차: 부호 비트의 해밍 거리로 후보를 좁힌 뒤, 2차: 후보만 int8 코드로 정확히 재계산합니다.
+            query_sign = encode_binary(query)
+            n_candidates = min(len(self.ids), k * BINARY_RESCORE_FACTOR)
+            candidates = heapq.nsmallest(
+                n_candidates, range(len(self.ids)), key=lambda i: (self._sign_codes[i] ^ query_sign).bit_count()
+            )
+        else:
+            candidates = range(len(self.ids))
+
+        scored = heapq.nlargest(k, ((self._score(query, i), i) for i in candidates))
+        return [(self.ids[i], score, self.metadatas[i]) for score, i in scored]
+
+    def _score(self, query: array, i: int) -> float:
+        if self.mode == 'float32':
+            return _dot(query, self._codes[i])
+        if self.mode == 'float16':
+            return _dot(query, decode_float16(self._codes[i]))
+        return _dot(query, self._codes[i]) * self._scales[i]
+
+    def bytes_per_vector(self) -> float:
+        """메타데이터를 제외한 벡터 하나당 저장 바이트 수입니다."""
+        if not self.dimension:
+            return 0.0
+        if self.mode == 'float32':
+            return self.dimension * 4
+        if self.mode == 'float16':
+            return self.dimension * 2
+        int8_bytes = self.dimension + self._scales.itemsize
+        if self.mode == 'int8':
+            return int8_bytes
+        return int8_bytes + math.ceil(self.dimension / 8)
+
+    def memory_bytes(self) -> int:
+        return int(self.bytes_per_vector() * len(self.ids))
+
+def recall_at_k(expected_ids: Sequence[str], retrieved_ids: Sequence[str], k: int) -> float:
+    """정답(float32 정확 검색) 상위 k개 중 몇 개를 찾았는지의 비율입니다."""
+    expected = set(expected_ids[:k])
+    if not expected:
+        return 1.0
+    return len(expected & set(retrieved_ids[:k])) / len(expected)
@@ -0,0 +1,166 @@
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import CategoryVisitStats, UserActivity
+from .text_service import normalize_text
+
+# 장소 이름(또는 사용자 메시지)에 이 단어가 들어 있으면 해당 카테고리로 분류합니다. 먼저 나온 카테고리가 우선입니다.
+CATEGORY_KEYWORDS = {
+    '카페': ('카페', '커피', '스타벅스', '스벅', '투썸', '이디야', '메가커피', '빽다방', '베이커리', '디저트'),
+    '헬스장': ('헬스', '피트니스', '필라테스', '요가', '크로스핏', '운동'),
+    '술집': ('술집', '포차', '호프', '이자카야', '와인바', '칵테일바', '펍', '술 마실'),
+    '식당': ('식당', '맛집', '레스토랑', '밥집', '고깃집', '국밥', '치킨', '피자', '초밥', '라멘', '분식', '횟집', '뷔페', '먹을'),
+    '영화관': ('영화관', 'cgv', '메가박스', '롯데시네마', '극장', '영화'),
+    '공원': ('공원', '한강', '산책'),
+    '산': ('등산', '산행', '둘레길', '북한산', '관악산', '도봉산', '인왕산', '청계산'),
+    '쇼핑': ('백화점', '아울렛', '쇼핑', '더현대', '마트', '시장'),
+    '서점': ('도서관', '서점', '교보문고', '책방'),
+}
+RECOMMENDATION_TRIGGERS = ('추천', '갈만한', '갈 만한', '어디 갈까', '어디가지')
+
+RECENT_DAYS = 7 # '최근'으로 보는 기간(일)
+MAX_RECENT_DATES = 10 # 장소별로 보관하는 최근 방문일 수
+MAX_TRACKED_PLACES = 30 # 카테고리별로 보관하는 장소 수 (넘으면 가장 덜/오래전에 간 곳부터 버림)
+OVERUSE_MIN_VISITS = 2 # 최근 기간에 이 횟수 이상 간 곳은 "너무 자주 간 곳"으로 봅니다.
+FORGOTTEN_FAVORITE_DAYS = 30 # 자주 가던 곳을 이 일수 이상 안 갔으면 다시 권해봅니다.
+FORGOTTEN_FAVORITE_MIN_VISITS = 3
+
+def detect_category(text) -> Optional[str]:
+    """장소 이름이나 메시지에서 카테고리를 찾습니다. 해당 없으면 None."""
+    normalized = normalize_text(text)
+    if not normalized:
+        return None
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(keyword in normalized for keyword in keywords):
+            return category
+    return None
+
+def _visit_date(activity) -> date:
+    # _save_activity는 activity_date에 문자열을 넣어 생성하므로, 저장 직후 인스턴스에서는 문자열일 수 있습니다.
+    value = activity.activity_date
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            value = None
+    if value:
+        return value
+    return timezone.localdate(activity.created_at) if activity.created_at else timezone.localdate()
+
+def _apply_visit(stats, place, visit_date, companion):
+    """통계 행(stats)에 방문 한 건을 반영합니다. 저장은 호출자가 합니다."""
+    visit_str = visit_date.isoformat()
+    entry = stats.places.setdefault(place, {'count': 0, 'last': visit_str, 'recent': []})
+    entry['count'] += 1
+    entry['last'] = max(entry['last'], visit_str)
+    # 늦게 기록된 과거 활동도 있으므로 정렬 상태를 유지하며 최근 방문일만 남깁니다.
+    entry['recent'] = sorted(entry['recent'] + [visit_str], reverse=True)[:MAX_RECENT_DATES]
+
+    if len(stats.places) > MAX_TRACKED_PLACES:
+        evicted = min(stats.places, key=lambda name: (stats.places[name]['count'], stats.places[name]['last']))
+        del stats.places[evicted]
+
+    if companion:
+        stats.companions[companion] = stats.companions.get(companion, 0) + 1
+    stats.total_visits += 1
+    if stats.last_visit_date is None or visit_date > stats.last_visit_date:
+        stats.last_visit_date = visit_date
+
+def _place_name(activity) -> str:
+    # 표기가 달라도 같은 장소로 세도록 정규 장소 이름을 우선 사용합니다.
+    if activity.place_entity_id:
+        return activity.place_entity.name
+    return (activity.place or '').strip()
+
+def record_visit(activity):
+    """활동 하나를 카테고리 통계에 반영합니다. 카테고리를 알 수 없는 장소는 건너뜁니다."""
+    place = _place_name(activity)
+    category = detect_category(place)
+    if not category:
+        return
+    try:
+        with transaction.atomic():
+            stats, _ = CategoryVisitStats.objects.get_or_create(user_id=activity.user_id, category=category)
+            # 동시에 저장되는 활동끼리 JSON을 덮어쓰지 않도록 행을 잠근 뒤 갱신합니다.
+            stats = CategoryVisitStats.objects.select_for_update().get(pk=stats.pk)
+            _apply_visit(stats, place, _visit_date(activity), (activity.companion or '').strip())
+            stats.save()
+    except Exception as e:
+        print(f"--- 방문 통계 갱신 중 오류 발생 (Activity ID: {activity.id}): {e} ---")
+
+def rebuild_user_stats(user_id) -> int:
+    """사용자의 카테고리 통계를 UserActivity로부터 다시 만듭니다. 반영된 활동 수를 반환합니다."""
+    stats_by_category = {}
+    applied = 0
+    activities = UserActivity.objects.filter(user_id=user_id).select_related('place_entity').order_by('activity_date', 'id')
+    for activity in activities.iterator():
+        place = _place_name(activity)
+        category = detect_category(place)
+        if not category:
+            continue
+        stats = stats_by_category.setdefault(category, CategoryVisitStats(user_id=user_id, category=category))
+        _apply_visit(stats, place, _visit_date(activity), (activity.companion or '').strip())
+        applied += 1
+
+    with transaction.atomic():
+        CategoryVisitStats.objects.filter(user_id=user_id).delete()
+        CategoryVisitStats.objects.bulk_create(stats_by_category.values())
+    return applied
+
+def _build_recommendation(stats, today):
+    week_ago = (today - timedelta(days=RECENT_DAYS)).isoformat()
+    recent_counts = {
+        place: sum(1 for visit in entry['recent'] if visit >= week_ago)
+        for place, entry in stats.places.items()
+    }
+    favorite_companion = max(stats.companions.items(), key=lambda item: item[1], default=(None, 0))
+
+    # 1. 최근 너무 자주 간 곳이 있으면 다른 곳(최근에 안 간 단골 → 없으면 새로운 곳)을 권합니다.
+    overused = max(recent_counts, key=recent_counts.get, default=None)
+    if overused and recent_counts[overused] >= OVERUSE_MIN_VISITS:
+        alternatives = sorted(
+            (place for place, count in recent_counts.items() if count == 0),
+            key=lambda place: stats.places[place]['count'], reverse=True
+        )
+        recommendation = f"이번 주에 {overused}은(는) {recent_counts[overused]}번이나 갔네. 오늘은 다른 곳에 가보는 건 어때? "
+        if alternatives:
+            recommendation += f"예전에 자주 가던 {alternatives[0]}도 있고."
+        else:
+            recommendation += f"예를 들면 새로운 동네 {stats.category}라던가."
+        if favorite_companion[1] >= 2:
+            recommendation += f" {favorite_companion[0]}랑 같이 가봐도 좋겠다."
+        return recommendation
+
+    # 2. 한동안 안 간 단골이 있으면 다시 떠올려 줍니다.
+    forgotten_before = (today - timedelta(days=FORGOTTEN_FAVORITE_DAYS)).isoformat()
+    forgotten = [
+        place for place, entry in stats.places.items()
+        if entry['count'] >= FORGOTTEN_FAVORITE_MIN_VISITS and entry['last'] < forgotten_before
+    ]
+    if forgotten:
+        place = max(forgotten, key=lambda name: stats.places[name]['count'])
+        days = (today - date.fromisoformat(stats.places[place]['last'])).days
+        return f"예전에 {place}에 {stats.places[place]['count']}번이나 갔는데, 안 간 지 {days}일 됐네. 오랜만에 가보는 건 어때?"
+    return ""
+
+def get_activity_recommendation(user, user_message):
+    """
+    추천 요청 메시지에서 카테고리를 찾아, 미리 집계된 통계 한 행만 읽어 추천 컨텍스트를 만듭니다.
+    """
+    if not any(trigger in user_message for trigger in RECOMMENDATION_TRIGGERS):
+        return ""
+    category = detect_category(user_message)
+    if not category:
+        return ""
+
+    stats = CategoryVisitStats.objects.filter(user=user, category=category).first()
+    if stats is None:
+        return ""
+
+    recommendation = _build_recommendation(stats, timezone.localdate())
+    if not recommendation:
+        return ""
+    return f"[시스템 정보: 사용자의 활동 기록을 바탕으로 다음 추천을 생성했어. 이 내용을 참고해서 자연스럽게 제안해봐: '{recommendation}']"
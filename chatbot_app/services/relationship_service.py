@@ -0,0 +1,152 @@
+import difflib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ..models import RelationshipAlias, UserRelationship
+from .text_service import SEARCH_STOPWORDS, strip_particle, tokenize
+
+# 이름 뒤에 붙는 호칭/존칭 ('석민씨' → '석민')
+HONORIFIC_SUFFIXES = ('선배', '후배', '언니', '오빠', '누나', '씨', '님', '형')
+# 부르거나 애칭으로 쓸 때 붙는 접미사 ('석민아', '민이', '지수야' → '석민', '민', '지수')
+NICKNAME_SUFFIXES = ('이', '아', '야')
+# 이 이상 비슷하면 같은 인물로 봅니다. (SequenceMatcher.ratio 기준)
+FUZZY_MATCH_THRESHOLD = 0.8
+# 추출 프롬프트에 넣을 최대 후보 인물 수
+MAX_PROMPT_CANDIDATES = 10
+
+def normalize_name(raw) -> str:
+    """인물 이름/호칭을 비교용 키로 정규화합니다. (소문자화, 공백/기호 제거)"""
+    return ''.join(tokenize(raw))
+
+def mention_keys(token) -> List[str]:
+    """
+    대화 속 토큰 하나에서 인물 호칭 후보 키들을 만듭니다.
+    조사 → 호칭 → 애칭 접미사 순으로 떼어내며, 떼어낼 때마다 나온 형태를 모두 후보로 둡니다.
+    ('민이가' → ['민이가', '민이', '민'], '석민씨랑' → ['석민씨랑', '석민씨', '석민'])
+    """
+    keys = [token]
+    stem = strip_particle(token)
+    if stem != token:
+        keys.append(stem)
+    for suffix in HONORIFIC_SUFFIXES:
+        if stem.endswith(suffix) and len(stem) > len(suffix):
+            stem = stem[:-len(suffix)]
+            keys.append(stem)
+            break
+    for suffix in NICKNAME_SUFFIXES:
+        if stem.endswith(suffix) and len(stem) > len(suffix):
+            keys.append(stem[:-len(suffix)])
+            break
+    return list(dict.fromkeys(keys))
+
+def name_keys(name) -> Set[str]:
+    """
+    저장된 인물 이름으로 불릴 수 있는 키들을 만듭니다.
+    전체 이름, 세 글자 한글 이름의 성을 뺀 이름('김석민' → '석민'), 이름의 각 음절('석민' → '석', '민')
+    """
+    key = normalize_name(name)
+    if not key:
+        return set()
+    keys = {key}
+    given = key[1:] if len(key) == 3 and all('가' <= ch <= '힣' for ch in key) else key
+    keys.add(given)
+    if 2 <= len(given) <= 3:
+        keys.update(given)
+    return keys
+
+def load_index(user_id):
+    """사용자의 인물 목록과 학습된 별칭을 한 번씩 읽어 키 → 인물 ID 집합 인덱스를 만듭니다."""
+    relationships = {rel.id: rel for rel in UserRelationship.objects.filter(user_id=user_id).order_by('id')}
+    index: Dict[str, Set[int]] = {}
+    for rel in relationships.values():
+        for key in name_keys(rel.name):
+            index.setdefault(key, set()).add(rel.id)
+    learned = {
+        alias: rel_id
+        for alias, rel_id in RelationshipAlias.objects.filter(user_id=user_id).values_list('alias', 'relationship_id')
+    }
+    return relationships, index, learned
+
+def _match(key, relationships, index, learned, fuzzy=True) -> Set[int]:
+    """정규화된 호칭 하나를 인물 ID 집합으로 해석합니다. 학습된 별칭 → 이름 휴리스틱 → 퍼지 매칭 순입니다."""
+    if key in learned:
+        return {learned[key]}
+    if key in index:
+        return set(index[key])
+    # 두 글자 이하는 비율이 1.0/0.5로만 갈려 퍼지 매칭이 의미가 없습니다.
+    if not fuzzy or len(key) < 3:
+        return set()
+    matched = set()
+    for rel in relationships.values():
+        name = normalize_name(rel.name)
+        if abs(len(name) - len(key)) <= 2 and difflib.SequenceMatcher(None, key, name).ratio() >= FUZZY_MATCH_THRESHOLD:
+            matched.add(rel.id)
+    return matched
+
+def match_mentions(texts: Iterable[str], relationships, index, learned) -> Dict[int, float]:
+    """
+    텍스트에서 언급된 것으로 보이는 인물 ID → 구체성 점수(1 / 그 호칭에 걸린 인물 수)를 반환합니다. (load_index() 결과 사용)
+    전체 이름처럼 한 명만 가리키는 호칭이 여러 명에게 걸리는 음절 애칭보다 앞서도록 합니다.
+    한 글자 음절 키(이름 일부)는 애칭 접미사를 뗀 형태('민이' → '민')에서 나온 경우에만 사용해 오탐을 줄입니다.
+    """
+    matched: Dict[int, float] = {}
+    for text in texts:
+        for token in tokenize(text):
+            if token in SEARCH_STOPWORDS:
+                continue
+            keys = mention_keys(token)
+            for key in keys:
+                if len(key) == 1 and key == token:
+                    continue
+                rel_ids = _match(key, relationships, index, learned, fuzzy=key == keys[-1])
+                for rel_id in rel_ids:
+                    matched[rel_id] = max(matched.get(rel_id, 0.0), 1 / len(rel_ids))
+    return matched
+
+def find_candidates(user_id, texts: Iterable[str], limit: int = MAX_PROMPT_CANDIDATES) -> List[UserRelationship]:
+    """대화에 언급된 것으로 보이는 인물들만 골라냅니다. 추출 프롬프트에는 전체 인물 목록 대신 이 후보만 넣습니다."""
+    relationships, index, learned = load_index(user_id)
+    if not relationships:
+        return []
+    matched = match_mentions(texts, relationships, index, learned)
+    # 구체성이 같으면 먼저 언급된 인물이 앞섭니다. (sorted는 안정 정렬)
+    ordered = sorted(matched, key=lambda rel_id: -matched[rel_id])[:limit]
+    return [relationships[rel_id] for rel_id in ordered]
+
+def resolve_mention(user_id, mention, serial_code=None, relationships=None, learned=None) -> Optional[UserRelationship]:
+    """
+    추출 결과의 인물을 기존 인물로 해석합니다. 모델이 돌려준 serial_code → 정확히 같은 이름 → 학습된 별칭 순이며, 없으면 None입니다.
+    이름 휴리스틱(음절/애칭 접미사/퍼지 매칭)은 '민아'를 '석민'에 합치는 식의 오연결을 만들므로 쓰지 않습니다. (후보 선정 전용)
+    여러 이름을 연달아 해석할 때는 load_index 결과를 넘겨 매번 다시 읽지 않도록 합니다.
+    """
+    if relationships is None:
+        relationships, _, learned = load_index(user_id)
+    if serial_code:
+        for rel in relationships.values():
+            if str(rel.serial_code) == str(serial_code).strip():
+                return rel
+    whole = normalize_name(mention)
+    if not whole:
+        return None
+    for rel in relationships.values():
+        if normalize_name(rel.name) == whole:
+            return rel
+    if whole in learned:
+        return relationships.get(learned[whole])
+    return None
+
+def learn_aliases(user_id, pairs: Iterable[Tuple[UserRelationship, str]]) -> int:
+    """
+    (인물, 호칭) 쌍들을 별칭 테이블에 한 번에 기록합니다. 기록을 시도한 별칭 수를 반환합니다.
+    이미 다른 인물의 별칭으로 기록된 호칭은 기존 기록을 따릅니다. (unique 제약으로 건너뜀)
+    """
+    aliases = {}
+    for relationship, mention in pairs:
+        key = normalize_name(mention)
+        if key and key != normalize_name(relationship.name):
+            aliases.setdefault(key, relationship)
+    if aliases:
+        RelationshipAlias.objects.bulk_create(
+            [RelationshipAlias(user_id=user_id, relationship=rel, alias=key) for key, rel in aliases.items()],
+            ignore_conflicts=True,
+        )
+    return len(aliases)
@@ -0,0 +1,215 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta
+from typing import Dict, List, Sequence, Tuple
+
+from django.utils import timezone
+
+from ..models import ChatMessage, MemorySummary
+from . import lexical_service, vector_service
+from .text_service import char_ngrams
+
+# --- 검색 파라미터 ---
+RRF_K = 60 # Reciprocal Rank Fusion 상수 (원 논문 기본값)
+CANDIDATE_MULTIPLIER = 2 # 융합 전 각 검색기에서 가져올 후보 수 = n_results * CANDIDATE_MULTIPLIER
+# 벡터 검색이 이 시간(초) 안에 끝나지 않으면 기다리지 않고 어휘 검색 결과만 사용합니다.
+VECTOR_QUERY_TIMEOUT = float(os.getenv("VECTOR_QUERY_TIMEOUT", "1.5"))
+
+# --- 재순위화(rerank) 파라미터 ---
+RERANK_POOL_SIZE = 20 # 재순위화 전에 가져올 후보 수
+MMR_LAMBDA = 0.7 # MMR에서 관련도(1에 가까울수록)와 다양성(0에 가까울수록)의 균형
+RECENCY_WEIGHT = 0.2 # 최종 관련도에서 최신성이 차지하는 비중
+RECENCY_HALF_LIFE_DAYS = float(os.getenv("MEMORY_RECENCY_HALF_LIFE_DAYS", "30"))
+NEAR_DUPLICATE_SIMILARITY = 0.8 # 이미 고른 기억과 이 이상 겹치면 중복으로 보고 버립니다.
+EXCHANGE_MAX_GAP = timedelta(minutes=2) # 사용자 메시지와 이 시간 안의 AI 응답은 한 대화 턴으로 합칩니다.
+MEMORY_CONTEXT_CHAR_BUDGET = int(os.getenv("MEMORY_CONTEXT_CHAR_BUDGET", "600"))
+MAX_SNIPPET_CHARS = 300
+
+# 벡터 검색(임베딩 + Pinecone 왕복)을 어휘 검색과 동시에 진행하기 위한 스레드 풀
+_vector_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='vector-query')
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """여러 검색기의 순위 리스트를 RRF 점수(Σ 1 / (k + 순위))로 합쳐 내림차순으로 반환합니다."""
+    scores = {}
+    for ranked_ids in ranked_lists:
+        for rank, item_id in enumerate(ranked_ids, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def _vector_ranked_ids(user_id, query, n_candidates):
+    """
+    벡터 검색 결과를 ChatMessage ID 순위로 펼칩니다.
+    turn 청크는 사용자/AI 메시지 ID 두 개로 펼쳐지며, 이후 재순위화 단계에서 다시 한 턴으로 합쳐집니다.
+    """
+    results = vector_service.query_similar_messages(None, query, user_id, n_results=n_candidates)
+    ranked_ids = []
+    for meta in results.get('metadatas', []):
+        for message_id in meta.get('message_ids') or [meta.get('message_id')]:
+            if message_id and str(message_id) not in ranked_ids:
+                ranked_ids.append(str(message_id))
+    return ranked_ids
+
+def hybrid_search(user, query: str, n_results: int = 5, use_vector: bool = True) -> Dict[str, List]:
+    """
+    어휘(BM25) 검색과 벡터 검색 결과를 RRF로 융합해 ChatService가 기대하는 형식으로 반환합니다.
+    벡터 DB가 비활성화됐거나 응답이 늦으면 어휘 검색만으로 결과를 만듭니다.
+    """
+    n_candidates = n_results * CANDIDATE_MULTIPLIER
+
+    # 1. 벡터 검색은 백그라운드에서 먼저 시작해 어휘 검색과 겹치게 합니다.
+    vector_future = None
+    if use_vector and vector_service.is_vector_db_available():
+        vector_future = _vector_executor.submit(_vector_ranked_ids, user.id, query, n_candidates)
+
+    lexical_ids = [str(message_id) for message_id, _ in lexical_service.search(user.id, query, n_candidates)]
+
+    vector_ids = []
+    if vector_future is not None:
+        try:
+            vector_ids = vector_future.result(timeout=VECTOR_QUERY_TIMEOUT)
+        except FutureTimeoutError:
+            # 느린 응답도 장애로 취급해, 계속 느리면 서킷 브레이커가 벡터 검색 자체를 건너뛰게 합니다.
+            vector_service.record_failure(f"query timeout ({VECTOR_QUERY_TIMEOUT}s)")
+            print(f"--- [경고] 벡터 검색이 {VECTOR_QUERY_TIMEOUT}초 안에 끝나지 않아 어휘 검색 결과만 사용합니다 ---")
+        except Exception as e:
+            print(f"--- 벡터 검색 중 오류가 발생해 어휘 검색 결과만 사용합니다: {e} ---")
+
+    # 2. 순위 융합 (한쪽 결과만 있으면 그 순위가 그대로 유지됩니다)
+    fused = reciprocal_rank_fusion([ranked for ranked in (vector_ids, lexical_ids) if ranked])[:n_results]
+    if not fused:
+        return {"documents": [], "metadatas": []}
+
+    # 3. 본문은 RDB(원본)에서 한 번에 읽어옵니다. 요약 벡터(summary-*)는 MemorySummary에서 읽습니다.
+    message_ids = [int(item_id) for item_id, _ in fused if item_id.isdigit()]
+    summary_ids = [item_id for item_id, _ in fused if not item_id.isdigit()]
+    messages = ChatMessage.objects.filter(user=user, id__in=message_ids).in_bulk()
+    summaries = MemorySummary.objects.filter(user=user, vector_id__in=summary_ids).in_bulk(field_name='vector_id') if summary_ids else {}
+    lexical_set, vector_set = set(lexical_ids), set(vector_ids)
+
+    documents, metadatas = [], []
+    for item_id, score in fused:
+        if item_id.isdigit():
+            message = messages.get(int(item_id))
+            if message is None:
+                continue
+            text, speaker, timestamp = message.message, 'user' if message.is_user else 'ai', message.timestamp
+        else:
+            summary = summaries.get(item_id)
+            if summary is None:
+                continue
+            text, speaker, timestamp = summary.summary, 'summary', summary.period_end
+        documents.append(text)
+        metadatas.append({
+            'message_id': item_id,
+            'speaker': speaker,
+            'user_id': str(user.id),
+            'timestamp': timestamp.isoformat(),
+            'score': score,
+            'sources': [name for name, hits in (('vector', vector_set), ('lexical', lexical_set)) if item_id in hits],
+        })
+
+    print(f"--- 하이브리드 검색 결과: {len(documents)}개 문서 (벡터 {len(vector_ids)}, 어휘 {len(lexical_ids)}) ---")
+    return {"documents": documents, "metadatas": metadatas}
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _recency(timestamp: str, now: datetime) -> float:
+    """반감기(RECENCY_HALF_LIFE_DAYS) 기준 지수 감쇠 최신성 점수(0~1)를 반환합니다."""
+    try:
+        age_days = max((now - datetime.fromisoformat(timestamp)).total_seconds() / 86400, 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+    return math.exp(-math.log(2) * age_days / RECENCY_HALF_LIFE_DAYS)
+
+def _truncate(text: str, limit: int) -> str:
+    return (text[:limit] + '...') if len(text) > limit else text
+
+def _merge_exchanges(candidates: List[Dict]) -> List[Dict]:
+    """
+    같은 대화 턴(사용자 메시지 → 바로 뒤 AI 응답)에 속한 후보들을 하나의 기억으로 합칩니다.
+    합쳐진 기억의 점수는 두 메시지 중 높은 쪽을 따릅니다.
+    """
+    by_time = sorted(candidates, key=lambda c: (c['timestamp'], int(c['message_id']) if c['message_id'].isdigit() else 0))
+    merged, used = [], set()
+    for i, candidate in enumerate(by_time):
+        if candidate['message_id'] in used:
+            continue
+        partner = by_time[i + 1] if i + 1 < len(by_time) else None
+        if (
+            partner is not None
+            and candidate['speaker'] == 'user' and partner['speaker'] == 'ai'
+            and datetime.fromisoformat(partner['timestamp']) - datetime.fromisoformat(candidate['timestamp']) <= EXCHANGE_MAX_GAP
+        ):
+            used.update((candidate['message_id'], partner['message_id']))
+            merged.append({
+                'turns': [candidate, partner],
+                'timestamp': partner['timestamp'],
+                'score': max(candidate['score'], partner['score']),
+            })
+        else:
+            used.add(candidate['message_id'])
+            merged.append({'turns': [candidate], 'timestamp': candidate['timestamp'], 'score': candidate['score']})
+    return merged
+
+def _render_memory(memory: Dict) -> str:
+    if memory['turns'][0]['speaker'] == 'summary':
+        # 요약 본문 앞에는 이미 "(기간)"이 붙어 있습니다.
+        return f"요약{_truncate(memory['turns'][0]['text'], MAX_SNIPPET_CHARS)}"
+    per_turn_limit = MAX_SNIPPET_CHARS // len(memory['turns'])
+    return " / ".join(
+        f"{'사용자' if turn['speaker'] == 'user' else 'AI'}: {_truncate(turn['text'], per_turn_limit)}"
+        for turn in memory['turns']
+    )
+
+def rerank_memories(documents: List[str], metadatas: List[Dict], char_budget: int = MEMORY_CONTEXT_CHAR_BUDGET) -> List[str]:
+    """
+    검색 후보를 중복 제거 · 대화 턴 병합 · 최신성 가중 · MMR 순으로 재순위화하고,
+    문자 예산(char_budget) 안에 들어가는 만큼만 렌더링된 기억 문자열로 반환합니다.
+    """
+    if not documents:
+        return []
+    now = timezone.now()
+
+    candidates = [
+        {'text': doc, 'message_id': meta['message_id'], 'speaker': meta.get('speaker'),
+         'timestamp': meta.get('timestamp'), 'score': meta.get('score', 0.0)}
+        for doc, meta in zip(documents, metadatas)
+    ]
+    memories = _merge_exchanges(candidates)
+
+    # 1. 관련도(검색 점수 정규화)와 최신성을 섞은 기본 점수
+    max_score = max(memory['score'] for memory in memories) or 1.0
+    for memory in memories:
+        memory['relevance'] = (
+            (1 - RECENCY_WEIGHT) * memory['score'] / max_score
+            + RECENCY_WEIGHT * _recency(memory['timestamp'], now)
+        )
+        memory['rendered'] = _render_memory(memory)
+        memory['grams'] = set(char_ngrams(" ".join(turn['text'] for turn in memory['turns'])))
+
+    # 2. MMR: 이미 고른 기억과 겹치는 만큼 감점하며 하나씩 고르고, 예산을 넘는 기억은 건너뜁니다.
+    selected, remaining, used_chars = [], list(memories), 0
+    while remaining:
+        def mmr_score(memory):
+            redundancy = max((_jaccard(memory['grams'], chosen['grams']) for chosen in selected), default=0.0)
+            return MMR_LAMBDA * memory['relevance'] - (1 - MMR_LAMBDA) * redundancy
+
+        best = max(remaining, key=mmr_score)
+        remaining.remove(best)
+        if any(_jaccard(best['grams'], chosen['grams']) >= NEAR_DUPLICATE_SIMILARITY for chosen in selected):
+            continue
+        if used_chars + len(best['rendered']) > char_budget:
+            continue
+        selected.append(best)
+        used_chars += len(best['rendered'])
+
+    return [memory['rendered'] for memory in selected]
+
+def retrieve_memory_snippets(user, query: str, char_budget: int = MEMORY_CONTEXT_CHAR_BUDGET) -> List[str]:
+    """넉넉한 후보 풀을 검색한 뒤 재순위화하여, 프롬프트에 넣을 과거 대화 기억 목록을 반환합니다."""
+    results = hybrid_search(user, query, n_results=RERANK_POOL_SIZE)
+    return rerank_memories(results['documents'], results['metadatas'], char_budget)
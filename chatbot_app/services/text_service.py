@@ -0,0 +1,74 @@
+import re
+from collections import Counter
+
+# 한글/영문/숫자 외의 문자는 모두 구분자로 취급합니다.
+_NON_WORD_PATTERN = re.compile(r'[^0-9a-z가-힣ㄱ-ㅎㅏ-ㅣ]+')
+
+def normalize_text(text):
+    """소문자화하고 구두점/기호를 공백으로 바꾼 뒤 공백을 하나로 정리합니다."""
+    if not text:
+        return ""
+    return _NON_WORD_PATTERN.sub(' ', text.lower()).strip()
+
+def tokenize(text):
+    """정규화된 텍스트를 공백 기준 토큰 리스트로 나눕니다."""
+    return normalize_text(text).split()
+
+def char_ngrams(text, n=2):
+    """
+    토큰별 문자 n-gram의 빈도(Counter)를 반환합니다.
+    한국어는 조사/어미가 붙어 형태가 바뀌므로('강남역에서'), 형태소 분석 없이도
+    '강남', '남역'처럼 어간 부분이 겹치도록 문자 단위 n-gram을 사용합니다.
+    n보다 짧은 토큰은 토큰 자체를 하나의 gram으로 씁니다.
+    """
+    grams = Counter()
+    for token in tokenize(text):
+        if len(token) <= n:
+            grams[token] += 1
+            continue
+        for i in range(len(token) - n + 1):
+            grams[token[i:i + n]] += 1
+    return grams
+
+# 검색어 끝에 붙어 매칭을 방해하는 조사들. 긴 것부터 검사해야 '에서'가 '서'보다 먼저 떨어집니다.
+KOREAN_PARTICLES = (
+    '에서부터', '으로부터', '에게서', '한테서',
+    '이랑', '에서', '에게', '한테', '까지', '부터', '으로', '하고', '처럼', '보다', '이나', '께서',
+    '은', '는', '이', '가', '을', '를', '와', '과', '랑', '로', '도', '만', '의', '에', '나',
+)
+
+# 검색 의도와 무관하게 자주 등장하는 단어들 (대명사, 시간 부사, 질문/회상 표현 등)
+SEARCH_STOPWORDS = frozenset({
+    '나', '너', '우리', '내가', '제가', '저', '그', '이', '저기', '여기', '거기', '그거', '이거', '저거',
+    '오늘', '어제', '내일', '그때', '요즘', '지난번', '저번', '전에',
+    '그리고', '근데', '그런데', '그래서', '정말', '진짜', '너무', '완전', '좀', '같이', '혹시',
+    '뭐', '뭐했지', '뭐했더라', '어디', '언제', '누구', '누구랑', '어떻게', '왜',
+    '했어', '했지', '했던', '했을', '했더라', '했었지', '갔어', '갔지', '갔던', '갔을', '갔었지', '갔더라',
+    '기억', '기억나', '기억해', '알아', '있어', '없어', '있었지', '그랬지',
+})
+
+MAX_SEARCH_KEYWORDS = 8
+
+def strip_particle(token):
+    """토큰 끝의 조사를 하나 떼어냅니다. 어간이 두 글자 미만으로 줄어들면 그대로 둡니다. ('강남역에서' → '강남역')"""
+    for particle in KOREAN_PARTICLES:
+        if token.endswith(particle) and len(token) - len(particle) >= 2:
+            return token[:-len(particle)]
+    return token
+
+def extract_keywords(text, max_keywords=MAX_SEARCH_KEYWORDS):
+    """
+    검색용 키워드를 추출합니다: 토큰화 → 불용어 제거 → 조사 제거 → 중복 제거.
+    너무 많은 조건으로 검색이 느려지지 않도록 앞에서부터 max_keywords개까지만 사용합니다.
+    """
+    keywords = []
+    for token in tokenize(text):
+        if token in SEARCH_STOPWORDS:
+            continue
+        keyword = strip_particle(token)
+        if len(keyword) < 2 or keyword in SEARCH_STOPWORDS or keyword in keywords:
+            continue
+        keywords.append(keyword)
+        if len(keywords) >= max_keywords:
+            break
+    return keywords
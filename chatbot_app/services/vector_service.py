@@ -1,5 +1,8 @@
 import os
 import json
+import hashlib
+import threading
+import time
 from pinecone import Pinecone, ServerlessSpec
 from pinecone.exceptions import PineconeApiException # IndexExistsError와 NotFoundException 제거
 from openai import OpenAI, AuthenticationError
@@ -12,6 +15,12 @@ ApiException = PineconeApiException
 # --- 전역 상수 설정 ---
 EMBEDDING_MODEL = "text-embedding-3-large"
 EMBEDDING_DIMENSION = 1024
+FETCH_BATCH_SIZE = 100 # Pinecone fetch 요청 한 번에 조회할 최대 ID 수
+
+# 색인 단위: "message"(메시지마다 벡터 1개) 또는 "turn"(사용자 메시지 + AI 응답 한 쌍을 벡터 1개로)
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "message")
+TURN_WINDOW_CHARS = 1200 # turn 청크 하나에 담을 최대 문자 수. 넘으면 겹치는 창으로 나눕니다.
+TURN_WINDOW_OVERLAP = 200 # 인접한 창끼리 겹치는 문자 수 (창 경계에 걸친 문맥 보존)
 
 # OpenAI 클라이언트 인스턴스 (지연 초기화될 변수)
 client_openai = None
@@ -21,9 +30,113 @@ _pinecone_client = None
 _pinecone_index_instance = None
 _vector_db_enabled = False # 벡터 DB 기능 활성화 상태 플래그
 _initialization_attempted = False # 초기화 시도 여부를 기록하는 새로운 플래그
+_misconfigured = False # 환경 변수 누락처럼 재시도해도 소용없는 실패 여부
+_init_lock = threading.Lock() # 웜업 스레드와 요청 스레드가 동시에 초기화하지 않도록 보호
+_reconnect_thread = None
+_warmup_requested = False
+
+# ----------------- 서킷 브레이커 -----------------
+
+class CircuitBreaker:
+    """
+    벡터 DB 호출을 보호하는 서킷 브레이커입니다.
+    - closed: 정상. 연속 실패가 failure_threshold에 도달하면 open으로 전환
+    - open: 쿨다운 동안 모든 호출을 건너뜀. 쿨다운은 연속으로 열릴 때마다 지수적으로 늘어남
+    - half_open: 쿨다운이 지나면 시험 호출 하나만 허용. 성공하면 closed, 실패하면 다시 open
+    """
+
+    def __init__(self, failure_threshold=3, base_cooldown=5.0, max_cooldown=300.0):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.trip_count = 0 # 닫히기 전까지 연속으로 열린 횟수 (쿨다운 지수 증가용)
+        self.opened_at = None
+        self.cooldown = 0.0
+        self.last_error = None
+        self._trial_in_flight = False
+        self._trial_started_at = None
+
+    def _open(self):
+        self.state = 'open'
+        self.trip_count += 1
+        self.cooldown = min(self.base_cooldown * (2 ** (self.trip_count - 1)), self.max_cooldown)
+        self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+        print(f"--- [서킷 브레이커] 벡터 DB 호출 차단 (open, {self.cooldown:.0f}초 후 재시도): {self.last_error} ---")
+
+    def allow_request(self):
+        """지금 벡터 DB를 호출해도 되는지 반환합니다. half_open에서는 시험 호출 하나만 통과시킵니다."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    return False
+                self.state = 'half_open'
+                print("--- [서킷 브레이커] 쿨다운 종료, 시험 호출 허용 (half_open) ---")
+            # 결과가 보고되지 않은 시험 호출이 있으면, 기본 쿨다운이 지날 때까지 다음 시험을 미룹니다.
+            if self._trial_in_flight and time.monotonic() - self._trial_started_at < self.base_cooldown:
+                return False
+            self._trial_in_flight = True
+            self._trial_started_at = time.monotonic()
+            return True
+
+    def release_trial(self):
+        """시험 호출을 벡터 DB에 보내기 전에 포기한 경우(예: 임베딩 설정 오류) 다음 시험이 바로 가능하도록 되돌립니다."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def is_open(self):
+        """상태를 바꾸지 않고, 현재 호출이 차단되는 중인지만 확인합니다."""
+        with self._lock:
+            return self.state == 'open' and time.monotonic() - self.opened_at < self.cooldown
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                print("--- [서킷 브레이커] 벡터 DB 복구 확인 (closed) ---")
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self.trip_count = 0
+            self._trial_in_flight = False
+
+    def record_failure(self, error, force_open=False):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            if self.state == 'half_open' or force_open or self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def seconds_until_retry(self):
+        with self._lock:
+            if self.state != 'open':
+                return 0.0
+            return max(self.cooldown - (time.monotonic() - self.opened_at), 0.0)
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == 'open':
+                retry_in = round(max(self.cooldown - (time.monotonic() - self.opened_at), 0.0), 1)
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'trip_count': self.trip_count,
+                'cooldown_seconds': self.cooldown,
+                'retry_in_seconds': retry_in,
+                'last_error': self.last_error,
+            }
+
+_circuit_breaker = CircuitBreaker()
 
 # ----------------- 유틸리티 함수 -----------------
 
+class EmbeddingError(Exception):
+    """OpenAI 임베딩 생성 실패. Pinecone 장애가 아니므로 서킷 브레이커 실패로 세지 않습니다."""
+
 def _get_openai_client() -> OpenAI:
     """OpenAI 클라이언트를 지연 초기화합니다."""
     global client_openai
@@ -37,30 +150,114 @@ def _get_openai_client() -> OpenAI:
 
 def _get_embedding(text: str) -> List[float]:
     """OpenAI 임베딩 모델을 사용하여 텍스트의 벡터를 생성합니다."""
+    return get_embeddings([text])[0]
+
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """여러 텍스트를 한 번의 API 호출로 임베딩합니다. 반환 순서는 입력 순서와 같습니다."""
     try:
         client = _get_openai_client()
         response = client.embeddings.create(
-            input=[text],
+            input=texts,
             model=EMBEDDING_MODEL,
             dimensions=EMBEDDING_DIMENSION
         )
-        return response.data[0].embedding
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
         
     except EnvironmentError:
         raise
     except Exception as e:
-        raise Exception(f"OpenAI 임베딩 생성 중 오류 발생: {e}")
+        raise EmbeddingError(f"OpenAI 임베딩 생성 중 오류 발생: {e}") from e
+
+def content_hash(text: str) -> str:
+    """
+    임베딩 대상 텍스트의 해시를 반환합니다.
+    모델/차원이 바뀌면 해시도 바뀌므로 재색인 시 다시 임베딩됩니다.
+    """
+    payload = f"{EMBEDDING_MODEL}:{EMBEDDING_DIMENSION}:{text}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def user_namespace(user_id) -> str:
+    """
+    사용자별 벡터를 격리하는 Pinecone 네임스페이스 이름을 반환합니다.
+    저장/검색 모두 User.id(불변) 기준으로 만들어야 서로 어긋나지 않습니다.
+    """
+    return f"user-{user_id}"
+
+def build_message_chunk(message_obj) -> Dict:
+    """메시지 하나를 벡터 하나로 색인하기 위한 청크(id, 임베딩할 텍스트, 메타데이터)를 구성합니다."""
+    return {
+        "id": str(message_obj.id),
+        "text": message_obj.message,
+        "metadata": {
+            "text": message_obj.message,
+            "kind": "message",
+            "speaker": "user" if message_obj.is_user else "ai",
+            "user_id": str(message_obj.user_id),
+            "timestamp": message_obj.timestamp.isoformat(),
+            "content_hash": content_hash(message_obj.message),
+        }
+    }
+
+def split_into_windows(text: str, window: int = TURN_WINDOW_CHARS, overlap: int = TURN_WINDOW_OVERLAP) -> List[str]:
+    """긴 텍스트를 overlap만큼 겹치는 window 크기의 조각들로 나눕니다."""
+    if len(text) <= window:
+        return [text]
+    step = window - overlap
+    return [text[start:start + window] for start in range(0, len(text) - overlap, step)]
+
+def build_turn_chunks(user_message_obj, bot_message_obj=None) -> List[Dict]:
+    """
+    사용자 메시지와 그에 대한 AI 응답을 한 덩어리로 묶은 청크 목록을 구성합니다.
+    두 화자의 발화를 함께 임베딩하므로 검색 시 질문과 답이 항상 같이 돌아옵니다.
+    응답이 없는 사용자 메시지(API 실패 등)는 사용자 발화만으로 청크를 만듭니다.
+    """
+    text = f"사용자: {user_message_obj.message}"
+    message_ids = [str(user_message_obj.id)]
+    base_id = f"turn-{user_message_obj.id}"
+    timestamp = user_message_obj.timestamp
+    if bot_message_obj is not None:
+        text += f"\nAI: {bot_message_obj.message}"
+        message_ids.append(str(bot_message_obj.id))
+        base_id += f"-{bot_message_obj.id}"
+        timestamp = bot_message_obj.timestamp
+
+    windows = split_into_windows(text)
+    chunks = []
+    for i, window_text in enumerate(windows):
+        chunks.append({
+            "id": base_id if len(windows) == 1 else f"{base_id}-w{i}",
+            "text": window_text,
+            "metadata": {
+                "text": window_text,
+                "kind": "turn",
+                "speaker": "turn",
+                "message_ids": message_ids,
+                "window": i,
+                "user_id": str(user_message_obj.user_id),
+                "timestamp": timestamp.isoformat(),
+                "content_hash": content_hash(window_text),
+            }
+        })
+    return chunks
+
+def attach_embedding(chunk: Dict, embedding: List[float]) -> Dict:
+    """청크에 임베딩을 붙여 Pinecone upsert용 벡터 레코드로 만듭니다."""
+    return {"id": chunk["id"], "values": embedding, "metadata": chunk["metadata"]}
+
+def build_message_vector(message_obj, embedding: List[float]) -> Dict:
+    """ChatMessage와 임베딩으로 Pinecone upsert용 벡터 레코드를 구성합니다."""
+    return attach_embedding(build_message_chunk(message_obj), embedding)
 
 
 # ----------------- Pinecone 연결 및 관리 -----------------
 
-def _initialize_pinecone():
+def _initialize_pinecone(schedule_reconnect=True):
     """
     Pinecone 클라이언트를 초기화하고 인덱스 객체에 연결합니다.
     (API 버전 충돌로 인한 IndexExistsError 및 NotFoundException import 오류를 해결하기 위해
      PineconeApiException과 상태 코드(status_code)를 사용하도록 로직을 변경합니다.)
     """
-    global _pinecone_client, _pinecone_index_instance, _vector_db_enabled, _initialization_attempted
+    global _pinecone_client, _pinecone_index_instance, _vector_db_enabled, _initialization_attempted, _misconfigured
     
     _initialization_attempted = True # 시도 시작
 
@@ -77,7 +274,8 @@ def _initialize_pinecone():
     if not is_key_set or not is_name_set:
         print("--- [경고] 필수 Pinecone 환경 변수 누락. 벡터 DB 기능 비활성화. ---")
         _vector_db_enabled = False
-        return
+        _misconfigured = True
+        return False
 
     try:
         # 1. Pinecone 클라이언트 초기화 
@@ -123,40 +321,147 @@ def _initialize_pinecone():
         # 4. 인덱스 객체 최종 캐시 및 성공 상태 설정
         _pinecone_index_instance = index
         _vector_db_enabled = True # 성공적으로 초기화 및 인덱스 연결 완료
+        _circuit_breaker.record_success()
         print(f"--- [Pinecone Success] 벡터 DB (인덱스: {index_name}) 활성화 ---")
-
+        return True
 
     except ApiException as e:
         # 401 등 모든 Pinecone API 연결/인증 오류는 여기서 포착
         print(f"--- Pinecone API 연결/인증 오류가 발생했습니다. 벡터 DB 비활성화: {e} ---")
         _vector_db_enabled = False 
+        _circuit_breaker.record_failure(e, force_open=True)
     except Exception as e:
         # list_indexes()를 우회했으므로, 이 예외는 다른 일반 네트워크 오류일 가능성이 높음
         print(f"--- Pinecone 초기화 중 치명적인 오류가 발생했습니다. 벡터 DB 비활성화: {e} ---")
         _vector_db_enabled = False
-        
+        _circuit_breaker.record_failure(e, force_open=True)
+
+    # 일시적인 장애일 수 있으므로 프로세스 재시작 없이 백그라운드에서 다시 연결을 시도합니다.
+    if schedule_reconnect:
+        _start_reconnect_loop()
+    return False
+
+def _reconnect_loop():
+    """브레이커 쿨다운(지수 백오프)만큼 기다렸다가 초기화를 다시 시도하고, 성공하면 종료합니다."""
+    global _reconnect_thread
+    try:
+        while not _vector_db_enabled:
+            time.sleep(max(_circuit_breaker.seconds_until_retry(), 0.5))
+            print("--- [재연결] Pinecone 재연결 시도 ---")
+            with _init_lock:
+                if _initialize_pinecone(schedule_reconnect=False):
+                    break
+    finally:
+        _reconnect_thread = None
+
+def _start_reconnect_loop():
+    global _reconnect_thread
+    if _misconfigured or _reconnect_thread is not None:
+        return
+    _reconnect_thread = threading.Thread(target=_reconnect_loop, name='pinecone-reconnect', daemon=True)
+    _reconnect_thread.start()
+
+def warmup(background=True):
+    """
+    첫 채팅 요청이 Pinecone 초기화(describe_index_stats) 지연을 떠안지 않도록 미리 연결합니다.
+    AppConfig.ready()와 fork 직후 자식 프로세스에서 호출됩니다.
+    """
+    global _warmup_requested
+    _warmup_requested = True
+    if background:
+        threading.Thread(target=get_or_create_collection, name='pinecone-warmup', daemon=True).start()
+    else:
+        get_or_create_collection()
+
+def _reset_after_fork():
+    """
+    fork된 워커는 부모의 HTTP 커넥션 풀과 스레드를 물려받을 수 없으므로 상태를 초기화하고,
+    부모에서 웜업을 요청했다면 워커에서 다시 웜업합니다. (gunicorn --preload 대응)
+    """
+    global _pinecone_client, _pinecone_index_instance, _vector_db_enabled, _initialization_attempted
+    global _misconfigured, _init_lock, _reconnect_thread, _circuit_breaker
+    _pinecone_client = None
+    _pinecone_index_instance = None
+    _vector_db_enabled = False
+    _initialization_attempted = False
+    _misconfigured = False
+    _init_lock = threading.Lock()
+    _reconnect_thread = None
+    _circuit_breaker = CircuitBreaker()
+    if _warmup_requested:
+        warmup()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_vector_db_status():
+    """벡터 DB 연결 및 서킷 브레이커 상태를 반환합니다. (운영 모니터링용)"""
+    return {
+        'enabled': _vector_db_enabled,
+        'initialization_attempted': _initialization_attempted,
+        'misconfigured': _misconfigured,
+        'reconnecting': _reconnect_thread is not None,
+        'circuit_breaker': _circuit_breaker.snapshot(),
+    }
+
+def record_success():
+    """벡터 DB 호출 성공을 서킷 브레이커에 보고합니다."""
+    _circuit_breaker.record_success()
+
+def record_failure(error):
+    """벡터 DB 호출 실패(오류 또는 시간 초과)를 서킷 브레이커에 보고합니다."""
+    _circuit_breaker.record_failure(error)
         
 def is_vector_db_enabled():
     """벡터 DB 사용 가능 여부 반환"""
     return _vector_db_enabled
 
-def get_or_create_collection():
+def is_vector_db_available():
+    """벡터 DB 호출을 시도할 가치가 있는지 반환 (활성화됐거나 아직 지연 초기화 전이며, 브레이커가 열려 있지 않은 경우)"""
+    return (_vector_db_enabled or not _initialization_attempted) and not _circuit_breaker.is_open()
+
+def _ensure_initialized():
+    """초기화를 시도한 적이 없다면, 지금 시도합니다. (웜업이 진행 중이면 끝날 때까지 기다립니다)"""
+    if not _initialization_attempted:
+        with _init_lock:
+            if not _initialization_attempted:
+                print("--- 벡터 DB 최초 접근 시도: Pinecone 지연 초기화 실행 ---")
+                _initialize_pinecone()
+
+def get_pinecone_index():
     """
     초기화된 Pinecone 인덱스 객체를 반환합니다. (지연 초기화 로직 적용)
+    서킷 브레이커의 half_open 시험 호출을 쓰지 않으므로, 사용 가능 여부 확인이나
+    인덱스를 직접 다루는 관리 명령에 씁니다. 브레이커가 열려 있으면 None을 반환합니다.
     """
-    global _initialization_attempted
-    
-    # 1. 초기화를 시도한 적이 없다면, 지금 시도합니다.
-    if not _initialization_attempted:
-        print("--- 벡터 DB 최초 접근 시도: Pinecone 지연 초기화 실행 ---")
-        _initialize_pinecone()
-    
-    # 2. 초기화 결과에 따라 인덱스 객체를 반환합니다.
+    _ensure_initialized()
+    if not is_vector_db_enabled() or _circuit_breaker.is_open():
+        return None
+    return _pinecone_index_instance
+
+def is_vector_db_ready():
+    """필요하면 초기화한 뒤, 벡터 DB를 쓸 수 있는지 반환합니다. (아무 상태도 소비하지 않음)"""
+    return get_pinecone_index() is not None
+
+def get_or_create_collection():
+    """
+    벡터 DB 작업 직전에 인덱스 객체를 가져옵니다. (지연 초기화 로직 적용)
+    half_open 상태에서는 이 호출이 유일한 시험 호출을 가져가므로, 호출한 쪽은 반드시
+    record_success/record_failure(또는 요청 전 포기 시 release_trial)로 결과를 보고해야 합니다.
+    단순히 사용 가능 여부만 확인할 때는 is_vector_db_ready()를 쓰세요.
+    """
+    _ensure_initialized()
     if not is_vector_db_enabled():
         return None
+    if not _circuit_breaker.allow_request():
+        return None
         
     return _pinecone_index_instance
 
+def release_trial():
+    """시험 호출을 받았지만 벡터 DB에 요청을 보내지 못했을 때 서킷 브레이커에 돌려줍니다."""
+    _circuit_breaker.release_trial()
+
 # ----------------- 벡터 DB 작업 -----------------
 
 def upsert_message(pinecone_index_dummy, message_obj):
@@ -171,43 +476,143 @@ def upsert_message(pinecone_index_dummy, message_obj):
         return
         
     try:
-        user_identifier = str(message_obj.user.username) 
-        message_id = str(message_obj.id)
-        
         # 1. 임베딩 생성
         embedding = _get_embedding(message_obj.message)
 
-        # 2. 메타데이터 구성
-        metadata = {
-            "text": message_obj.message,
-            "speaker": "user" if message_obj.is_user else "ai",
-            "user_id": user_identifier, 
-            "timestamp": message_obj.timestamp.isoformat()
-        }
-        
-        # 3. Pinecone에 Upsert
-        pinecone_index.upsert(
-            vectors=[{
-                "id": message_id, 
-                "values": embedding, 
-                "metadata": metadata
-            }]
-        )
-        print(f"--- 벡터 DB에 메시지 ID {message_id} 저장 완료 (Pinecone) ---")
+        # 2. 벡터 레코드(메타데이터 포함) 구성 후 Pinecone에 Upsert
+        vector = build_message_vector(message_obj, embedding)
+        pinecone_index.upsert(vectors=[vector], namespace=user_namespace(message_obj.user_id))
+        record_success()
+        print(f"--- 벡터 DB에 메시지 ID {vector['id']} 저장 완료 (Pinecone) ---")
 
     except EnvironmentError as e:
+        release_trial()
         print(f"--- 환경 설정 오류로 Upsert 실패: {e} ---")
         pass 
+    except EmbeddingError as e:
+        release_trial()
+        print(f"--- 임베딩 실패로 Upsert 스킵 (ID: {message_obj.id}): {e} ---")
     except Exception as e:
+        record_failure(e)
         print(f"--- Pinecone Upsert 중 일반 오류 발생 (ID: {message_obj.id}): {e} ---")
         pass
 
 
+def upsert_turn(user_message_obj, bot_message_obj):
+    """
+    사용자 메시지와 AI 응답 한 쌍을 turn 청크로 임베딩(요청 1회)하여 저장합니다.
+    메시지 단위 색인보다 임베딩/Upsert 횟수가 절반으로 줄어듭니다.
+    """
+    pinecone_index = get_or_create_collection()
+
+    if pinecone_index is None:
+        print("--- [경고] 벡터 DB 비활성화 상태로 upsert_turn 스킵 ---")
+        return
+
+    try:
+        chunks = build_turn_chunks(user_message_obj, bot_message_obj)
+        embeddings = get_embeddings([chunk["text"] for chunk in chunks])
+        vectors = [attach_embedding(chunk, embedding) for chunk, embedding in zip(chunks, embeddings)]
+        pinecone_index.upsert(vectors=vectors, namespace=user_namespace(user_message_obj.user_id))
+        record_success()
+        print(f"--- 벡터 DB에 대화 턴 {chunks[0]['id']} 저장 완료 (청크 {len(chunks)}개) ---")
+
+    except EnvironmentError as e:
+        release_trial()
+        print(f"--- 환경 설정 오류로 Upsert 실패: {e} ---")
+    except EmbeddingError as e:
+        release_trial()
+        print(f"--- 임베딩 실패로 대화 턴 Upsert 스킵 (ID: {user_message_obj.id}): {e} ---")
+    except Exception as e:
+        record_failure(e)
+        print(f"--- Pinecone 대화 턴 Upsert 중 일반 오류 발생 (ID: {user_message_obj.id}): {e} ---")
+
+def upsert_vectors(vectors: List[Dict], namespace: str):
+    """
+    미리 구성된 벡터 레코드 묶음을 한 번의 요청으로 Upsert합니다.
+    대량 재색인용이므로 오류를 삼키지 않고 호출자에게 그대로 전달합니다.
+    """
+    pinecone_index = get_or_create_collection()
+    if pinecone_index is None:
+        raise EnvironmentError("벡터 DB가 비활성화 상태입니다.")
+    try:
+        pinecone_index.upsert(vectors=vectors, namespace=namespace)
+    except Exception as e:
+        record_failure(e)
+        raise
+    record_success()
+
+def fetch_content_hashes(ids: List[str], namespace: str) -> Dict[str, str]:
+    """
+    주어진 벡터 ID들의 저장된 content_hash를 조회합니다.
+    존재하지 않거나 해시가 없는 벡터는 결과에서 빠집니다.
+    """
+    pinecone_index = get_or_create_collection()
+    if pinecone_index is None:
+        raise EnvironmentError("벡터 DB가 비활성화 상태입니다.")
+
+    hashes = {}
+    try:
+        for start in range(0, len(ids), FETCH_BATCH_SIZE):
+            response = pinecone_index.fetch(ids=ids[start:start + FETCH_BATCH_SIZE], namespace=namespace)
+            for vector_id, vector in response.vectors.items():
+                stored_hash = (vector.metadata or {}).get('content_hash')
+                if stored_hash:
+                    hashes[vector_id] = stored_hash
+    except Exception as e:
+        record_failure(e)
+        raise
+    record_success()
+    return hashes
+
+def delete_vectors(ids: List[str], namespace: str):
+    """네임스페이스에서 주어진 ID의 벡터들을 삭제합니다. 대량 작업용이므로 오류를 그대로 전달합니다."""
+    pinecone_index = get_or_create_collection()
+    if pinecone_index is None:
+        raise EnvironmentError("벡터 DB가 비활성화 상태입니다.")
+    try:
+        for start in range(0, len(ids), FETCH_BATCH_SIZE):
+            pinecone_index.delete(ids=ids[start:start + FETCH_BATCH_SIZE], namespace=namespace)
+    except Exception as e:
+        record_failure(e)
+        raise
+    record_success()
+
+def delete_user_vectors(user_id) -> bool:
+    """
+    사용자 네임스페이스를 통째로 삭제합니다. (계정 삭제, 전체 재색인 전 초기화용)
+    네임스페이스 단위 삭제이므로 사용자의 벡터 수와 무관하게 요청 한 번으로 끝납니다.
+    """
+    pinecone_index = get_or_create_collection()
+    if pinecone_index is None:
+        print("--- [경고] 벡터 DB 비활성화 상태로 delete_user_vectors 스킵 ---")
+        return False
+
+    try:
+        pinecone_index.delete(delete_all=True, namespace=user_namespace(user_id))
+        record_success()
+        print(f"--- 벡터 DB 네임스페이스 {user_namespace(user_id)} 삭제 완료 ---")
+        return True
+    except ApiException as e:
+        # 벡터를 한 번도 저장하지 않은 사용자는 네임스페이스가 없어 404가 반환됩니다.
+        if e.status_code == 404:
+            record_success()
+            return True
+        record_failure(e)
+        print(f"--- Pinecone 네임스페이스 삭제 중 오류 발생 (User: {user_id}): {e} ---")
+        return False
+    except Exception as e:
+        record_failure(e)
+        print(f"--- Pinecone 네임스페이스 삭제 중 오류 발생 (User: {user_id}): {e} ---")
+        return False
+
+
 def query_similar_messages(
-    pinecone_index_dummy, query: str, user_identifier: str, n_results: int = 5
+    pinecone_index_dummy, query: str, user_identifier, n_results: int = 5
 ) -> Dict[str, Union[List[str], List[Dict]]]:
     """
     Pinecone에서 쿼리와 관련된 문서를 검색하고 ChatService의 예상 형식으로 반환합니다.
+    user_identifier는 User.id이며, 해당 사용자의 네임스페이스만 검색합니다.
     """
     # 호출 시점에 get_or_create_collection()으로 인덱스를 새로 가져와야 지연 초기화가 작동합니다.
     pinecone_index = get_or_create_collection() 
@@ -226,7 +631,7 @@ def query_similar_messages(
         results = pinecone_index.query(
             vector=query_embedding,
             top_k=n_results,
-            filter={"user_id": user_identifier}, 
+            namespace=user_namespace(user_identifier),
             include_metadata=True
         )
 
@@ -237,6 +642,9 @@ def query_similar_messages(
             document_content = match.metadata.get('text', '문서 내용 없음')
             
             metadata = {
+                'message_id': match.id,
+                'kind': match.metadata.get('kind', 'message'),
+                'message_ids': match.metadata.get('message_ids') or [match.id],
                 'speaker': match.metadata.get('speaker', 'unknown'),
                 'user_id': match.metadata.get('user_id'), 
                 'timestamp': match.metadata.get('timestamp')
@@ -245,6 +653,7 @@ def query_similar_messages(
             retrieved_docs.append(document_content)
             retrieved_metadatas.append(metadata)
 
+        record_success()
         print(f"--- Pinecone 검색 결과: {len(retrieved_docs)}개 문서 ---")
         
         return {
@@ -253,8 +662,14 @@ def query_similar_messages(
         }
         
     except EnvironmentError as e:
+        release_trial()
         print(f"--- 환경 설정 오류로 Pinecone 문서 검색 실패: {e} ---")
         return {"documents": [], "metadatas": []}
+    except EmbeddingError as e:
+        release_trial()
+        print(f"--- 쿼리 임베딩 실패로 Pinecone 문서 검색 스킵: {e} ---")
+        return {"documents": [], "metadatas": []}
     except Exception as e:
+        record_failure(e)
         print(f"--- Pinecone 문서 검색 중 오류가 발생했습니다: {e} ---")
         return {"documents": [], "metadatas": []}
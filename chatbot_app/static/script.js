@@ -5,26 +5,21 @@ document.addEventListener('DOMContentLoaded', function() {
     const chatbotCharacter = document.getElementById('chatbot-character');
 
     let lastMessageDate = null;
+    let olderHistoryCursor = chatHistoryCursor;
+    let loadingOlderHistory = false;
 
-    function addDateSeparator(dateString) {
+    function createDateSeparator(dateString) {
         const date = new Date(dateString);
         const formattedDate = `[${date.getFullYear()}년 ${date.getMonth() + 1}월 ${date.getDate()}일]`;
         
         const separatorDiv = document.createElement('div');
         separatorDiv.classList.add('date-separator');
+        separatorDiv.dataset.date = date.toDateString();
         separatorDiv.textContent = formattedDate;
-        chatLog.appendChild(separatorDiv);
+        return separatorDiv;
     }
 
-    function appendMessage(sender, message, timestamp) {
-        if (timestamp) {
-            const messageDate = new Date(timestamp).toDateString();
-            if (lastMessageDate !== messageDate) {
-                addDateSeparator(timestamp);
-                lastMessageDate = messageDate;
-            }
-        }
-
+    function createMessageElement(sender, message, timestamp) {
         const messageDiv = document.createElement('div');
         messageDiv.classList.add('message', `${sender}-message`);
         
@@ -40,11 +35,67 @@ document.addEventListener('DOMContentLoaded', function() {
             timeSpan.textContent = timeString;
             messageDiv.appendChild(timeSpan);
         }
-        
-        chatLog.appendChild(messageDiv);
+        return messageDiv;
+    }
+
+    function appendMessage(sender, message, timestamp) {
+        if (timestamp) {
+            const messageDate = new Date(timestamp).toDateString();
+            if (lastMessageDate !== messageDate) {
+                chatLog.appendChild(createDateSeparator(timestamp));
+                lastMessageDate = messageDate;
+            }
+        }
+
+        chatLog.appendChild(createMessageElement(sender, message, timestamp));
         chatLog.scrollTop = chatLog.scrollHeight;
     }
 
+    // 위로 스크롤하면 더 오래된 기록 한 페이지를 받아 맨 앞에 붙입니다. (보던 위치는 그대로 유지)
+    async function loadOlderHistory() {
+        if (!olderHistoryCursor || loadingOlderHistory) return;
+        loadingOlderHistory = true;
+
+        try {
+            const response = await fetch(`${CHAT_HISTORY_URL}?cursor=${encodeURIComponent(olderHistoryCursor)}`);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const data = await response.json();
+
+            const fragment = document.createDocumentFragment();
+            let fragmentDate = null;
+            data.messages.forEach(chat => {
+                const messageDate = new Date(chat.timestamp).toDateString();
+                if (fragmentDate !== messageDate) {
+                    fragment.appendChild(createDateSeparator(chat.timestamp));
+                    fragmentDate = messageDate;
+                }
+                fragment.appendChild(createMessageElement(chat.is_user ? 'user' : 'bot', chat.message, chat.timestamp));
+            });
+
+            // 같은 날짜가 페이지 경계에 걸치면 기존 맨 위 구분선을 지워 한 번만 보이게 합니다.
+            const firstElement = chatLog.firstElementChild;
+            if (firstElement && firstElement.classList.contains('date-separator') && firstElement.dataset.date === fragmentDate) {
+                firstElement.remove();
+            }
+
+            const previousScrollHeight = chatLog.scrollHeight;
+            chatLog.prepend(fragment);
+            chatLog.scrollTop += chatLog.scrollHeight - previousScrollHeight;
+            olderHistoryCursor = data.next_cursor;
+        } catch (error) {
+            console.error('Error loading chat history:', error);
+        } finally {
+            loadingOlderHistory = false;
+        }
+
+        // 기록이 짧아 스크롤바가 생기지 않으면 스크롤 이벤트가 없으므로 바로 한 페이지 더 받습니다.
+        if (olderHistoryCursor && chatLog.scrollHeight <= chatLog.clientHeight) {
+            loadOlderHistory();
+        }
+    }
+
     async function sendMessage() {
         const message = userInput.value.trim();
         if (message === '') return;
@@ -108,10 +159,19 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
-    // 초기 채팅 기록을 타임라인 형식으로 표시
+    // 초기 채팅 기록(최근 한 페이지)을 타임라인 형식으로 표시
     if (chatHistory) {
         chatHistory.forEach(chat => {
             appendMessage(chat.is_user ? 'user' : 'bot', chat.message, chat.timestamp);
         });
     }
+
+    chatLog.addEventListener('scroll', () => {
+        if (chatLog.scrollTop < 50) {
+            loadOlderHistory();
+        }
+    });
+    if (olderHistoryCursor && chatLog.scrollHeight <= chatLog.clientHeight) {
+        loadOlderHistory();
+    }
 });
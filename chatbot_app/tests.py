@@ -0,0 +1,392 @@
+import multiprocessing
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from functools import partial
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from chatbot_app.models import (
+    ActivityAnalytics, ChatMessage, LexicalIndexStats, RelationshipAlias, UserActivity, UserAttribute, UserRelationship,
+)
+from chatbot_app.services import (
+    consolidation_service, emotion_service, finetuning_service, lexical_service, memory_service, pagination_service,
+    vector_service,
+)
+
+ANALYTICS_FIELDS = ('user_id', 'period_type', 'period_start_date', 'place_entity_id', 'place', 'companion', 'count')
+
+
+@unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), '워커가 테스트 DB 설정을 물려받으려면 fork가 필요합니다.')
+class ShardedAnalyticsTests(TransactionTestCase):
+    """update_activity_analytics를 --workers 1과 --workers N으로 돌린 결과가 같은지 확인합니다."""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and (
+            connection.is_in_memory_db() or connection.settings_dict['OPTIONS'].get('transaction_mode') != 'IMMEDIATE'
+        ):
+            # 인메모리 DB는 워커와 공유되지 않고, 기본 트랜잭션 모드에서는 샤드끼리 잠금 오류가 납니다.
+            self.skipTest('병렬 샤드는 PostgreSQL 또는 파일 TEST NAME + transaction_mode=IMMEDIATE인 SQLite에서만 검증합니다.')
+        places = ['스벅 강남점', '강남 스타벅스', '교보문고', 'CGV 왕십리', '동네 공원']
+        companions = [None, '', '민수', '지영']
+        start = date(2025, 12, 1)
+        for n in range(7):
+            user = User.objects.create(username=f'user{n}')
+            for i in range(30):
+                UserActivity.objects.create(
+                    user=user,
+                    activity_date=start + timedelta(days=(i * 5 + n) % 90),
+                    place=places[(i + n) % len(places)],
+                    companion=companions[i % len(companions)],
+                )
+
+    def _run(self, workers):
+        ActivityAnalytics.objects.all().delete()
+        # 활동이 없는 버킷은 재계산 후 지워져야 합니다.
+        place = UserActivity.objects.first().place_entity
+        ActivityAnalytics.objects.create(
+            user_id=place.user_id, period_type='weekly', period_start_date=date(2020, 1, 6),
+            place_entity=place, place=place.name, companion='', count=3,
+        )
+        fork_pool = partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('fork'))
+        with mock.patch('chatbot_app.management.commands.update_activity_analytics.ProcessPoolExecutor', fork_pool):
+            call_command('update_activity_analytics', full=True, workers=workers, batch_size=2,
+                         stdout=StringIO(), stderr=StringIO())
+        return sorted(ActivityAnalytics.objects.values_list(*ANALYTICS_FIELDS))
+
+    def test_sharded_run_matches_single_process(self):
+        single = self._run(workers=1)
+        self.assertTrue(single)
+        self.assertEqual(self._run(workers=3), single)
+
+
+class MemorySaveQueryCountTests(TestCase):
+    """추출 결과 저장의 쿼리 수가 항목 수와 무관하게 일정한지 확인합니다."""
+    EXISTING_NAMES = ['김민수', '이지영', '박서준', '최유리', '정하늘']
+    NEW_NAMES = ['강도윤', '윤서아', '한지호', '오예린', '신태양']
+
+    def _user(self, n, username):
+        user = User.objects.create(username=username)
+        for i in range(n):
+            UserAttribute.objects.create(user=user, fact_type=f'취미{i}', content='독서')
+            UserRelationship.objects.create(user=user, name=self.EXISTING_NAMES[i], relationship_type='친구')
+        return user
+
+    def _attributes(self, n):
+        return (
+            [{'action': 'update', 'fact_type': f'취미{i}', 'content': '등산'} for i in range(n)]
+            + [{'action': 'create', 'fact_type': f'직업{i}', 'content': '개발자'} for i in range(n)]
+        )
+
+    def _relationships(self, n):
+        return (
+            [{'name': self.EXISTING_NAMES[i], 'relationship_type': '동료', 'traits': ['성실함']} for i in range(n)]
+            + [{'name': self.NEW_NAMES[i], 'relationship_type': '친구', 'traits': ['친절함']} for i in range(n)]
+        )
+
+    def _count_queries(self, func, user, data):
+        with CaptureQueriesContext(connection) as queries:
+            func(user, data)
+        return len(queries)
+
+    def test_attribute_queries_do_not_grow_with_items(self):
+        single = self._count_queries(memory_service._save_user_attributes, self._user(1, 'one'), self._attributes(1))
+        user = self._user(5, 'many')
+        with self.assertNumQueries(single):
+            memory_service._save_user_attributes(user, self._attributes(5))
+        self.assertEqual(UserAttribute.objects.filter(user=user).count(), 10)
+        self.assertEqual(UserAttribute.objects.filter(user=user, content='등산').count(), 5)
+
+    def test_relationship_queries_do_not_grow_with_items(self):
+        single = self._count_queries(memory_service._save_relationships, self._user(1, 'one'), self._relationships(1))
+        user = self._user(5, 'many')
+        with self.assertNumQueries(single):
+            memory_service._save_relationships(user, self._relationships(5))
+        self.assertEqual(UserRelationship.objects.filter(user=user).count(), 10)
+        self.assertEqual(UserRelationship.objects.filter(user=user, relationship_type='동료').count(), 5)
+
+    def test_duplicate_relationship_names_are_merged(self):
+        user = self._user(0, 'dup')
+        memory_service._save_relationships(user, [
+            {'name': '강도윤', 'relationship_type': '친구', 'traits': ['친절함']},
+            {'name': '강도윤 ', 'relationship_type': '친구', 'traits': ['운동을 좋아함']},
+        ])
+        relationship = UserRelationship.objects.get(user=user)
+        self.assertEqual(relationship.name, '강도윤')
+        self.assertIn('운동을 좋아함', relationship.traits)
+
+    def test_name_sharing_a_syllable_creates_new_relationship(self):
+        user = self._user(0, 'syllable')
+        existing = UserRelationship.objects.create(user=user, name='석민', relationship_type='소꿉친구', traits=['치위생사 준비중'])
+        memory_service._save_relationships(user, [{'name': '민아', 'relationship_type': '여자친구', 'traits': '간호사'}])
+        self.assertEqual(UserRelationship.objects.filter(user=user).count(), 2)
+        existing.refresh_from_db()
+        self.assertEqual(existing.relationship_type, '소꿉친구')
+        self.assertEqual(existing.traits, ['치위생사 준비중'])
+        self.assertFalse(RelationshipAlias.objects.filter(user=user).exists())
+
+    def test_serial_code_links_nickname_and_learns_alias(self):
+        user = self._user(0, 'serial')
+        existing = UserRelationship.objects.create(user=user, name='석민', relationship_type='소꿉친구')
+        memory_service._save_relationships(user, [
+            {'name': '민이', 'serial_code': str(existing.serial_code), 'relationship_type': '소꿉친구', 'traits': '간호사'},
+        ])
+        self.assertEqual(UserRelationship.objects.filter(user=user).count(), 1)
+        existing.refresh_from_db()
+        self.assertIn('간호사', existing.traits)
+        self.assertEqual(RelationshipAlias.objects.get(user=user).alias, '민이')
+        # 학습된 별칭은 이후 serial_code 없이도 같은 인물로 연결됩니다.
+        memory_service._save_relationships(user, [{'name': '민이', 'relationship_type': '소꿉친구', 'traits': '운동을 좋아함'}])
+        existing.refresh_from_db()
+        self.assertEqual(UserRelationship.objects.filter(user=user).count(), 1)
+        self.assertIn('운동을 좋아함', existing.traits)
+
+
+class AnonymizerTests(TestCase):
+    """파인튜닝 익명화 매처의 치환 결과와 캐시 무효화를 확인합니다."""
+    # (사용자 이름, 인물 [(이름, 관계 유형)], 봇 메시지, 기대 결과) — 이름끼리 겹치는 경우들
+    OVERLAP_CASES = [
+        ('석민', [('김석민', '친구')], '석민아, 김석민이랑 놀았어?', '사용자아, [친구]이랑 놀았어?'),
+        ('하늘', [('민지', '지수 동생'), ('지수', '동료')], '민지랑 지수 만났구나', '[지수 동생]랑 [동료] 만났구나'),
+        ('준', [('박준호', '팀장'), ('준호', '동생')], '박준호 팀장님이랑 준호', '[팀장] 팀장님이랑 [동생]'),
+    ]
+
+    def setUp(self):
+        # 캐시는 프로세스 전역이고 테스트마다 롤백된 사용자 ID가 다시 쓰일 수 있으므로 비웁니다.
+        finetuning_service._anonymizer_cache.clear()
+
+    def test_overlapping_names_are_replaced_once_longest_first(self):
+        for username, relationships, message, expected in self.OVERLAP_CASES:
+            with self.subTest(message=message):
+                replacements = {name: f"[{rel_type}]" for name, rel_type in relationships}
+                replacements[username] = '사용자'
+                self.assertEqual(finetuning_service.Anonymizer(replacements).anonymize(message), expected)
+
+    def test_get_anonymizer_uses_stored_names(self):
+        for i, (username, relationships, message, expected) in enumerate(self.OVERLAP_CASES):
+            with self.subTest(message=message):
+                user = User.objects.create(username=f'case{i}')
+                UserAttribute.objects.create(user=user, fact_type='이름', content=username)
+                for name, rel_type in relationships:
+                    UserRelationship.objects.create(user=user, name=name, relationship_type=rel_type)
+                prompt, anonymizer = finetuning_service.get_anonymizer(user)
+                self.assertEqual(anonymizer.anonymize(message), expected)
+                self.assertNotIn(user.username, prompt)
+
+    def test_cache_is_reused_until_invalidated(self):
+        user = User.objects.create(username='cache')
+        UserRelationship.objects.create(user=user, name='김민수', relationship_type='친구')
+        first = finetuning_service.get_anonymizer(user)
+        with self.assertNumQueries(1): # 버전 조회만
+            self.assertIs(finetuning_service.get_anonymizer(user), first)
+
+        # save()는 시그널로, bulk 저장은 _save_relationships가 직접 무효화합니다.
+        UserRelationship.objects.create(user=user, name='이지영', relationship_type='동료')
+        second = finetuning_service.get_anonymizer(user)
+        self.assertIsNot(second, first)
+        self.assertEqual(second[1].anonymize('이지영 만났어'), '[동료] 만났어')
+
+        memory_service._save_relationships(user, [{'name': '박서준', 'relationship_type': '사촌', 'traits': []}])
+        third = finetuning_service.get_anonymizer(user)
+        self.assertIsNot(third, second)
+        self.assertEqual(third[1].anonymize('박서준 왔어'), '[사촌] 왔어')
+
+        UserAttribute.objects.create(user=user, fact_type='이름', content='하늘')
+        self.assertEqual(finetuning_service.get_anonymizer(user)[1].anonymize('하늘아 안녕'), '사용자아 안녕')
+
+
+class EmotionTests(SimpleTestCase):
+    """감정 분류를 benchmark_emotion의 LABELLED_CASES(키워드/가중치 조정에 쓴 데이터)와 겹치지 않는 문장으로 확인합니다."""
+    CASES = [
+        ('와 진짜 기쁘다! 드디어 합격했구나', 'happy'),
+        ('그 얘기 들으니까 좀 우울해지네', 'sad'),
+        ('흥, 짜증나게 왜 자꾸 같은 걸 물어봐?', 'angry'),
+        ('메롱! 이번엔 내가 이겼지?', 'mischievous'),
+        ('치킨 얘기 그만해, 배고프잖아', 'hungry'),
+        ('알려줘서 고마워, 덕분에 지식이 늘었어', 'mischievous'),
+        ('내일 회의는 몇 시야?', 'default'),
+        ('', 'default'),
+    ]
+    NEGATED_CASES = [
+        ('전혀 슬프지 않아. 그냥 피곤할 뿐이야', 'default'),
+        ('속상해하지 마. 다음엔 잘 될 거야', 'default'),
+        ('짜증 안 났어, 진짜야', 'default'),
+        ('별로 기쁘지 않은데?', 'default'),
+        ('화 안 났다니까? 그래도 좀 서운하긴 해', 'sad'),
+    ]
+    # 점수가 같으면 EMOTION_PRIORITY에서 앞선(부정적인) 감정을 고릅니다.
+    TIE_CASES = [
+        ('짜증나고 슬퍼', 'sad'),
+        ('재밌다, 근데 먹고 싶은 게 생겼어', 'hungry'),
+    ]
+
+    def test_held_out_cases(self):
+        for text, expected in self.CASES + self.NEGATED_CASES + self.TIE_CASES:
+            with self.subTest(text=text):
+                self.assertEqual(emotion_service.analyze_emotion(text), expected)
+
+    def test_tie_cases_are_actual_ties(self):
+        for text, _ in self.TIE_CASES:
+            scores = sorted(emotion_service.score_emotions(text.lower()).values(), reverse=True)
+            self.assertEqual(scores[0], scores[1])
+
+    def test_resolve_emotion_prefers_valid_llm_emotion(self):
+        self.assertEqual(emotion_service.resolve_emotion('짜증나!', ' Happy '), 'happy')
+        for invalid in ('excited', '', None, 3, ['sad']):
+            with self.subTest(llm_emotion=invalid):
+                self.assertEqual(emotion_service.resolve_emotion('짜증나!', invalid), 'angry')
+
+
+class KeysetPaginationViewTests(TestCase):
+    """목록 API가 커서로 이어 읽히고, 잘못된 커서에는 500 대신 400을 돌려주는지 확인합니다."""
+    BAD_CURSOR_VALUES = [
+        [{'a': 1}, 1],
+        ['a', 'x'],
+        [None, 1],
+        [[1], 1],
+        [True, 1],
+        ['a'],
+    ]
+    # 첫 키가 시각인 채팅 기록에서만 잘못된 값들
+    BAD_TIMESTAMP_CURSOR_VALUES = [
+        ['notadate', 1],
+        ['2026-13-45T00:00:00', 1],
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create(username='pager')
+        self.client.force_login(self.user)
+        for i in range(7):
+            ChatMessage.objects.create(user=self.user, message=f'메시지 {i}', is_user=i % 2 == 0)
+            UserAttribute.objects.create(user=self.user, fact_type=f'유형{i % 3}', content=f'내용 {i}')
+            UserRelationship.objects.create(user=self.user, name=f'인물{i % 3}', relationship_type='친구')
+
+    def _get(self, name, **params):
+        return self.client.get(reverse(name), params, secure=True)
+
+    def test_pages_cover_every_row_once(self):
+        for name, key, total in (('chat_history', 'messages', 7), ('attribute_page', 'items', 7),
+                                 ('relationship_page', 'items', 7)):
+            with self.subTest(endpoint=name):
+                seen, cursor = [], None
+                while True:
+                    params = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+                    response = self._get(name, **params)
+                    self.assertEqual(response.status_code, 200)
+                    data = response.json()
+                    seen.extend(data[key])
+                    cursor = data['next_cursor']
+                    if cursor is None:
+                        break
+                self.assertEqual(len(seen), total)
+                self.assertEqual(len({str(item) for item in seen}), total)
+
+    def test_bad_cursors_return_400(self):
+        cursors = ['!!not-base64', pagination_service.encode_cursor(['x', 1])[:-2]] + [
+            pagination_service.encode_cursor(values) for values in self.BAD_CURSOR_VALUES
+        ]
+        timestamp_cursors = [pagination_service.encode_cursor(values) for values in self.BAD_TIMESTAMP_CURSOR_VALUES]
+        for name in ('chat_history', 'attribute_page', 'relationship_page'):
+            for cursor in cursors + (timestamp_cursors if name == 'chat_history' else []):
+                with self.subTest(endpoint=name, cursor=cursor):
+                    self.assertEqual(self._get(name, cursor=cursor).status_code, 400)
+
+
+class LexicalIndexStatsTests(TestCase):
+    """메시지를 지워도 BM25 통계가 전체 재구축 결과와 같게 유지되는지 확인합니다."""
+
+    def _stats(self, user):
+        stats = LexicalIndexStats.objects.get(user=user)
+        return stats.doc_count, stats.total_length
+
+    def test_deleting_messages_updates_stats(self):
+        user = User.objects.create(username='lexical')
+        messages = [
+            ChatMessage.objects.create(user=user, message=text, is_user=True)
+            for text in ('강남역에서 친구 만났어', '오늘 점심은 떡볶이', '!!!', '주말에 등산 가자')
+        ]
+        messages[1].delete()
+        ChatMessage.objects.filter(pk__in=[messages[2].pk, messages[3].pk]).delete()
+        incremental = self._stats(user)
+
+        lexical_service.rebuild_user_index(user.id)
+        self.assertEqual(incremental, self._stats(user))
+        self.assertEqual(incremental[0], 1)
+
+
+class VectorCircuitBreakerTests(SimpleTestCase):
+    """OpenAI 임베딩 실패는 Pinecone 서킷 브레이커를 열지 않고, Pinecone 오류만 실패로 세는지 확인합니다."""
+
+    def setUp(self):
+        self.breaker = vector_service.CircuitBreaker(failure_threshold=2, base_cooldown=60)
+        self.index = mock.Mock()
+        for name, value in (('_circuit_breaker', self.breaker), ('_initialization_attempted', True),
+                            ('_vector_db_enabled', True), ('_pinecone_index_instance', self.index)):
+            patcher = mock.patch.object(vector_service, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        openai = mock.Mock()
+        openai.embeddings.create.side_effect = RuntimeError('429 rate limit')
+        patcher = mock.patch.object(vector_service, '_get_openai_client', return_value=openai)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_embedding_failures_do_not_open_breaker(self):
+        with self.assertRaises(vector_service.EmbeddingError):
+            vector_service.get_embeddings(['안녕'])
+        for _ in range(5):
+            self.assertEqual(vector_service.query_similar_messages(None, '안녕', 1)['documents'], [])
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertEqual(self.breaker.consecutive_failures, 0)
+        self.index.query.assert_not_called()
+
+    def test_embedding_failure_releases_half_open_trial(self):
+        self.breaker.state = 'half_open'
+        vector_service.query_similar_messages(None, '안녕', 1)
+        # 시험 호출을 돌려받았으므로 다음 호출이 바로 다시 시험할 수 있습니다.
+        self.assertIsNotNone(vector_service.get_or_create_collection())
+
+    def test_pinecone_failures_open_breaker(self):
+        with mock.patch.object(vector_service, 'get_embeddings', return_value=[[0.0]]):
+            self.index.query.side_effect = RuntimeError('pinecone 503')
+            for _ in range(2):
+                vector_service.query_similar_messages(None, '안녕', 1)
+        self.assertTrue(self.breaker.is_open())
+
+
+class ConsolidationTests(TestCase):
+    """통합 기간 경계에 걸친 대화 턴 벡터가 남지 않는지 확인합니다."""
+
+    def test_turn_straddling_window_boundary_is_deleted_with_first_window(self):
+        user = User.objects.create(username='consolidate')
+        period_start = consolidation_service._local_midnight(timezone.now() - timedelta(days=400))
+        boundary = period_start + timedelta(days=7)
+        timestamps = [period_start + timedelta(hours=1), period_start + timedelta(hours=1, minutes=1),
+                      boundary - timedelta(minutes=1), boundary + timedelta(minutes=1)]
+        messages = []
+        for i, timestamp in enumerate(timestamps):
+            message = ChatMessage.objects.create(user=user, message=f'메시지 {i}', is_user=i % 2 == 0)
+            ChatMessage.objects.filter(pk=message.pk).update(timestamp=timestamp)
+            message.refresh_from_db()
+            messages.append(message)
+
+        deleted = []
+        with mock.patch.object(consolidation_service, 'summarize_messages', return_value='요약'), \
+                mock.patch.object(vector_service, 'get_embeddings', return_value=[[0.0]]), \
+                mock.patch.object(vector_service, 'upsert_vectors'), \
+                mock.patch.object(vector_service, 'delete_vectors', side_effect=lambda ids, ns: deleted.append(ids)):
+            consolidation_service.consolidate_user(user, 'key', retention_days=30, window_days=7)
+
+        straddling = f"turn-{messages[2].id}-{messages[3].id}"
+        self.assertEqual(len(deleted), 2)
+        self.assertIn(straddling, deleted[0])
+        self.assertIn(f"turn-{messages[0].id}-{messages[1].id}", deleted[0])
+        self.assertIn(str(messages[3].id), deleted[1])
@@ -4,8 +4,12 @@ from .views import main, chatWithAi, auth
 urlpatterns = [
     path('', main.index, name='index'),
     path('chat/', chatWithAi.chat_response, name='chat_response'),
+    path('chat/history/', main.chat_history, name='chat_history'),
     path('signup/', auth.signup_view, name='signup'),
     path('login/', auth.login_view, name='login'),
     path('logout/', auth.logout_view, name='logout'),
     path('ai_status/', main.ai_status, name='ai_status'),
+    path('ai_status/attributes/', main.attribute_page, name='attribute_page'),
+    path('ai_status/relationships/', main.relationship_page, name='relationship_page'),
+    path('vector_status/', main.vector_status, name='vector_status'),
 ]
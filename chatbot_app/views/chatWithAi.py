@@ -22,13 +22,13 @@ def chat_response(request):
 
         try:
             # 1. 채팅 상호작용 (컨텍스트 생성, API 호출, 응답 처리, 기억 저장)
-            bot_message_text, explanation, bot_message_obj = chat_service.process_chat_interaction(request, user_message_text)
+            bot_message_text, explanation, llm_emotion, bot_message_obj = chat_service.process_chat_interaction(request, user_message_text)
 
             # 2. 파인튜닝 데이터 로깅
             finetuning_service.anonymize_and_log_finetuning_data(request, user_message_text, bot_message_text)
 
-            # 3. 감정 분석
-            character_emotion = emotion_service.analyze_emotion(bot_message_text)
+            # 3. 감정 분석 (LLM이 응답에 감정을 넣어 줬으면 그대로 사용)
+            character_emotion = emotion_service.resolve_emotion(bot_message_text, llm_emotion)
 
         except Exception as e:
             print(f"예상치 못한 오류: {e}")
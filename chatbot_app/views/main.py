@@ -1,35 +1,96 @@
+from django.http import JsonResponse
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from ..models import UserProfile, ChatMessage, UserAttribute, UserRelationship
+from ..services import vector_service, pagination_service
+
+CHAT_HISTORY_PAGE_SIZE = 50 # 채팅 화면에 처음 그리는/스크롤할 때마다 더 읽는 메시지 수
+STATUS_PAGE_SIZE = 5 # 상태 페이지 목록의 한 페이지 항목 수
+
+def _chat_history_page(user, cursor=None, limit=CHAT_HISTORY_PAGE_SIZE):
+    """최신 메시지부터 (timestamp, id) 키셋으로 한 페이지를 읽어 오래된 → 최신 순서로 반환합니다."""
+    queryset = ChatMessage.objects.filter(user=user).values('id', 'message', 'is_user', 'timestamp')
+    rows, next_cursor = pagination_service.keyset_page(queryset, ('timestamp', 'id'), cursor, limit, descending=True)
+    rows.reverse()
+    return [{'message': row['message'], 'is_user': row['is_user'], 'timestamp': row['timestamp']} for row in rows], next_cursor
 
 @login_required
 def index(request):
     """메인 채팅 페이지를 렌더링합니다.
 
-    로그인한 사용자의 프로필 정보와 이전 채팅 기록을 가져와
-    템플릿에 전달합니다.
+    로그인한 사용자의 프로필 정보와 최근 채팅 기록 한 페이지를 가져와
+    템플릿에 전달합니다. 더 오래된 기록은 스크롤할 때 chat_history로 이어서 받습니다.
     """
     user_profile = UserProfile.objects.get(user=request.user)
-    chat_messages_data = list(ChatMessage.objects.filter(user=request.user).order_by('timestamp').values('message', 'is_user', 'timestamp'))
-    return render(request, 'index.html', {'user_profile': user_profile, 'chat_messages': chat_messages_data})
+    chat_messages_data, next_cursor = _chat_history_page(request.user)
+    return render(request, 'index.html', {
+        'user_profile': user_profile,
+        'chat_messages': chat_messages_data,
+        'chat_history_cursor': next_cursor,
+    })
+
+@login_required
+def chat_history(request):
+    """cursor보다 오래된 채팅 기록 한 페이지를 JSON으로 반환합니다."""
+    try:
+        messages, next_cursor = _chat_history_page(
+            request.user, request.GET.get('cursor'),
+            pagination_service.parse_limit(request.GET.get('limit'), CHAT_HISTORY_PAGE_SIZE),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'messages': messages, 'next_cursor': next_cursor})
 
 @login_required
 def ai_status(request):
-    """AI의 상태(기억, 호감도 등)를 보여주는 페이지를 렌더링합니다."""
+    """AI의 상태(기억, 호감도 등)를 보여주는 페이지를 렌더링합니다.
+
+    기억하는 사실과 인간관계 목록은 페이지에서 attribute_page / relationship_page로 한 페이지씩 받아옵니다.
+    """
     user_profile = UserProfile.objects.get(user=request.user)
-    affinity_score = user_profile.affinity_score
-    core_facts = list(
-        UserAttribute.objects.filter(user=request.user).values('fact_type', 'content')
-    )
-    # Serialize relationships for pagination in JavaScript
-    user_relationships = list(
-        UserRelationship.objects.filter(user=request.user).order_by('name').values(
-            'serial_code', 'name', 'relationship_type', 'position', 'traits'
-        )
-    )
     return render(request, 'ai_status.html', {
         'user_profile': user_profile,
-        'affinity_score': affinity_score,
-        'core_facts': core_facts,
-        'user_relationships': user_relationships
+        'affinity_score': user_profile.affinity_score,
+        'page_size': STATUS_PAGE_SIZE,
     })
+
+@login_required
+def attribute_page(request):
+    """사용자 속성을 (fact_type, id) 순서의 키셋 페이지로 반환합니다."""
+    # fact_type은 NULL일 수 있으므로 빈 문자열로 바꿔 정렬/비교가 항상 성립하도록 합니다.
+    queryset = UserAttribute.objects.filter(user=request.user).annotate(
+        sort_type=Coalesce('fact_type', Value(''))
+    ).values('id', 'sort_type', 'fact_type', 'content')
+    try:
+        rows, next_cursor = pagination_service.keyset_page(
+            queryset, ('sort_type', 'id'), request.GET.get('cursor'),
+            pagination_service.parse_limit(request.GET.get('limit'), STATUS_PAGE_SIZE),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    items = [{'fact_type': row['fact_type'], 'content': row['content']} for row in rows]
+    return JsonResponse({'items': items, 'next_cursor': next_cursor})
+
+@login_required
+def relationship_page(request):
+    """인간관계를 (name, id) 순서의 키셋 페이지로 반환합니다."""
+    queryset = UserRelationship.objects.filter(user=request.user).values(
+        'id', 'serial_code', 'name', 'relationship_type', 'position', 'traits'
+    )
+    try:
+        rows, next_cursor = pagination_service.keyset_page(
+            queryset, ('name', 'id'), request.GET.get('cursor'),
+            pagination_service.parse_limit(request.GET.get('limit'), STATUS_PAGE_SIZE),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    items = [{key: value for key, value in row.items() if key != 'id'} for row in rows]
+    return JsonResponse({'items': items, 'next_cursor': next_cursor})
+
+@staff_member_required
+def vector_status(request):
+    """현재 워커 프로세스의 벡터 DB 연결 및 서킷 브레이커 상태를 JSON으로 반환합니다. (운영자 전용)"""
+    return JsonResponse(vector_service.get_vector_db_status())
@@ -2,9 +2,12 @@
 
 import openai
 import os
+import sys
 # from dotenv import load_dotenv  <-- [삭제] .env 파일 로드 불필요
 import time
 
+from validate_finetuning_data import FinetuningDataError, print_report, validate
+
 # [삭제] .env 파일에서 환경 변수를 로드하는 코드를 삭제합니다.
 # load_dotenv()
 
@@ -22,6 +25,14 @@ else:
         script_dir = os.path.dirname(os.path.abspath(__file__))
         # finetuning_snapshot.jsonl 파일이 스크립트와 같은 디렉터리에 있다고 가정
         file_path = os.path.join(script_dir, "finetuning_snapshot.jsonl") 
+
+        # 0. 업로드 전 로컬 검증 (스키마, 역할 순서, 렌더링되지 않은 변수, 토큰 수/예상 비용)
+        print("학습 파일을 검증하는 중...")
+        try:
+            print_report(validate([file_path]))
+        except FinetuningDataError as e:
+            print(f"학습 파일 검증 실패. 업로드하지 않습니다:\n{e}")
+            sys.exit(1)
         
         # 1. 파일 업로드
         print("학습 파일을 업로드하는 중...")
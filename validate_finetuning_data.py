@@ -0,0 +1,167 @@
+# validate_finetuning_data.py
+# 파인튜닝 JSONL 파일을 업로드 전에 로컬에서 검사합니다. (표준 라이브러리만 사용, Django 설정 불필요)
+#   python validate_finetuning_data.py finetuning_snapshot.jsonl [더 많은 파일/샤드(.jsonl.gz) ...]
+
+import gzip
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+
+try:
+    import tiktoken  # 설치되어 있으면 정확한 토큰 수를, 없으면 아래 추정치를 사용합니다.
+except ImportError:
+    tiktoken = None
+
+ALLOWED_ROLES = ("system", "user", "assistant")
+ALLOWED_MESSAGE_KEYS = {"role", "content", "name", "weight"}
+# 렌더링되지 않은 f-string/템플릿 변수. 예: {request.user.username}, {user.username}
+PLACEHOLDER_PATTERN = re.compile(r"\{\{?\s*[A-Za-z_][\w.]*\s*\}?\}")
+MAX_TOKENS_PER_EXAMPLE = 16385 # 이보다 긴 예제는 학습 시 잘립니다.
+TOKENS_PER_MESSAGE = 3 # chat 형식에서 메시지마다 붙는 역할/구분 토큰
+# 학습 비용 (USD / 1K 토큰). 기본값은 gpt-3.5-turbo 기준이며 요금이 바뀌면 환경 변수로 덮어씁니다.
+TRAINING_PRICE_PER_1K_TOKENS = float(os.getenv("FINETUNING_PRICE_PER_1K_TOKENS", "0.008"))
+# OpenAI가 n_epochs를 지정하지 않았을 때 쓰는 규칙: 기본 3, 예제 수 x 에폭이 이 범위에 들도록 조정
+DEFAULT_EPOCHS, MIN_EPOCHS, MAX_EPOCHS = 3, 1, 25
+MIN_TARGET_EXAMPLES, MAX_TARGET_EXAMPLES = 100, 25000
+MAX_ERRORS = 20 # 이만큼 오류가 나오면 나머지는 읽지 않습니다.
+
+_encoding = tiktoken.get_encoding("cl100k_base") if tiktoken is not None else None
+
+class FinetuningDataError(Exception):
+    pass
+
+def estimate_tokens(text):
+    """
+    cl100k 토큰 수의 대략적인 추정: ASCII는 약 4글자당 1토큰, 한글 등 그 외 문자는 글자당 1토큰.
+    (흔한 한글 음절은 1토큰이지만 드문 음절은 2토큰 이상으로 나뉘므로, 비용은 하한에 가깝게 보세요.)
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+def _open(path):
+    return gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, encoding="utf-8")
+
+def _check_example(example):
+    """예제 하나의 스키마와 역할 순서를 검사해 오류 메시지 목록을 반환합니다."""
+    if not isinstance(example, dict) or set(example) != {"messages"}:
+        return ["최상위 객체는 'messages' 키 하나만 가져야 합니다."]
+    messages = example["messages"]
+    if not isinstance(messages, list) or not messages:
+        return ["'messages'는 비어 있지 않은 리스트여야 합니다."]
+
+    errors = []
+    for i, message in enumerate(messages):
+        if not isinstance(message, dict):
+            errors.append(f"messages[{i}]가 객체가 아닙니다.")
+            continue
+        unknown = set(message) - ALLOWED_MESSAGE_KEYS
+        if unknown:
+            errors.append(f"messages[{i}]에 알 수 없는 키 {sorted(unknown)}")
+        if message.get("role") not in ALLOWED_ROLES:
+            errors.append(f"messages[{i}]의 role {message.get('role')!r}는 허용되지 않습니다.")
+        content = message.get("content")
+        if not isinstance(content, str) or not content.strip():
+            errors.append(f"messages[{i}]의 content가 비어 있거나 문자열이 아닙니다.")
+            continue
+        placeholder = PLACEHOLDER_PATTERN.search(content)
+        if placeholder:
+            errors.append(f"messages[{i}]({message.get('role')})에 렌더링되지 않은 변수 {placeholder.group()}")
+    if errors:
+        return errors
+
+    # system(선택, 맨 앞 한 번) → user/assistant 번갈아 → assistant로 끝
+    roles = [message["role"] for message in messages]
+    if "system" in roles[1:]:
+        errors.append("system 메시지는 맨 앞에만 올 수 있습니다.")
+    turns = roles[1:] if roles[0] == "system" else roles
+    expected = ["user", "assistant"] * (len(turns) // 2 + 1)
+    if not turns or turns != expected[:len(turns)]:
+        errors.append(f"역할 순서가 user/assistant 교대가 아닙니다: {roles}")
+    elif turns[-1] != "assistant":
+        errors.append("마지막 메시지는 assistant여야 합니다.")
+    return errors
+
+def estimate_epochs(n_examples):
+    epochs = DEFAULT_EPOCHS
+    if n_examples * epochs < MIN_TARGET_EXAMPLES:
+        epochs = min(MAX_EPOCHS, math.ceil(MIN_TARGET_EXAMPLES / n_examples))
+    elif n_examples * epochs > MAX_TARGET_EXAMPLES:
+        epochs = max(MIN_EPOCHS, MAX_TARGET_EXAMPLES // n_examples)
+    return epochs
+
+def validate(paths, max_errors=MAX_ERRORS):
+    """
+    파일들을 한 줄씩 읽으며 검사하고 통계 dict를 반환합니다.
+    JSON이 깨졌거나 스키마/역할/변수 오류가 있으면 FinetuningDataError를 던집니다. (업로드 전에 멈추도록)
+    """
+    stats = {"examples": 0, "tokens": 0, "billed_tokens": 0, "too_long": 0, "bytes": 0,
+             "system_prompt_bytes": 0, "unique_system_prompts": 0, "unique_system_prompt_bytes": 0}
+    seen_system_prompts = set()
+    errors = []
+    for path in paths:
+        with _open(path) as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                location = f"{os.path.basename(path)}:{line_number}"
+                try:
+                    example = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise FinetuningDataError("\n".join(errors + [f"{location}: JSON 파싱 실패 ({e})"]))
+                errors.extend(f"{location}: {error}" for error in _check_example(example))
+                if len(errors) >= max_errors:
+                    raise FinetuningDataError("\n".join(errors[:max_errors]) + "\n(오류가 많아 검사를 중단했습니다.)")
+                if errors:
+                    continue
+
+                messages = example["messages"]
+                tokens = sum(TOKENS_PER_MESSAGE + estimate_tokens(m["content"]) for m in messages) + 3
+                stats["examples"] += 1
+                stats["tokens"] += tokens
+                stats["billed_tokens"] += min(tokens, MAX_TOKENS_PER_EXAMPLE)
+                stats["too_long"] += tokens > MAX_TOKENS_PER_EXAMPLE
+                stats["bytes"] += len(line.encode("utf-8"))
+                if messages[0]["role"] == "system":
+                    # 같은 페르소나 프롬프트가 예제마다 반복되므로, 해시로 한 번만 세어 실제 고유 분량을 보여줍니다.
+                    system_bytes = len(messages[0]["content"].encode("utf-8"))
+                    stats["system_prompt_bytes"] += system_bytes
+                    digest = hashlib.sha1(messages[0]["content"].encode("utf-8")).digest()
+                    if digest not in seen_system_prompts:
+                        seen_system_prompts.add(digest)
+                        stats["unique_system_prompts"] += 1
+                        stats["unique_system_prompt_bytes"] += system_bytes
+    if errors:
+        raise FinetuningDataError("\n".join(errors))
+    if not stats["examples"]:
+        raise FinetuningDataError("학습 예제가 하나도 없습니다.")
+
+    stats["epochs"] = estimate_epochs(stats["examples"])
+    stats["estimated_cost_usd"] = stats["billed_tokens"] * stats["epochs"] / 1000 * TRAINING_PRICE_PER_1K_TOKENS
+    return stats
+
+def print_report(stats):
+    tokenizer = "tiktoken(cl100k_base)" if _encoding is not None else "로컬 추정"
+    print(f"예제 {stats['examples']}개, 토큰 {stats['tokens']:,}개 ({tokenizer}), "
+          f"예제당 평균 {stats['tokens'] // stats['examples']:,}개")
+    if stats["too_long"]:
+        print(f"경고: {MAX_TOKENS_PER_EXAMPLE} 토큰을 넘어 잘리는 예제 {stats['too_long']}개")
+    deduplicated = stats["bytes"] - stats["system_prompt_bytes"] + stats["unique_system_prompt_bytes"]
+    print(f"파일 크기 {stats['bytes'] / 1024:,.0f}KB 중 system 프롬프트 {stats['system_prompt_bytes'] / 1024:,.0f}KB "
+          f"(고유 {stats['unique_system_prompts']}개, 중복 제거 시 {deduplicated / 1024:,.0f}KB)")
+    print(f"예상 에폭 {stats['epochs']}회, 예상 학습 비용 약 ${stats['estimated_cost_usd']:.2f} "
+          f"(${TRAINING_PRICE_PER_1K_TOKENS}/1K 토큰)")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("사용법: python validate_finetuning_data.py <파일.jsonl[.gz]> [...]")
+        sys.exit(2)
+    try:
+        print_report(validate(sys.argv[1:]))
+    except FinetuningDataError as e:
+        print(f"검증 실패:\n{e}")
+        sys.exit(1)